@@ -1,16 +1,19 @@
 from langchain_openai import ChatOpenAI
 from graph.state import AgentState, show_agent_reasoning
 from tools.api import get_financial_metrics, get_market_cap, search_line_items
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.messages import HumanMessage
 from pydantic import BaseModel
-import json
 from typing_extensions import Literal
 from utils.progress import progress
-from utils.llm import call_llm
+from utils.llm import call_llm, fallback_flag, get_decisive_signal
+from utils.prompt import CompiledPrompt, compact_payload
 import math
 
 
+# Analysis keys from most to least important, used when the prompt payload must be truncated
+PAYLOAD_PRIORITY = ["signal", "score", "max_score", "valuation_analysis", "earnings_analysis", "strength_analysis"]
+# No drop keys: every analysis section is just a score and its details text
+
+
 class BenGrahamSignal(BaseModel):
     signal: Literal["bullish", "bearish", "neutral"]
     confidence: float
@@ -72,23 +75,18 @@ def ben_graham_agent(state: AgentState):
             analysis_data=analysis_data,
             model_name=state["metadata"]["model_name"],
             model_provider=state["metadata"]["model_provider"],
+            llm_skip_threshold=state["metadata"].get("llm_skip_threshold"),
         )
 
-        graham_analysis[ticker] = {"signal": graham_output.signal, "confidence": graham_output.confidence, "reasoning": graham_output.reasoning}
+        graham_analysis[ticker] = {"signal": graham_output.signal, "confidence": graham_output.confidence, "reasoning": graham_output.reasoning, **fallback_flag(graham_output)}
 
         progress.update_status("ben_graham_agent", ticker, "Done")
 
-    # Wrap results in a single message for the chain
-    message = HumanMessage(content=json.dumps(graham_analysis), name="ben_graham_agent")
-
     # Optionally display reasoning
     if state["metadata"]["show_reasoning"]:
         show_agent_reasoning(graham_analysis, "Ben Graham Agent")
 
-    # Store signals in the overall state
-    state["data"]["analyst_signals"]["ben_graham_agent"] = graham_analysis
-
-    return {"messages": [message], "data": state["data"]}
+    return {"analyst_signals": {"ben_graham_agent": graham_analysis}}
 
 
 def analyze_earnings_stability(metrics: list, financial_line_items: list) -> dict:
@@ -276,22 +274,8 @@ def analyze_valuation_graham(metrics: list, financial_line_items: list, market_c
     return {"score": score, "details": "; ".join(details)}
 
 
-def generate_graham_output(
-    ticker: str,
-    analysis_data: dict[str, any],
-    model_name: str,
-    model_provider: str,
-) -> BenGrahamSignal:
-    """
-    Generates an investment decision in the style of Benjamin Graham:
-    - Value emphasis, margin of safety, net-nets, conservative balance sheet, stable earnings.
-    - Return the result in a JSON structure: { signal, confidence, reasoning }.
-    """
-
-    template = ChatPromptTemplate.from_messages([
-        (
-            "system",
-            """You are a Benjamin Graham AI agent, making investment decisions using his principles:
+GRAHAM_PROMPT = CompiledPrompt(
+    system="""You are a Benjamin Graham AI agent, making investment decisions using his principles:
             1. Insist on a margin of safety by buying below intrinsic value (e.g., using Graham Number, net-net).
             2. Emphasize the company's financial strength (low leverage, ample current assets).
             3. Prefer stable earnings over multiple years.
@@ -299,11 +283,8 @@ def generate_graham_output(
             5. Avoid speculative or high-growth assumptions; focus on proven metrics.
                         
             Return a rational recommendation: bullish, bearish, or neutral, with a confidence level (0-100) and concise reasoning.
-            """
-        ),
-        (
-            "human",
-            """Based on the following analysis, create a Graham-style investment signal:
+            """,
+    human="""Based on the following analysis, create a Graham-style investment signal:
 
             Analysis Data for {ticker}:
             {analysis_data}
@@ -314,14 +295,36 @@ def generate_graham_output(
               "confidence": float (0-100),
               "reasoning": "string"
             }}
-            """
-        )
-    ])
+            """,
+)
 
-    prompt = template.invoke({
-        "analysis_data": json.dumps(analysis_data, indent=2),
+
+def generate_graham_output(
+    ticker: str,
+    analysis_data: dict[str, any],
+    model_name: str,
+    model_provider: str,
+    llm_skip_threshold: float | None = None,
+) -> BenGrahamSignal:
+    """
+    Generates an investment decision in the style of Benjamin Graham:
+    - Value emphasis, margin of safety, net-nets, conservative balance sheet, stable earnings.
+    - Return the result in a JSON structure: { signal, confidence, reasoning }.
+    """
+    # Skip the LLM when the rule-based score already makes the call
+    decisive_signal = get_decisive_signal(analysis_data[ticker], BenGrahamSignal, "ben_graham_agent", model_name, model_provider, llm_skip_threshold)
+    if decisive_signal is not None:
+        return decisive_signal
+
+    prompt = GRAHAM_PROMPT.invoke({
+        "analysis_data": compact_payload(
+            analysis_data[ticker],
+            agent_name="ben_graham_agent",
+            model_name=model_name,
+            priority=PAYLOAD_PRIORITY,
+        ),
         "ticker": ticker
-    })
+    }, model_provider=model_provider)
 
     def create_default_ben_graham_signal():
         return BenGrahamSignal(signal="neutral", confidence=0.0, reasoning="Error in generating analysis; defaulting to neutral.")
@@ -1,13 +1,17 @@
 from langchain_openai import ChatOpenAI
 from graph.state import AgentState, show_agent_reasoning
 from tools.api import get_financial_metrics, get_market_cap, search_line_items
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.messages import HumanMessage
 from pydantic import BaseModel
-import json
 from typing_extensions import Literal
 from utils.progress import progress
-from utils.llm import call_llm
+from utils.llm import call_llm, fallback_flag, get_decisive_signal
+from utils.prompt import CompiledPrompt, compact_payload
+
+# Analysis keys from most to least important, used when the prompt payload must be truncated
+PAYLOAD_PRIORITY = ["signal", "score", "max_score", "valuation_analysis", "quality_analysis", "balance_sheet_analysis"]
+# Valuation numbers the prompt already gets as text in the valuation details
+PAYLOAD_DROP_KEYS = ["intrinsic_value", "margin_of_safety"]
+
 
 class BillAckmanSignal(BaseModel):
     signal: Literal["bullish", "bearish", "neutral"]
@@ -90,33 +94,23 @@ def bill_ackman_agent(state: AgentState):
             analysis_data=analysis_data,
             model_name=state["metadata"]["model_name"],
             model_provider=state["metadata"]["model_provider"],
+            llm_skip_threshold=state["metadata"].get("llm_skip_threshold"),
         )
         
         ackman_analysis[ticker] = {
             "signal": ackman_output.signal,
             "confidence": ackman_output.confidence,
-            "reasoning": ackman_output.reasoning
+            "reasoning": ackman_output.reasoning,
+            **fallback_flag(ackman_output),
         }
         
         progress.update_status("bill_ackman_agent", ticker, "Done")
     
-    # Wrap results in a single message for the chain
-    message = HumanMessage(
-        content=json.dumps(ackman_analysis),
-        name="bill_ackman_agent"
-    )
-    
     # Show reasoning if requested
     if state["metadata"]["show_reasoning"]:
         show_agent_reasoning(ackman_analysis, "Bill Ackman Agent")
-    
-    # Add signals to the overall state
-    state["data"]["analyst_signals"]["bill_ackman_agent"] = ackman_analysis
 
-    return {
-        "messages": [message],
-        "data": state["data"]
-    }
+    return {"analyst_signals": {"bill_ackman_agent": ackman_analysis}}
 
 
 def analyze_business_quality(metrics: list, financial_line_items: list) -> dict:
@@ -336,19 +330,8 @@ def analyze_valuation(financial_line_items: list, market_cap: float) -> dict:
     }
 
 
-def generate_ackman_output(
-    ticker: str,
-    analysis_data: dict[str, any],
-    model_name: str,
-    model_provider: str,
-) -> BillAckmanSignal:
-    """
-    Generates investment decisions in the style of Bill Ackman.
-    """
-    template = ChatPromptTemplate.from_messages([
-        (
-            "system",
-            """You are a Bill Ackman AI agent, making investment decisions using his principles:
+ACKMAN_PROMPT = CompiledPrompt(
+    system="""You are a Bill Ackman AI agent, making investment decisions using his principles:
 
             1. Seek high-quality businesses with durable competitive advantages (moats).
             2. Prioritize consistent free cash flow and growth potential.
@@ -363,11 +346,8 @@ def generate_ackman_output(
             - Analyze balance sheet health (reasonable debt, good ROE).
             - Buy at a discount to intrinsic value; higher discount => stronger conviction.
             - Engage if management is suboptimal or if there's a path for strategic improvements.
-            - Provide a rational, data-driven recommendation (bullish, bearish, or neutral)."""
-        ),
-        (
-            "human",
-            """Based on the following analysis, create an Ackman-style investment signal.
+            - Provide a rational, data-driven recommendation (bullish, bearish, or neutral).""",
+    human="""Based on the following analysis, create an Ackman-style investment signal.
 
             Analysis Data for {ticker}:
             {analysis_data}
@@ -378,14 +358,35 @@ def generate_ackman_output(
               "confidence": float (0-100),
               "reasoning": "string"
             }}
-            """
-        )
-    ])
+            """,
+)
+
 
-    prompt = template.invoke({
-        "analysis_data": json.dumps(analysis_data, indent=2),
+def generate_ackman_output(
+    ticker: str,
+    analysis_data: dict[str, any],
+    model_name: str,
+    model_provider: str,
+    llm_skip_threshold: float | None = None,
+) -> BillAckmanSignal:
+    """
+    Generates investment decisions in the style of Bill Ackman.
+    """
+    # Skip the LLM when the rule-based score already makes the call
+    decisive_signal = get_decisive_signal(analysis_data[ticker], BillAckmanSignal, "bill_ackman_agent", model_name, model_provider, llm_skip_threshold)
+    if decisive_signal is not None:
+        return decisive_signal
+
+    prompt = ACKMAN_PROMPT.invoke({
+        "analysis_data": compact_payload(
+            analysis_data[ticker],
+            agent_name="bill_ackman_agent",
+            model_name=model_name,
+            priority=PAYLOAD_PRIORITY,
+            drop_keys=PAYLOAD_DROP_KEYS,
+        ),
         "ticker": ticker
-    })
+    }, model_provider=model_provider)
 
     def create_default_bill_ackman_signal():
         return BillAckmanSignal(
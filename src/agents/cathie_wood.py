@@ -1,13 +1,17 @@
 from langchain_openai import ChatOpenAI
 from graph.state import AgentState, show_agent_reasoning
 from tools.api import get_financial_metrics, get_market_cap, search_line_items
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.messages import HumanMessage
 from pydantic import BaseModel
-import json
 from typing_extensions import Literal
 from utils.progress import progress
-from utils.llm import call_llm
+from utils.llm import call_llm, fallback_flag, get_decisive_signal
+from utils.prompt import CompiledPrompt, compact_payload
+
+# Analysis keys from most to least important, used when the prompt payload must be truncated
+PAYLOAD_PRIORITY = ["signal", "score", "max_score", "disruptive_analysis", "innovation_analysis", "valuation_analysis"]
+# Valuation numbers the prompt already gets as text in the valuation details
+PAYLOAD_DROP_KEYS = ["intrinsic_value", "margin_of_safety"]
+
 
 class CathieWoodSignal(BaseModel):
     signal: Literal["bullish", "bearish", "neutral"]
@@ -97,30 +101,22 @@ def cathie_wood_agent(state: AgentState):
             analysis_data=analysis_data,
             model_name=state["metadata"]["model_name"],
             model_provider=state["metadata"]["model_provider"],
+            llm_skip_threshold=state["metadata"].get("llm_skip_threshold"),
         )
 
         cw_analysis[ticker] = {
             "signal": cw_output.signal,
             "confidence": cw_output.confidence,
-            "reasoning": cw_output.reasoning
+            "reasoning": cw_output.reasoning,
+            **fallback_flag(cw_output),
         }
 
         progress.update_status("cathie_wood_agent", ticker, "Done")
 
-    message = HumanMessage(
-        content=json.dumps(cw_analysis),
-        name="cathie_wood_agent"
-    )
-
     if state["metadata"].get("show_reasoning"):
         show_agent_reasoning(cw_analysis, "Cathie Wood Agent")
 
-    state["data"]["analyst_signals"]["cathie_wood_agent"] = cw_analysis
-
-    return {
-        "messages": [message],
-        "data": state["data"]
-    }
+    return {"analyst_signals": {"cathie_wood_agent": cw_analysis}}
 
 
 def analyze_disruptive_potential(metrics: list, financial_line_items: list) -> dict:
@@ -412,19 +408,8 @@ def analyze_cathie_wood_valuation(financial_line_items: list, market_cap: float)
     }
 
 
-def generate_cathie_wood_output(
-    ticker: str,
-    analysis_data: dict[str, any],
-    model_name: str,
-    model_provider: str,
-) -> CathieWoodSignal:
-    """
-    Generates investment decisions in the style of Cathie Wood.
-    """
-    template = ChatPromptTemplate.from_messages([
-        (
-            "system",
-            """You are a Cathie Wood AI agent, making investment decisions using her principles:\n\n"
+CATHIE_WOOD_PROMPT = CompiledPrompt(
+    system="""You are a Cathie Wood AI agent, making investment decisions using her principles:\n\n"
             "1. Seek companies leveraging disruptive innovation.\n"
             "2. Emphasize exponential growth potential, large TAM.\n"
             "3. Focus on technology, healthcare, or other future-facing sectors.\n"
@@ -436,22 +421,40 @@ def generate_cathie_wood_output(
             "- Evaluate strong potential for multi-year revenue growth.\n"
             "- Check if the company can scale effectively in a large market.\n"
             "- Use a growth-biased valuation approach.\n"
-            "- Provide a data-driven recommendation (bullish, bearish, or neutral)."""
-        ),
-        (
-            "human",
-            """Based on the following analysis, create a Cathie Wood-style investment signal.\n\n"
+            "- Provide a data-driven recommendation (bullish, bearish, or neutral).""",
+    human="""Based on the following analysis, create a Cathie Wood-style investment signal.\n\n"
             "Analysis Data for {ticker}:\n"
             "{analysis_data}\n\n"
             "Return the trading signal in this JSON format:\n"
-            "{{\n  \"signal\": \"bullish/bearish/neutral\",\n  \"confidence\": float (0-100),\n  \"reasoning\": \"string\"\n}}"""
-        )
-    ])
+            "{{\n  \"signal\": \"bullish/bearish/neutral\",\n  \"confidence\": float (0-100),\n  \"reasoning\": \"string\"\n}}""",
+)
+
 
-    prompt = template.invoke({
-        "analysis_data": json.dumps(analysis_data, indent=2),
+def generate_cathie_wood_output(
+    ticker: str,
+    analysis_data: dict[str, any],
+    model_name: str,
+    model_provider: str,
+    llm_skip_threshold: float | None = None,
+) -> CathieWoodSignal:
+    """
+    Generates investment decisions in the style of Cathie Wood.
+    """
+    # Skip the LLM when the rule-based score already makes the call
+    decisive_signal = get_decisive_signal(analysis_data[ticker], CathieWoodSignal, "cathie_wood_agent", model_name, model_provider, llm_skip_threshold)
+    if decisive_signal is not None:
+        return decisive_signal
+
+    prompt = CATHIE_WOOD_PROMPT.invoke({
+        "analysis_data": compact_payload(
+            analysis_data[ticker],
+            agent_name="cathie_wood_agent",
+            model_name=model_name,
+            priority=PAYLOAD_PRIORITY,
+            drop_keys=PAYLOAD_DROP_KEYS,
+        ),
         "ticker": ticker
-    })
+    }, model_provider=model_provider)
 
     def create_default_cathie_wood_signal():
         return CathieWoodSignal(
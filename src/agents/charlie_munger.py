@@ -1,13 +1,17 @@
 from langchain_openai import ChatOpenAI
 from graph.state import AgentState, show_agent_reasoning
 from tools.api import get_financial_metrics, get_market_cap, search_line_items, get_insider_trades, get_company_news
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.messages import HumanMessage
 from pydantic import BaseModel
-import json
 from typing_extensions import Literal
 from utils.progress import progress
-from utils.llm import call_llm
+from utils.llm import call_llm, fallback_flag, get_decisive_signal
+from utils.prompt import CompiledPrompt, compact_payload
+
+# Analysis keys from most to least important, used when the prompt payload must be truncated
+PAYLOAD_PRIORITY = ["signal", "score", "max_score", "moat_analysis", "management_analysis", "predictability_analysis", "valuation_analysis", "news_sentiment"]
+# Already stated in the valuation details
+PAYLOAD_DROP_KEYS = ["fcf_yield"]
+
 
 class CharlieMungerSignal(BaseModel):
     signal: Literal["bullish", "bearish", "neutral"]
@@ -127,33 +131,23 @@ def charlie_munger_agent(state: AgentState):
             analysis_data=analysis_data,
             model_name=state["metadata"]["model_name"],
             model_provider=state["metadata"]["model_provider"],
+            llm_skip_threshold=state["metadata"].get("llm_skip_threshold"),
         )
         
         munger_analysis[ticker] = {
             "signal": munger_output.signal,
             "confidence": munger_output.confidence,
-            "reasoning": munger_output.reasoning
+            "reasoning": munger_output.reasoning,
+            **fallback_flag(munger_output),
         }
         
         progress.update_status("charlie_munger_agent", ticker, "Done")
     
-    # Wrap results in a single message for the chain
-    message = HumanMessage(
-        content=json.dumps(munger_analysis),
-        name="charlie_munger_agent"
-    )
-    
     # Show reasoning if requested
     if state["metadata"]["show_reasoning"]:
         show_agent_reasoning(munger_analysis, "Charlie Munger Agent")
-    
-    # Add signals to the overall state
-    state["data"]["analyst_signals"]["charlie_munger_agent"] = munger_analysis
 
-    return {
-        "messages": [message],
-        "data": state["data"]
-    }
+    return {"analyst_signals": {"charlie_munger_agent": munger_analysis}}
 
 
 def analyze_moat_strength(metrics: list, financial_line_items: list) -> dict:
@@ -660,19 +654,8 @@ def analyze_news_sentiment(news_items: list) -> str:
     return f"Qualitative review of {len(news_items)} recent news items would be needed"
 
 
-def generate_munger_output(
-    ticker: str,
-    analysis_data: dict[str, any],
-    model_name: str,
-    model_provider: str,
-) -> CharlieMungerSignal:
-    """
-    Generates investment decisions in the style of Charlie Munger.
-    """
-    template = ChatPromptTemplate.from_messages([
-        (
-            "system",
-            """You are a Charlie Munger AI agent, making investment decisions using his principles:
+MUNGER_PROMPT = CompiledPrompt(
+    system="""You are a Charlie Munger AI agent, making investment decisions using his principles:
 
             1. Focus on the quality and predictability of the business.
             2. Rely on mental models from multiple disciplines to analyze investments.
@@ -693,11 +676,8 @@ def generate_munger_output(
             - Focus on long-term economics rather than short-term metrics.
             - Be skeptical of businesses with rapidly changing dynamics or excessive share dilution.
             - Avoid excessive leverage or financial engineering.
-            - Provide a rational, data-driven recommendation (bullish, bearish, or neutral)."""
-        ),
-        (
-            "human",
-            """Based on the following analysis, create a Munger-style investment signal.
+            - Provide a rational, data-driven recommendation (bullish, bearish, or neutral).""",
+    human="""Based on the following analysis, create a Munger-style investment signal.
 
             Analysis Data for {ticker}:
             {analysis_data}
@@ -708,14 +688,35 @@ def generate_munger_output(
               "confidence": float (0-100),
               "reasoning": "string"
             }}
-            """
-        )
-    ])
+            """,
+)
+
+
+def generate_munger_output(
+    ticker: str,
+    analysis_data: dict[str, any],
+    model_name: str,
+    model_provider: str,
+    llm_skip_threshold: float | None = None,
+) -> CharlieMungerSignal:
+    """
+    Generates investment decisions in the style of Charlie Munger.
+    """
+    # Skip the LLM when the rule-based score already makes the call
+    decisive_signal = get_decisive_signal(analysis_data[ticker], CharlieMungerSignal, "charlie_munger_agent", model_name, model_provider, llm_skip_threshold)
+    if decisive_signal is not None:
+        return decisive_signal
 
-    prompt = template.invoke({
-        "analysis_data": json.dumps(analysis_data, indent=2),
+    prompt = MUNGER_PROMPT.invoke({
+        "analysis_data": compact_payload(
+            analysis_data[ticker],
+            agent_name="charlie_munger_agent",
+            model_name=model_name,
+            priority=PAYLOAD_PRIORITY,
+            drop_keys=PAYLOAD_DROP_KEYS,
+        ),
         "ticker": ticker
-    })
+    }, model_provider=model_provider)
 
     def create_default_charlie_munger_signal():
         return CharlieMungerSignal(
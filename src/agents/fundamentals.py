@@ -1,7 +1,5 @@
-from langchain_core.messages import HumanMessage
 from graph.state import AgentState, show_agent_reasoning
 from utils.progress import progress
-import json
 
 from tools.api import get_financial_metrics
 
@@ -140,20 +138,8 @@ def fundamentals_agent(state: AgentState):
 
         progress.update_status("fundamentals_agent", ticker, "Done")
 
-    # Create the fundamental analysis message
-    message = HumanMessage(
-        content=json.dumps(fundamental_analysis),
-        name="fundamentals_agent",
-    )
-
     # Print the reasoning if the flag is set
     if state["metadata"]["show_reasoning"]:
         show_agent_reasoning(fundamental_analysis, "Fundamental Analysis Agent")
 
-    # Add the signal to the analyst_signals list
-    state["data"]["analyst_signals"]["fundamentals_agent"] = fundamental_analysis
-
-    return {
-        "messages": [message],
-        "data": data,
-    }
+    return {"analyst_signals": {"fundamentals_agent": fundamental_analysis}}
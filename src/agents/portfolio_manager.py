@@ -1,12 +1,12 @@
 import json
 from langchain_core.messages import HumanMessage
-from langchain_core.prompts import ChatPromptTemplate
 
 from graph.state import AgentState, show_agent_reasoning
 from pydantic import BaseModel, Field
 from typing_extensions import Literal
 from utils.progress import progress
 from utils.llm import call_llm
+from utils.prompt import CompiledPrompt, compact_payload
 
 
 class PortfolioDecision(BaseModel):
@@ -26,7 +26,7 @@ def portfolio_management_agent(state: AgentState):
 
     # Get the portfolio and analyst signals
     portfolio = state["data"]["portfolio"]
-    analyst_signals = state["data"]["analyst_signals"]
+    analyst_signals = state["analyst_signals"]
     tickers = state["data"]["tickers"]
 
     progress.update_status("portfolio_management_agent", None, "Analyzing signals")
@@ -60,15 +60,18 @@ def portfolio_management_agent(state: AgentState):
     progress.update_status("portfolio_management_agent", None, "Making trading decisions")
 
     # Generate the trading decision
-    result = generate_trading_decision(
-        tickers=tickers,
-        signals_by_ticker=signals_by_ticker,
-        current_prices=current_prices,
-        max_shares=max_shares,
-        portfolio=portfolio,
-        model_name=state["metadata"]["model_name"],
-        model_provider=state["metadata"]["model_provider"],
-    )
+    if state["metadata"].get("rule_only"):
+        result = generate_rule_based_decision(tickers, signals_by_ticker, max_shares, portfolio)
+    else:
+        result = generate_trading_decision(
+            tickers=tickers,
+            signals_by_ticker=signals_by_ticker,
+            current_prices=current_prices,
+            max_shares=max_shares,
+            portfolio=portfolio,
+            model_name=state["metadata"]["model_name"],
+            model_provider=state["metadata"]["model_provider"],
+        )
 
     # Create the portfolio management message
     message = HumanMessage(
@@ -82,28 +85,12 @@ def portfolio_management_agent(state: AgentState):
 
     progress.update_status("portfolio_management_agent", None, "Done")
 
-    return {
-        "messages": state["messages"] + [message],
-        "data": state["data"],
-    }
+    # Only the final decision goes into the message history
+    return {"messages": [message]}
 
 
-def generate_trading_decision(
-    tickers: list[str],
-    signals_by_ticker: dict[str, dict],
-    current_prices: dict[str, float],
-    max_shares: dict[str, int],
-    portfolio: dict[str, float],
-    model_name: str,
-    model_provider: str,
-) -> PortfolioManagerOutput:
-    """Attempts to get a decision from the LLM with retry logic"""
-    # Create the prompt template
-    template = ChatPromptTemplate.from_messages(
-        [
-            (
-              "system",
-              """You are a portfolio manager making final trading decisions based on multiple tickers.
+PORTFOLIO_MANAGER_PROMPT = CompiledPrompt(
+    system="""You are a portfolio manager making final trading decisions based on multiple tickers.
 
               Trading Rules:
               - For long positions:
@@ -137,10 +124,7 @@ def generate_trading_decision(
               - current_prices: current prices for each ticker
               - margin_requirement: current margin requirement for short positions
               """,
-            ),
-            (
-              "human",
-              """Based on the team's analysis, make your trading decisions for each ticker.
+    human="""Based on the team's analysis, make your trading decisions for each ticker.
 
               Here are the signals by ticker:
               {signals_by_ticker}
@@ -171,20 +155,30 @@ def generate_trading_decision(
                 }}
               }}
               """,
-            ),
-        ]
-    )
+)
+
+
+def generate_trading_decision(
+    tickers: list[str],
+    signals_by_ticker: dict[str, dict],
+    current_prices: dict[str, float],
+    max_shares: dict[str, int],
+    portfolio: dict[str, float],
+    model_name: str,
+    model_provider: str,
+) -> PortfolioManagerOutput:
+    """Attempts to get a decision from the LLM with retry logic"""
 
     # Generate the prompt
-    prompt = template.invoke(
+    prompt = PORTFOLIO_MANAGER_PROMPT.invoke(
         {
-            "signals_by_ticker": json.dumps(signals_by_ticker, indent=2),
-            "current_prices": json.dumps(current_prices, indent=2),
-            "max_shares": json.dumps(max_shares, indent=2),
+            "signals_by_ticker": compact_payload(signals_by_ticker, agent_name="portfolio_management_agent"),
+            "current_prices": compact_payload(current_prices, agent_name="portfolio_management_agent"),
+            "max_shares": compact_payload(max_shares, agent_name="portfolio_management_agent"),
             "portfolio_cash": f"{portfolio.get('cash', 0):.2f}",
-            "portfolio_positions": json.dumps(portfolio.get('positions', {}), indent=2),
+            "portfolio_positions": compact_payload(portfolio.get('positions', {}), agent_name="portfolio_management_agent"),
             "margin_requirement": f"{portfolio.get('margin_requirement', 0):.2f}",
-        }
+        }, model_provider=model_provider
     )
 
     # Create default factory for PortfolioManagerOutput
@@ -192,3 +186,48 @@ def generate_trading_decision(
         return PortfolioManagerOutput(decisions={ticker: PortfolioDecision(action="hold", quantity=0, confidence=0.0, reasoning="Error in portfolio management, defaulting to hold") for ticker in tickers})
 
     return call_llm(prompt=prompt, model_name=model_name, model_provider=model_provider, pydantic_model=PortfolioManagerOutput, agent_name="portfolio_management_agent", default_factory=create_default_portfolio_output)
+
+
+# Aggregate signal score (between -1 and 1) beyond which the rule-based policy opens or adds to a position
+RULE_ENTRY_THRESHOLD = 0.2
+SIGNAL_DIRECTIONS = {"bullish": 1, "bearish": -1}
+
+
+def generate_rule_based_decision(
+    tickers: list[str],
+    signals_by_ticker: dict[str, dict],
+    max_shares: dict[str, int],
+    portfolio: dict,
+) -> PortfolioManagerOutput:
+    """
+    Deterministic stand-in for the LLM portfolio manager, used in rule-only mode.
+
+    Each ticker's score is the mean of its analysts' signals (bullish +1, bearish -1, neutral 0) weighted by
+    confidence. A bullish score covers any short, otherwise buys that fraction of max_shares; a bearish
+    score sells any long, otherwise shorts that fraction of max_shares. Scores within the threshold hold.
+    """
+    decisions = {}
+    for ticker in tickers:
+        signals = signals_by_ticker.get(ticker, {})
+        score = sum(SIGNAL_DIRECTIONS.get(signal["signal"], 0) * (signal["confidence"] or 0) / 100 for signal in signals.values()) / len(signals) if signals else 0.0
+
+        position = portfolio.get("positions", {}).get(ticker, {})
+        long_shares, short_shares = position.get("long", 0), position.get("short", 0)
+        sized = int(max_shares.get(ticker, 0) * min(abs(score), 1.0))
+
+        if score >= RULE_ENTRY_THRESHOLD:
+            action, quantity = ("cover", short_shares) if short_shares > 0 else ("buy", sized)
+        elif score <= -RULE_ENTRY_THRESHOLD:
+            action, quantity = ("sell", long_shares) if long_shares > 0 else ("short", sized)
+        else:
+            action, quantity = "hold", 0
+        if quantity <= 0:
+            action, quantity = "hold", 0
+
+        decisions[ticker] = PortfolioDecision(
+            action=action,
+            quantity=quantity,
+            confidence=round(abs(score) * 100, 1),
+            reasoning=f"Confidence-weighted score of {score:+.2f} across {len(signals)} analyst signals",
+        )
+    return PortfolioManagerOutput(decisions=decisions)
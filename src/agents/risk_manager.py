@@ -1,8 +1,6 @@
-from langchain_core.messages import HumanMessage
 from graph.state import AgentState, show_agent_reasoning
 from utils.progress import progress
 from tools.api import get_prices, prices_to_df
-import json
 
 
 ##### Risk Management Agent #####
@@ -43,8 +41,8 @@ def risk_management_agent(state: AgentState):
         # Calculate total portfolio value using stored prices
         total_portfolio_value = portfolio.get("cash", 0) + sum(portfolio.get("cost_basis", {}).get(t, 0) for t in portfolio.get("cost_basis", {}))
 
-        # Base limit is 20% of portfolio for any single position
-        position_limit = total_portfolio_value * 0.20
+        # Base limit is a fixed fraction (20% by default) of portfolio for any single position
+        position_limit = total_portfolio_value * state["metadata"].get("position_limit_fraction", 0.20)
 
         # For existing positions, subtract current position value from limit
         remaining_position_limit = position_limit - current_position_value
@@ -66,18 +64,7 @@ def risk_management_agent(state: AgentState):
 
         progress.update_status("risk_management_agent", ticker, "Done")
 
-    message = HumanMessage(
-        content=json.dumps(risk_analysis),
-        name="risk_management_agent",
-    )
-
     if state["metadata"]["show_reasoning"]:
         show_agent_reasoning(risk_analysis, "Risk Management Agent")
 
-    # Add the signal to the analyst_signals list
-    state["data"]["analyst_signals"]["risk_management_agent"] = risk_analysis
-
-    return {
-        "messages": state["messages"] + [message],
-        "data": data,
-    }
+    return {"analyst_signals": {"risk_management_agent": risk_analysis}}
@@ -1,9 +1,7 @@
-from langchain_core.messages import HumanMessage
 from graph.state import AgentState, show_agent_reasoning
 from utils.progress import progress
 import pandas as pd
 import numpy as np
-import json
 
 from tools.api import get_insider_trades, get_company_news
 
@@ -81,20 +79,8 @@ def sentiment_agent(state: AgentState):
 
         progress.update_status("sentiment_agent", ticker, "Done")
 
-    # Create the sentiment message
-    message = HumanMessage(
-        content=json.dumps(sentiment_analysis),
-        name="sentiment_agent",
-    )
-
     # Print the reasoning if the flag is set
     if state["metadata"]["show_reasoning"]:
         show_agent_reasoning(sentiment_analysis, "Sentiment Analysis Agent")
 
-    # Add the signal to the analyst_signals list
-    state["data"]["analyst_signals"]["sentiment_agent"] = sentiment_analysis
-
-    return {
-        "messages": [message],
-        "data": data,
-    }
+    return {"analyst_signals": {"sentiment_agent": sentiment_analysis}}
@@ -1,10 +1,7 @@
 import math
 
-from langchain_core.messages import HumanMessage
-
 from graph.state import AgentState, show_agent_reasoning
 
-import json
 import pandas as pd
 import numpy as np
 
@@ -117,22 +114,10 @@ def technical_analyst_agent(state: AgentState):
         }
         progress.update_status("technical_analyst_agent", ticker, "Done")
 
-    # Create the technical analyst message
-    message = HumanMessage(
-        content=json.dumps(technical_analysis),
-        name="technical_analyst_agent",
-    )
-
     if state["metadata"]["show_reasoning"]:
         show_agent_reasoning(technical_analysis, "Technical Analyst")
 
-    # Add the signal to the analyst_signals list
-    state["data"]["analyst_signals"]["technical_analyst_agent"] = technical_analysis
-
-    return {
-        "messages": state["messages"] + [message],
-        "data": data,
-    }
+    return {"analyst_signals": {"technical_analyst_agent": technical_analysis}}
 
 
 def calculate_trend_signals(prices_df):
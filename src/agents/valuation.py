@@ -1,7 +1,5 @@
-from langchain_core.messages import HumanMessage
 from graph.state import AgentState, show_agent_reasoning
 from utils.progress import progress
-import json
 
 from tools.api import get_financial_metrics, get_market_cap, search_line_items
 
@@ -120,22 +118,11 @@ def valuation_agent(state: AgentState):
 
         progress.update_status("valuation_agent", ticker, "Done")
 
-    message = HumanMessage(
-        content=json.dumps(valuation_analysis),
-        name="valuation_agent",
-    )
-
     # Print the reasoning if the flag is set
     if state["metadata"]["show_reasoning"]:
         show_agent_reasoning(valuation_analysis, "Valuation Analysis Agent")
 
-    # Add the signal to the analyst_signals list
-    state["data"]["analyst_signals"]["valuation_agent"] = valuation_analysis
-
-    return {
-        "messages": [message],
-        "data": data,
-    }
+    return {"analyst_signals": {"valuation_agent": valuation_analysis}}
 
 
 def calculate_owner_earnings_value(
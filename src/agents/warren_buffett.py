@@ -1,14 +1,18 @@
 from graph.state import AgentState, show_agent_reasoning
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.messages import HumanMessage
 from pydantic import BaseModel
-import json
 from typing_extensions import Literal
 from tools.api import get_financial_metrics, get_market_cap, search_line_items
-from utils.llm import call_llm
+from utils.llm import call_llm, fallback_flag, get_decisive_signal
+from utils.prompt import CompiledPrompt, compact_payload
 from utils.progress import progress
 
 
+# Analysis keys from most to least important, used when the prompt payload must be truncated
+PAYLOAD_PRIORITY = ["signal", "score", "max_score", "margin_of_safety", "intrinsic_value_analysis", "fundamental_analysis", "consistency_analysis", "market_cap"]
+# Analysis keys the prompt does not need (e.g. the raw metrics dump)
+PAYLOAD_DROP_KEYS = ["metrics"]
+
+
 class WarrenBuffettSignal(BaseModel):
     signal: Literal["bullish", "bearish", "neutral"]
     confidence: float
@@ -101,6 +105,7 @@ def warren_buffett_agent(state: AgentState):
             analysis_data=analysis_data,
             model_name=state["metadata"]["model_name"],
             model_provider=state["metadata"]["model_provider"],
+            llm_skip_threshold=state["metadata"].get("llm_skip_threshold"),
         )
 
         # Store analysis in consistent format with other agents
@@ -108,21 +113,16 @@ def warren_buffett_agent(state: AgentState):
             "signal": buffett_output.signal,
             "confidence": buffett_output.confidence,
             "reasoning": buffett_output.reasoning,
+            **fallback_flag(buffett_output),
         }
 
         progress.update_status("warren_buffett_agent", ticker, "Done")
 
-    # Create the message
-    message = HumanMessage(content=json.dumps(buffett_analysis), name="warren_buffett_agent")
-
     # Show reasoning if requested
     if state["metadata"]["show_reasoning"]:
         show_agent_reasoning(buffett_analysis, "Warren Buffett Agent")
 
-    # Add the signal to the analyst_signals list
-    state["data"]["analyst_signals"]["warren_buffett_agent"] = buffett_analysis
-
-    return {"messages": [message], "data": state["data"]}
+    return {"analyst_signals": {"warren_buffett_agent": buffett_analysis}}
 
 
 def analyze_fundamentals(metrics: list) -> dict[str, any]:
@@ -284,18 +284,8 @@ def calculate_intrinsic_value(financial_line_items: list) -> dict[str, any]:
     }
 
 
-def generate_buffett_output(
-    ticker: str,
-    analysis_data: dict[str, any],
-    model_name: str,
-    model_provider: str,
-) -> WarrenBuffettSignal:
-    """Get investment decision from LLM with Buffett's principles"""
-    template = ChatPromptTemplate.from_messages(
-        [
-            (
-                "system",
-                """You are a Warren Buffett AI agent. Decide on investment signals based on Warren Buffett’s principles:
+BUFFETT_PROMPT = CompiledPrompt(
+    system="""You are a Warren Buffett AI agent. Decide on investment signals based on Warren Buffett’s principles:
 
                 Circle of Competence: Only invest in businesses you understand
                 Margin of Safety: Buy well below intrinsic value
@@ -312,10 +302,7 @@ def generate_buffett_output(
                 - Hold good businesses long term
                 - Sell when fundamentals deteriorate or the valuation is too high
                 """,
-            ),
-            (
-                "human",
-                """Based on the following data, create the investment signal as Warren Buffett would.
+    human="""Based on the following data, create the investment signal as Warren Buffett would.
 
                 Analysis Data for {ticker}:
                 {analysis_data}
@@ -327,15 +314,33 @@ def generate_buffett_output(
                   "reasoning": "string"
                 }}
             """,
-            ),
-        ]
-    )
+)
+
+
+def generate_buffett_output(
+    ticker: str,
+    analysis_data: dict[str, any],
+    model_name: str,
+    model_provider: str,
+    llm_skip_threshold: float | None = None,
+) -> WarrenBuffettSignal:
+    """Get investment decision from LLM with Buffett's principles"""
+    # Skip the LLM when the rule-based score already makes the call
+    decisive_signal = get_decisive_signal(analysis_data[ticker], WarrenBuffettSignal, "warren_buffett_agent", model_name, model_provider, llm_skip_threshold)
+    if decisive_signal is not None:
+        return decisive_signal
 
     # Generate the prompt
-    prompt = template.invoke({
-        "analysis_data": json.dumps(analysis_data, indent=2), 
+    prompt = BUFFETT_PROMPT.invoke({
+        "analysis_data": compact_payload(
+            analysis_data[ticker],
+            agent_name="warren_buffett_agent",
+            model_name=model_name,
+            priority=PAYLOAD_PRIORITY,
+            drop_keys=PAYLOAD_DROP_KEYS,
+        ),
         "ticker": ticker
-      })
+      }, model_provider=model_provider)
 
     # Create default factory for WarrenBuffettSignal
     def create_default_warren_buffett_signal():
@@ -1,26 +1,34 @@
+import contextlib
+import hashlib
+import json
+import os
 import sys
 
 from datetime import datetime, timedelta
 from dateutil.relativedelta import relativedelta
-import questionary
 
 import matplotlib.pyplot as plt
+import numpy as np
 import pandas as pd
 from colorama import Fore, Style, init
-import numpy as np
 import itertools
 
-from llm.models import LLM_ORDER, get_model_info
-from utils.analysts import ANALYST_ORDER
-from main import run_hedge_fund
+from backtesting.ledger import PortfolioLedger
+from backtesting.metrics import PerformanceAccumulator
+from backtesting.prices import PriceMatrix
+from backtesting.signals import precompute_analyst_signals
+from backtesting.trade_log import BacktestLog
+from data.signal_store import signal_store
+from main import delete_checkpoint_thread, run_hedge_fund
 from tools.api import (
     get_company_news,
-    get_price_data,
     get_prices,
     get_financial_metrics,
     get_insider_trades,
 )
-from utils.display import print_backtest_results, format_backtest_row
+from utils.display import BacktestRenderer, print_llm_usage
+from utils.metrics import llm_metrics
+from utils.cli import add_common_arguments, parse_args, select_analysts, select_model
 from typing_extensions import Callable
 
 init(autoreset=True)
@@ -38,6 +46,17 @@ class Backtester:
         model_provider: str = "OpenAI",
         selected_analysts: list[str] = [],
         initial_margin_requirement: float = 0.0,
+        llm_skip_threshold: float | None = None,
+        checkpoint_dir: str | None = None,
+        reuse_unchanged_analysts: bool = True,
+        workers: int = 1,
+        position_limit_fraction: float = 0.20,
+        lookback_days: int = 30,
+        quiet: bool = False,
+        rows_path: str | None = None,
+        log_dir: str | None = None,
+        rule_only: bool = False,
+        analyst_signals: dict[str, dict] | None = None,
     ):
         """
         :param agent: The trading agent (Callable).
@@ -49,6 +68,17 @@ class Backtester:
         :param model_provider: Which LLM provider (OpenAI, etc).
         :param selected_analysts: List of analyst names or IDs to incorporate.
         :param initial_margin_requirement: The margin ratio (e.g. 0.5 = 50%).
+        :param llm_skip_threshold: Score fraction at which persona agents skip the LLM (None = never).
+        :param checkpoint_dir: Directory for per-day checkpoints, so an interrupted run with the same config resumes.
+        :param reuse_unchanged_analysts: Reuse the previous day's analyst output for tickers whose inputs did not change.
+        :param workers: With more than 1, compute all analyst signals up front on this many processes, then trade day by day.
+        :param position_limit_fraction: Largest single position the risk manager allows, as a fraction of portfolio value.
+        :param lookback_days: Calendar days of history the agents see before each trading day.
+        :param quiet: Don't print the daily rows and running summary.
+        :param rows_path: CSV file that every day's rows are appended to.
+        :param log_dir: Directory for Parquet logs of the trades, daily positions and equity curve (requires pyarrow).
+        :param rule_only: Trade on the analysts' rule-based signals with a deterministic portfolio policy, without any LLM calls.
+        :param analyst_signals: Analyst signals by date from precompute_signals(); the analysts are then not run at all.
         """
         self.agent = agent
         self.tickers = tickers
@@ -58,31 +88,58 @@ class Backtester:
         self.model_name = model_name
         self.model_provider = model_provider
         self.selected_analysts = selected_analysts
+        self.llm_skip_threshold = llm_skip_threshold
+        self.reuse_unchanged_analysts = reuse_unchanged_analysts
+        self.workers = workers
+        self.position_limit_fraction = position_limit_fraction
+        self.lookback_days = lookback_days
+        self.renderer = BacktestRenderer(quiet=quiet, rows_path=rows_path)
+        self.log_dir = log_dir
+        self.log = None
+        self.rule_only = rule_only
+        self.analyst_signals = analyst_signals
 
         # Store the margin ratio (e.g. 0.5 means 50% margin required).
         self.margin_ratio = initial_margin_requirement
 
+        # Per-agent LLM usage for the most recent run
+        self.llm_usage = {}
+        # Final graph state size in bytes for each simulated day, when MAX_STATE_BYTES turns measuring on
+        self.state_sizes = []
+        # Decisions and analyst signals for each simulated day
+        self.analyst_outputs = {}
+
+        # Checkpoints are keyed by the backtest configuration, so only an identical rerun resumes from them
+        self.checkpoint_dir = checkpoint_dir
+        self.checkpoint_id = None
+        if checkpoint_dir:
+            config = {
+                "tickers": tickers,
+                "start_date": start_date,
+                "end_date": end_date,
+                "initial_capital": initial_capital,
+                "model_name": model_name,
+                "model_provider": model_provider,
+                "selected_analysts": selected_analysts,
+                "initial_margin_requirement": initial_margin_requirement,
+                "llm_skip_threshold": llm_skip_threshold,
+                "position_limit_fraction": position_limit_fraction,
+                "lookback_days": lookback_days,
+                "rule_only": rule_only,
+            }
+            self.checkpoint_id = hashlib.sha256(json.dumps(config, sort_keys=True).encode()).hexdigest()[:16]
+            os.makedirs(checkpoint_dir, exist_ok=True)
+
         # Initialize portfolio with support for long/short positions
         self.portfolio_values = []
-        self.portfolio = {
-            "cash": initial_capital,
-            "margin_used": 0.0,  # total margin usage across all short positions
-            "positions": {
-                ticker: {
-                    "long": 0,               # Number of shares held long
-                    "short": 0,              # Number of shares held short
-                    "long_cost_basis": 0.0,  # Average cost basis per share (long)
-                    "short_cost_basis": 0.0, # Average cost basis per share (short)
-                    "short_margin_used": 0.0 # Dollars of margin used for this ticker's short
-                } for ticker in tickers
-            },
-            "realized_gains": {
-                ticker: {
-                    "long": 0.0,   # Realized gains from long positions
-                    "short": 0.0,  # Realized gains from short positions
-                } for ticker in tickers
-            }
-        }
+        # Running Sharpe/Sortino/drawdown over self.portfolio_values
+        self.performance = PerformanceAccumulator()
+        self.ledger = PortfolioLedger(tickers, initial_capital, initial_margin_requirement)
+
+    @property
+    def portfolio(self) -> dict:
+        """Snapshot of the portfolio in the nested dict format the agents read."""
+        return self.ledger.to_portfolio()
 
     def execute_trade(self, ticker: str, action: str, quantity: float, current_price: float):
         """
@@ -90,162 +147,7 @@ class Backtester:
         `quantity` is the number of shares the agent wants to buy/sell/short/cover.
         We will only trade integer shares to keep it simple.
         """
-        if quantity <= 0:
-            return 0
-
-        quantity = int(quantity)  # force integer shares
-        position = self.portfolio["positions"][ticker]
-
-        if action == "buy":
-            cost = quantity * current_price
-            if cost <= self.portfolio["cash"]:
-                # Weighted average cost basis for the new total
-                old_shares = position["long"]
-                old_cost_basis = position["long_cost_basis"]
-                new_shares = quantity
-                total_shares = old_shares + new_shares
-
-                if total_shares > 0:
-                    total_old_cost = old_cost_basis * old_shares
-                    total_new_cost = cost
-                    position["long_cost_basis"] = (total_old_cost + total_new_cost) / total_shares
-
-                position["long"] += quantity
-                self.portfolio["cash"] -= cost
-                return quantity
-            else:
-                # Calculate maximum affordable quantity
-                max_quantity = int(self.portfolio["cash"] / current_price)
-                if max_quantity > 0:
-                    cost = max_quantity * current_price
-                    old_shares = position["long"]
-                    old_cost_basis = position["long_cost_basis"]
-                    total_shares = old_shares + max_quantity
-
-                    if total_shares > 0:
-                        total_old_cost = old_cost_basis * old_shares
-                        total_new_cost = cost
-                        position["long_cost_basis"] = (total_old_cost + total_new_cost) / total_shares
-
-                    position["long"] += max_quantity
-                    self.portfolio["cash"] -= cost
-                    return max_quantity
-                return 0
-
-        elif action == "sell":
-            # You can only sell as many as you own
-            quantity = min(quantity, position["long"])
-            if quantity > 0:
-                # Realized gain/loss using average cost basis
-                avg_cost_per_share = position["long_cost_basis"] if position["long"] > 0 else 0
-                realized_gain = (current_price - avg_cost_per_share) * quantity
-                self.portfolio["realized_gains"][ticker]["long"] += realized_gain
-
-                position["long"] -= quantity
-                self.portfolio["cash"] += quantity * current_price
-
-                if position["long"] == 0:
-                    position["long_cost_basis"] = 0.0
-
-                return quantity
-
-        elif action == "short":
-            """
-            Typical short sale flow:
-              1) Receive proceeds = current_price * quantity
-              2) Post margin_required = proceeds * margin_ratio
-              3) Net effect on cash = +proceeds - margin_required
-            """
-            proceeds = current_price * quantity
-            margin_required = proceeds * self.margin_ratio
-            if margin_required <= self.portfolio["cash"]:
-                # Weighted average short cost basis
-                old_short_shares = position["short"]
-                old_cost_basis = position["short_cost_basis"]
-                new_shares = quantity
-                total_shares = old_short_shares + new_shares
-
-                if total_shares > 0:
-                    total_old_cost = old_cost_basis * old_short_shares
-                    total_new_cost = current_price * new_shares
-                    position["short_cost_basis"] = (total_old_cost + total_new_cost) / total_shares
-
-                position["short"] += quantity
-
-                # Update margin usage
-                position["short_margin_used"] += margin_required
-                self.portfolio["margin_used"] += margin_required
-
-                # Increase cash by proceeds, then subtract the required margin
-                self.portfolio["cash"] += proceeds
-                self.portfolio["cash"] -= margin_required
-                return quantity
-            else:
-                # Calculate maximum shortable quantity
-                if self.margin_ratio > 0:
-                    max_quantity = int(self.portfolio["cash"] / (current_price * self.margin_ratio))
-                else:
-                    max_quantity = 0
-
-                if max_quantity > 0:
-                    proceeds = current_price * max_quantity
-                    margin_required = proceeds * self.margin_ratio
-
-                    old_short_shares = position["short"]
-                    old_cost_basis = position["short_cost_basis"]
-                    total_shares = old_short_shares + max_quantity
-
-                    if total_shares > 0:
-                        total_old_cost = old_cost_basis * old_short_shares
-                        total_new_cost = current_price * max_quantity
-                        position["short_cost_basis"] = (total_old_cost + total_new_cost) / total_shares
-
-                    position["short"] += max_quantity
-                    position["short_margin_used"] += margin_required
-                    self.portfolio["margin_used"] += margin_required
-
-                    self.portfolio["cash"] += proceeds
-                    self.portfolio["cash"] -= margin_required
-                    return max_quantity
-                return 0
-
-        elif action == "cover":
-            """
-            When covering shares:
-              1) Pay cover cost = current_price * quantity
-              2) Release a proportional share of the margin
-              3) Net effect on cash = -cover_cost + released_margin
-            """
-            quantity = min(quantity, position["short"])
-            if quantity > 0:
-                cover_cost = quantity * current_price
-                avg_short_price = position["short_cost_basis"] if position["short"] > 0 else 0
-                realized_gain = (avg_short_price - current_price) * quantity
-
-                if position["short"] > 0:
-                    portion = quantity / position["short"]
-                else:
-                    portion = 1.0
-
-                margin_to_release = portion * position["short_margin_used"]
-
-                position["short"] -= quantity
-                position["short_margin_used"] -= margin_to_release
-                self.portfolio["margin_used"] -= margin_to_release
-
-                # Pay the cost to cover, but get back the released margin
-                self.portfolio["cash"] += margin_to_release
-                self.portfolio["cash"] -= cover_cost
-
-                self.portfolio["realized_gains"][ticker]["short"] += realized_gain
-
-                if position["short"] == 0:
-                    position["short_cost_basis"] = 0.0
-                    position["short_margin_used"] = 0.0
-
-                return quantity
-
-        return 0
+        return self.ledger.execute_trade(ticker, action, quantity, current_price)
 
     def calculate_portfolio_value(self, current_prices):
         """
@@ -254,29 +156,15 @@ class Backtester:
           - market value of long positions
           - unrealized gains/losses for short positions
         """
-        total_value = self.portfolio["cash"]
-
-        for ticker in self.tickers:
-            position = self.portfolio["positions"][ticker]
-            price = current_prices[ticker]
-
-            # Long position value
-            long_value = position["long"] * price
-            total_value += long_value
-
-            # Short position unrealized PnL = short_shares * (short_cost_basis - current_price)
-            if position["short"] > 0:
-                total_value += position["short"] * (position["short_cost_basis"] - price)
-
-        return total_value
+        return self.ledger.total_value(self.ledger.prices_array(current_prices))
 
     def prefetch_data(self):
         """Pre-fetch all data needed for the backtest period."""
         print("\nPre-fetching data for the entire backtest period...")
 
-        # Convert end_date string to datetime, fetch up to 1 year before
+        # Convert end_date string to datetime, fetch up to 1 year before (or from the first lookback, if earlier)
         end_date_dt = datetime.strptime(self.end_date, "%Y-%m-%d")
-        start_date_dt = end_date_dt - relativedelta(years=1)
+        start_date_dt = min(end_date_dt - relativedelta(years=1), datetime.strptime(self.start_date, "%Y-%m-%d") - timedelta(days=self.lookback_days))
         start_date_str = start_date_dt.strftime("%Y-%m-%d")
 
         for ticker in self.tickers:
@@ -294,6 +182,62 @@ class Backtester:
 
         print("Data pre-fetch complete.")
 
+    def _checkpoint_path(self, extension: str) -> str:
+        return os.path.join(self.checkpoint_dir, f"backtest_{self.checkpoint_id}.{extension}")
+
+    def save_checkpoint(self, last_completed_date: str, performance_metrics: dict, state_size: int | None = None):
+        """
+        Append the completed day to the checkpoint log: the portfolio after the day plus that day's value,
+        outputs and metrics. Earlier days are never rewritten, so each save costs the same.
+        """
+        row = self.portfolio_values[-1]
+        record = {
+            "last_completed_date": last_completed_date,
+            "portfolio": self.portfolio,
+            "portfolio_value": {**row, "Date": row["Date"].isoformat()},
+            "analyst_outputs": self.analyst_outputs[last_completed_date],
+            "state_size": state_size,
+            "performance_metrics": performance_metrics,
+        }
+        # NumPy scalars come through from price data
+        line = json.dumps(record, default=lambda obj: obj.item() if hasattr(obj, "item") else str(obj))
+        with open(self._checkpoint_path("jsonl"), "a") as f:
+            f.write(line + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def load_checkpoint(self) -> dict | None:
+        """Replay the checkpoint log written by save_checkpoint, if this configuration has one. Returns the last day's record."""
+        path = self._checkpoint_path("jsonl") if self.checkpoint_id else None
+        if not path or not os.path.exists(path):
+            return None
+
+        records = []
+        valid_bytes = 0
+        with open(path, "rb") as f:
+            for line in f:
+                # A line cut short by an interruption is dropped, so the next day appends after the last whole one
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    break
+                valid_bytes += len(line)
+        if os.path.getsize(path) != valid_bytes:
+            with open(path, "r+b") as f:
+                f.truncate(valid_bytes)
+        if not records:
+            return None
+
+        checkpoint = records[-1]
+        self.ledger = PortfolioLedger.from_portfolio(checkpoint["portfolio"], self.tickers, self.margin_ratio)
+        self.portfolio_values.extend({**record["portfolio_value"], "Date": pd.Timestamp(record["portfolio_value"]["Date"])} for record in records)
+        self._reset_performance()
+        self.analyst_outputs = {record["last_completed_date"]: record["analyst_outputs"] for record in records}
+        self.state_sizes = [record["state_size"] for record in records if record["state_size"] is not None]
+        return checkpoint
+
     def parse_agent_response(self, agent_output):
         """Parse JSON output from the agent (fallback to 'hold' if invalid)."""
         import json
@@ -306,11 +250,60 @@ class Backtester:
             return {"action": "hold", "quantity": 0}
 
     def run_backtest(self):
+        self.log = None
+        self.renderer.start()
+        try:
+            return self._run_backtest()
+        finally:
+            self.renderer.stop()
+            if self.log:
+                self.log.close()
+
+    def _load_price_matrix(self, dates) -> PriceMatrix:
+        # Closes for every day up front; the lookback lets the first days forward-fill from before start_date
+        price_start = (datetime.strptime(self.start_date, "%Y-%m-%d") - timedelta(days=self.lookback_days)).strftime("%Y-%m-%d")
+        return PriceMatrix.load(self.tickers, dates, price_start, self.end_date)
+
+    def precompute_signals(self, max_workers: int | None = None, signal_store_path: str | None = None) -> dict[str, dict]:
+        """
+        Analyst signals for every trading day of this backtest, computed on a process pool. Backtests that
+        differ only in portfolio or risk settings can all be given them as analyst_signals.
+        """
+        self.prefetch_data()
+        dates = pd.date_range(self.start_date, self.end_date, freq="B")
+        return self._precompute_signals(dates, self._load_price_matrix(dates), max_workers, signal_store_path=signal_store_path)
+
+    def _precompute_signals(self, dates, price_matrix: PriceMatrix, max_workers: int | None, resume_after: str | None = None, signal_store_path: str | None = None) -> dict[str, dict]:
+        trading_days = [
+            date for date in dates
+            if not (resume_after and date.strftime("%Y-%m-%d") <= resume_after) and price_matrix.is_trading_day(date)
+        ]
+        windows = [((date - timedelta(days=self.lookback_days)).strftime("%Y-%m-%d"), date.strftime("%Y-%m-%d")) for date in trading_days]
+        tickers_by_date = {
+            date.strftime("%Y-%m-%d"): [ticker for ticker, is_listed in zip(self.tickers, price_matrix.listed(date)) if is_listed]
+            for date in trading_days
+        }
+        return precompute_analyst_signals(
+            self.tickers,
+            windows,
+            self.selected_analysts,
+            self.model_name,
+            self.model_provider,
+            llm_skip_threshold=self.llm_skip_threshold,
+            reuse_unchanged_analysts=self.reuse_unchanged_analysts,
+            max_workers=max_workers,
+            rule_only=self.rule_only,
+            signal_store_path=signal_store_path,
+            tickers_by_date=tickers_by_date,
+        )
+
+    def _run_backtest(self):
         # Pre-fetch all data at the start
         self.prefetch_data()
+        usage_run = llm_metrics.start_run()
 
         dates = pd.date_range(self.start_date, self.end_date, freq="B")
-        table_rows = []
+        price_matrix = self._load_price_matrix(dates)
         performance_metrics = {
             'sharpe_ratio': None,
             'sortino_ratio': None,
@@ -327,92 +320,122 @@ class Backtester:
             self.portfolio_values = [{"Date": dates[0], "Portfolio Value": self.initial_capital}]
         else:
             self.portfolio_values = []
+        self._reset_performance()
+
+        # Resume after the last day completed by an interrupted run with the same config
+        resume_after = None
+        checkpoint = self.load_checkpoint()
+        if checkpoint:
+            resume_after = checkpoint["last_completed_date"]
+            performance_metrics = checkpoint["performance_metrics"]
+            print(f"Resuming from checkpoint after {resume_after}")
+
+        # Every run writes its own log files, e.g. 20240102T093000_1234_trades.parquet; a checkpointed run
+        # is named after its checkpoint, so resuming continues the same files
+        run_id = self.checkpoint_id or f"{datetime.now():%Y%m%dT%H%M%S}_{os.getpid()}"
+        self.log = BacktestLog.open(self.log_dir, run_id, resume_after=resume_after)
+
+        # Analysts do not read the portfolio, so with several workers their signals for every remaining
+        # day are computed in parallel first, and the loop below only runs risk and portfolio management
+        precomputed_signals = self.analyst_signals
+        if precomputed_signals is None and self.workers > 1:
+            precomputed_signals = self._precompute_signals(dates, price_matrix, self.workers, resume_after)
 
         for current_date in dates:
-            lookback_start = (current_date - timedelta(days=30)).strftime("%Y-%m-%d")
+            lookback_start = (current_date - timedelta(days=self.lookback_days)).strftime("%Y-%m-%d")
             current_date_str = current_date.strftime("%Y-%m-%d")
-            previous_date_str = (current_date - timedelta(days=1)).strftime("%Y-%m-%d")
+
+            if resume_after and current_date_str <= resume_after:
+                continue
 
             # Skip if there's no prior day to look back (i.e., first date in the range)
             if lookback_start == current_date_str:
                 continue
 
-            # Get current prices for all tickers
-            try:
-                current_prices = {
-                    ticker: get_price_data(ticker, previous_date_str, current_date_str).iloc[-1]["close"]
-                    for ticker in self.tickers
-                }
-            except Exception:
-                # If data is missing or there's an API error, skip this day
-                print(f"Error fetching prices between {previous_date_str} and {current_date_str}")
+            # Skip market holidays; gaps in single tickers are forward-filled
+            if not price_matrix.is_trading_day(current_date):
+                print(f"No prices for {current_date_str}, skipping")
                 continue
+            # Tickers that have not started trading yet are left out of the day; holding none of them,
+            # the ledger values them at zero
+            listed = price_matrix.listed(current_date)
+            listed_tickers = [ticker for ticker, is_listed in zip(self.tickers, listed) if is_listed]
+            prices = np.nan_to_num(price_matrix.prices_at(current_date))
 
             # ---------------------------------------------------------------
             # 1) Execute the agent's trades
             # ---------------------------------------------------------------
+            agent_kwargs = {}
+            if self.checkpoint_id:
+                # Node results are checkpointed per day, so an interrupted day resumes at its last completed node
+                agent_kwargs = {"checkpoint_path": self._checkpoint_path("sqlite"), "thread_id": f"{self.checkpoint_id}:{current_date_str}"}
+            if precomputed_signals is not None:
+                agent_kwargs["analyst_signals"] = precomputed_signals[current_date_str]
+                if "thread_id" in agent_kwargs:
+                    # The decisions-only graph keeps its node results apart from the full graph's
+                    agent_kwargs["thread_id"] += ":decisions"
+
             output = self.agent(
-                tickers=self.tickers,
+                tickers=listed_tickers,
                 start_date=lookback_start,
                 end_date=current_date_str,
                 portfolio=self.portfolio,
                 model_name=self.model_name,
                 model_provider=self.model_provider,
                 selected_analysts=self.selected_analysts,
+                llm_skip_threshold=self.llm_skip_threshold,
+                reuse_unchanged_analysts=self.reuse_unchanged_analysts,
+                position_limit_fraction=self.position_limit_fraction,
+                rule_only=self.rule_only,
+                quiet=self.renderer.quiet,
+                **agent_kwargs,
             )
             decisions = output["decisions"]
             analyst_signals = output["analyst_signals"]
+            state_size = output.get("state_size")
+            if state_size is not None:
+                self.state_sizes.append(state_size)
+            self.analyst_outputs[current_date_str] = {"decisions": decisions, "analyst_signals": analyst_signals}
 
             # Execute trades for each ticker
             executed_trades = {}
-            for ticker in self.tickers:
+            for i, ticker in enumerate(self.tickers):
+                if not listed[i]:
+                    continue
                 decision = decisions.get(ticker, {"action": "hold", "quantity": 0})
                 action, quantity = decision.get("action", "hold"), decision.get("quantity", 0)
 
-                executed_quantity = self.execute_trade(ticker, action, quantity, current_prices[ticker])
+                executed_quantity = self.execute_trade(ticker, action, quantity, float(prices[i]))
                 executed_trades[ticker] = executed_quantity
 
             # ---------------------------------------------------------------
             # 2) Now that trades have executed trades, recalculate the final
             #    portfolio value for this day.
             # ---------------------------------------------------------------
-            total_value = self.calculate_portfolio_value(current_prices)
-
-            # Also compute long/short exposures for final post‐trade state
-            long_exposure = sum(
-                self.portfolio["positions"][t]["long"] * current_prices[t]
-                for t in self.tickers
-            )
-            short_exposure = sum(
-                self.portfolio["positions"][t]["short"] * current_prices[t]
-                for t in self.tickers
-            )
-
-            # Calculate gross and net exposures
-            gross_exposure = long_exposure + short_exposure
-            net_exposure = long_exposure - short_exposure
-            long_short_ratio = (
-                long_exposure / short_exposure if short_exposure > 1e-9 else float('inf')
-            )
+            total_value = self.ledger.total_value(prices)
 
-            # Track each day's portfolio value in self.portfolio_values
+            # Track each day's portfolio value and post-trade exposures in self.portfolio_values
+            exposures = self.ledger.exposures(prices)
             self.portfolio_values.append({
                 "Date": current_date,
                 "Portfolio Value": total_value,
-                "Long Exposure": long_exposure,
-                "Short Exposure": short_exposure,
-                "Gross Exposure": gross_exposure,
-                "Net Exposure": net_exposure,
-                "Long/Short Ratio": long_short_ratio
+                **exposures,
             })
+            self.performance.update(total_value, current_date)
+
+            if self.log:
+                self._log_day(current_date.date(), decisions, executed_trades, prices, total_value, exposures, listed)
 
             # ---------------------------------------------------------------
-            # 3) Build the table rows to display
+            # 3) Build the rows to display, as raw values
             # ---------------------------------------------------------------
             date_rows = []
 
             # For each ticker, record signals/trades
-            for ticker in self.tickers:
+            net_shares = self.ledger.long - self.ledger.short
+            for i, ticker in enumerate(self.tickers):
+                if not listed[i]:
+                    continue
                 ticker_signals = {}
                 for agent_name, signals in analyst_signals.items():
                     if ticker in signals:
@@ -422,112 +445,107 @@ class Backtester:
                 bearish_count = len([s for s in ticker_signals.values() if s.get("signal", "").lower() == "bearish"])
                 neutral_count = len([s for s in ticker_signals.values() if s.get("signal", "").lower() == "neutral"])
 
-                # Calculate net position value
-                pos = self.portfolio["positions"][ticker]
-                long_val = pos["long"] * current_prices[ticker]
-                short_val = pos["short"] * current_prices[ticker]
-                net_position_value = long_val - short_val
-
-                # Get the action and quantity from the decisions
-                action = decisions.get(ticker, {}).get("action", "hold")
-                quantity = executed_trades.get(ticker, 0)
-                
-                # Append the agent action to the table rows
-                date_rows.append(
-                    format_backtest_row(
-                        date=current_date_str,
-                        ticker=ticker,
-                        action=action,
-                        quantity=quantity,
-                        price=current_prices[ticker],
-                        shares_owned=pos["long"] - pos["short"],  # net shares
-                        position_value=net_position_value,
-                        bullish_count=bullish_count,
-                        bearish_count=bearish_count,
-                        neutral_count=neutral_count,
-                    )
-                )
+                date_rows.append({
+                    "date": current_date_str,
+                    "ticker": ticker,
+                    "action": decisions.get(ticker, {}).get("action", "hold"),
+                    "quantity": executed_trades.get(ticker, 0),
+                    "price": float(prices[i]),
+                    "shares_owned": int(net_shares[i]),  # net shares
+                    "position_value": float(net_shares[i] * prices[i]),  # net position value
+                    "bullish_count": bullish_count,
+                    "bearish_count": bearish_count,
+                    "neutral_count": neutral_count,
+                })
+
             # ---------------------------------------------------------------
             # 4) Calculate performance summary metrics
             # ---------------------------------------------------------------
-            total_realized_gains = sum(
-                self.portfolio["realized_gains"][t]["long"] +
-                self.portfolio["realized_gains"][t]["short"]
-                for t in self.tickers
-            )
+            total_realized_gains = self.ledger.total_realized_gains()
 
             # Calculate cumulative return vs. initial capital
             portfolio_return = ((total_value + total_realized_gains) / self.initial_capital - 1) * 100
 
-            # Add summary row for this day
-            date_rows.append(
-                format_backtest_row(
-                    date=current_date_str,
-                    ticker="",
-                    action="",
-                    quantity=0,
-                    price=0,
-                    shares_owned=0,
-                    position_value=0,
-                    bullish_count=0,
-                    bearish_count=0,
-                    neutral_count=0,
-                    is_summary=True,
-                    total_value=total_value,
-                    return_pct=portfolio_return,
-                    cash_balance=self.portfolio["cash"],
-                    total_position_value=total_value - self.portfolio["cash"],
-                    sharpe_ratio=performance_metrics["sharpe_ratio"],
-                    sortino_ratio=performance_metrics["sortino_ratio"],
-                    max_drawdown=performance_metrics["max_drawdown"],
-                ),
-            )
-
-            table_rows.extend(date_rows)
-            print_backtest_results(table_rows)
-
             # Update performance metrics if we have enough data
             if len(self.portfolio_values) > 3:
                 self._update_performance_metrics(performance_metrics)
 
+            self.renderer.add_day(date_rows, {
+                "date": current_date_str,
+                "total_value": total_value,
+                "return_pct": portfolio_return,
+                "cash_balance": self.ledger.cash,
+                "total_position_value": total_value - self.ledger.cash,
+                "sharpe_ratio": performance_metrics["sharpe_ratio"],
+                "sortino_ratio": performance_metrics["sortino_ratio"],
+                "max_drawdown": performance_metrics["max_drawdown"],
+            })
+
+            if self.checkpoint_id:
+                self.save_checkpoint(current_date_str, performance_metrics, state_size)
+                # The day is in the checkpoint log now, so its node results are no longer needed
+                if "thread_id" in agent_kwargs:
+                    delete_checkpoint_thread(agent_kwargs["checkpoint_path"], agent_kwargs["thread_id"])
+
+        # Report which agents dominated LLM cost and wall time over the whole run
+        self.llm_usage = llm_metrics.summarize(usage_run)
+        llm_metrics.end_run(usage_run)
+        print_llm_usage(self.llm_usage)
+        llm_metrics.export()
+
+        if self.state_sizes:
+            print(f"Graph state size per day: max {max(self.state_sizes) / 1024:.1f} KiB, mean {sum(self.state_sizes) / len(self.state_sizes) / 1024:.1f} KiB")
+
         return performance_metrics
 
+    def _log_day(self, date, decisions: dict, executed_trades: dict, prices, total_value: float, exposures: dict, listed):
+        """Append the day's executed trades, position snapshot of the listed tickers and equity point to the columnar log."""
+        traded = [(i, ticker) for i, ticker in enumerate(self.tickers) if executed_trades.get(ticker)]
+        if traded:
+            self.log.append("trades", {
+                "date": [date] * len(traded),
+                "ticker": [ticker for _, ticker in traded],
+                "action": [decisions[ticker].get("action", "hold") for _, ticker in traded],
+                "requested_quantity": [float(decisions[ticker].get("quantity", 0)) for _, ticker in traded],
+                "quantity": [executed_trades[ticker] for _, ticker in traded],
+                "price": [float(prices[i]) for i, _ in traded],
+            })
+
+        ledger = self.ledger
+        self.log.append("positions", {
+            "date": [date] * int(listed.sum()),
+            "ticker": [ticker for ticker, is_listed in zip(self.tickers, listed) if is_listed],
+            "price": prices[listed].tolist(),
+            "long": ledger.long[listed].tolist(),
+            "short": ledger.short[listed].tolist(),
+            "long_cost_basis": ledger.long_cost_basis[listed].tolist(),
+            "short_cost_basis": ledger.short_cost_basis[listed].tolist(),
+            "position_value": ((ledger.long - ledger.short) * prices)[listed].tolist(),
+            "unrealized_pnl": ledger.unrealized_pnl(prices)[listed].tolist(),
+            "realized_gains": (ledger.realized_long + ledger.realized_short)[listed].tolist(),
+        })
+
+        self.log.append("equity", {
+            "date": [date],
+            "portfolio_value": [total_value],
+            "cash": [ledger.cash],
+            "margin_used": [ledger.margin_used],
+            "long_exposure": [exposures["Long Exposure"]],
+            "short_exposure": [exposures["Short Exposure"]],
+            "gross_exposure": [exposures["Gross Exposure"]],
+            "net_exposure": [exposures["Net Exposure"]],
+        })
+
+    def _reset_performance(self):
+        """Rebuild the running metrics from self.portfolio_values, e.g. after restoring a checkpoint."""
+        self.performance = PerformanceAccumulator()
+        for row in self.portfolio_values:
+            self.performance.update(row["Portfolio Value"], row["Date"])
+
     def _update_performance_metrics(self, performance_metrics):
         """Helper method to update performance metrics using daily returns."""
-        values_df = pd.DataFrame(self.portfolio_values).set_index("Date")
-        values_df["Daily Return"] = values_df["Portfolio Value"].pct_change()
-        clean_returns = values_df["Daily Return"].dropna()
-
-        if len(clean_returns) < 2:
-            return  # not enough data points
-
-        # Assumes 252 trading days/year
-        daily_risk_free_rate = 0.0434 / 252
-        excess_returns = clean_returns - daily_risk_free_rate
-        mean_excess_return = excess_returns.mean()
-        std_excess_return = excess_returns.std()
-
-        # Sharpe ratio
-        if std_excess_return > 1e-12:
-            performance_metrics["sharpe_ratio"] = np.sqrt(252) * (mean_excess_return / std_excess_return)
-        else:
-            performance_metrics["sharpe_ratio"] = 0.0
-
-        # Sortino ratio
-        negative_returns = excess_returns[excess_returns < 0]
-        if len(negative_returns) > 0:
-            downside_std = negative_returns.std()
-            if downside_std > 1e-12:
-                performance_metrics["sortino_ratio"] = np.sqrt(252) * (mean_excess_return / downside_std)
-            else:
-                performance_metrics["sortino_ratio"] = float('inf') if mean_excess_return > 0 else 0
-        else:
-            performance_metrics["sortino_ratio"] = float('inf') if mean_excess_return > 0 else 0
-
-        # Maximum drawdown
-        rolling_max = values_df["Portfolio Value"].cummax()
-        drawdown = (values_df["Portfolio Value"] - rolling_max) / rolling_max
-        performance_metrics["max_drawdown"] = drawdown.min() * 100
+        if metrics := self.performance.get_metrics():
+            performance_metrics.update(metrics)
 
     def analyze_performance(self):
         """Creates a performance DataFrame, prints summary stats, and plots equity curve."""
@@ -541,9 +559,7 @@ class Backtester:
             return performance_df
 
         final_portfolio_value = performance_df["Portfolio Value"].iloc[-1]
-        total_realized_gains = sum(
-            self.portfolio["realized_gains"][ticker]["long"] for ticker in self.tickers
-        )
+        total_realized_gains = float(self.ledger.realized_long.sum())
         total_return = ((final_portfolio_value - self.initial_capital) / self.initial_capital) * 100
 
         print(f"\n{Fore.WHITE}{Style.BRIGHT}PORTFOLIO PERFORMANCE SUMMARY:{Style.RESET_ALL}")
@@ -561,24 +577,16 @@ class Backtester:
 
         # Compute daily returns
         performance_df["Daily Return"] = performance_df["Portfolio Value"].pct_change().fillna(0)
-        daily_rf = 0.0434 / 252  # daily risk-free rate
-        mean_daily_return = performance_df["Daily Return"].mean()
-        std_daily_return = performance_df["Daily Return"].std()
 
-        # Annualized Sharpe Ratio
-        if std_daily_return != 0:
-            annualized_sharpe = np.sqrt(252) * ((mean_daily_return - daily_rf) / std_daily_return)
-        else:
-            annualized_sharpe = 0
+        # Annualized Sharpe Ratio, from the metrics accumulated during the run
+        metrics = self.performance.get_metrics() or {}
+        annualized_sharpe = metrics.get("sharpe_ratio", 0)
         print(f"\nSharpe Ratio: {Fore.YELLOW}{annualized_sharpe:.2f}{Style.RESET_ALL}")
 
         # Max Drawdown
-        rolling_max = performance_df["Portfolio Value"].cummax()
-        drawdown = (performance_df["Portfolio Value"] - rolling_max) / rolling_max
-        max_drawdown = drawdown.min()
-        max_drawdown_date = drawdown.idxmin()
-        if pd.notnull(max_drawdown_date):
-            print(f"Maximum Drawdown: {Fore.RED}{max_drawdown * 100:.2f}%{Style.RESET_ALL} (on {max_drawdown_date.strftime('%Y-%m-%d')})")
+        max_drawdown_date = self.performance.max_drawdown_date
+        if max_drawdown_date is not None:
+            print(f"Maximum Drawdown: {Fore.RED}{self.performance.max_drawdown * 100:.2f}%{Style.RESET_ALL} (on {max_drawdown_date.strftime('%Y-%m-%d')})")
         else:
             print(f"Maximum Drawdown: {Fore.RED}0.00%{Style.RESET_ALL}")
 
@@ -649,62 +657,77 @@ if __name__ == "__main__":
         default=0.0,
         help="Margin ratio for short positions, e.g. 0.5 for 50% (default: 0.0)",
     )
+    parser.add_argument(
+        "--llm-skip-threshold",
+        type=float,
+        help="Skip the LLM for persona agents when the rule-based score is at least this fraction of the max (or at most 1 minus it), e.g. 0.9",
+    )
 
-    args = parser.parse_args()
+    parser.add_argument(
+        "--checkpoint-dir",
+        type=str,
+        help="Directory for per-day checkpoints; rerunning with the same settings resumes from the last completed day",
+    )
+
+    parser.add_argument(
+        "--recompute-analysts",
+        action="store_true",
+        help="Rerun every analyst each day, even when its input data has not changed since the previous day",
+    )
+
+    parser.add_argument(
+        "--position-limit",
+        type=float,
+        default=0.20,
+        help="Largest single position the risk manager allows, as a fraction of portfolio value (default: 0.20)",
+    )
+
+    parser.add_argument(
+        "--quiet",
+        action="store_true",
+        help="Don't print the daily rows; they are written to --rows-file (default: backtest_rows.csv) instead",
+    )
+
+    parser.add_argument(
+        "--rows-file",
+        type=str,
+        help="CSV file that every day's rows are appended to",
+    )
+
+    parser.add_argument(
+        "--log-dir",
+        type=str,
+        help="Directory for Parquet logs of every trade, daily position and equity point (requires pyarrow)",
+    )
+
+    parser.add_argument(
+        "--rule-only",
+        action="store_true",
+        help="Backtest without any LLM calls: persona agents use their rule-based scores and a deterministic policy trades on the weighted signals (skips the model prompt)",
+    )
+
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Processes for computing every day's analyst signals in parallel before the sequential trading pass (default: 1, analysts run day by day)",
+    )
+
+    add_common_arguments(parser)
+
+    args = parse_args(parser)
+    json_output = args.output == "json"
+
+    if args.signal_store:
+        signal_store.configure(args.signal_store)
 
     # Parse tickers from comma-separated string
     tickers = [ticker.strip() for ticker in args.tickers.split(",")] if args.tickers else []
 
-    # Choose analysts
-    selected_analysts = None
-    choices = questionary.checkbox(
-        "Use the Space bar to select/unselect analysts.",
-        choices=[questionary.Choice(display, value=value) for display, value in ANALYST_ORDER],
-        instruction="\n\nPress 'a' to toggle all.\n\nPress Enter when done to run the hedge fund.",
-        validate=lambda x: len(x) > 0 or "You must select at least one analyst.",
-        style=questionary.Style(
-            [
-                ("checkbox-selected", "fg:green"),
-                ("selected", "fg:green noinherit"),
-                ("highlighted", "noinherit"),
-                ("pointer", "noinherit"),
-            ]
-        ),
-    ).ask()
-
-    if not choices:
-        print("\n\nInterrupt received. Exiting...")
-        sys.exit(0)
-    else:
-        selected_analysts = choices
-        print(
-            f"\nSelected analysts: "
-            f"{', '.join(Fore.GREEN + choice.title().replace('_', ' ') + Style.RESET_ALL for choice in choices)}"
-        )
-
-    # Select LLM model
-    model_choice = questionary.select(
-        "Select your LLM model:",
-        choices=[questionary.Choice(display, value=value) for display, value, _ in LLM_ORDER],
-        style=questionary.Style([
-            ("selected", "fg:green bold"),
-            ("pointer", "fg:green bold"),
-            ("highlighted", "fg:green"),
-            ("answer", "fg:green bold"),
-        ])
-    ).ask()
-
-    if not model_choice:
-        print("\n\nInterrupt received. Exiting...")
-        sys.exit(0)
-    else:
-        model_info = get_model_info(model_choice)
-        if model_info:
-            model_provider = model_info.provider.value
-            print(f"\nSelected {Fore.CYAN}{model_provider}{Style.RESET_ALL} model: {Fore.GREEN + Style.BRIGHT}{model_choice}{Style.RESET_ALL}\n")
-        else:
-            model_provider = "Unknown"
-            print(f"\nSelected model: {Fore.GREEN + Style.BRIGHT}{model_choice}{Style.RESET_ALL}\n")
+    # Choose analysts and LLM model, prompting only for what was not passed as a flag
+    selected_analysts = select_analysts(args.analysts, quiet=json_output, parser=parser)
+    # No model is called in rule-only mode; the name only labels stored analyst outputs
+    model_choice, model_provider = ("rule-only", "None") if args.rule_only else select_model(args.model, quiet=json_output, parser=parser)
 
     # Create and run the backtester
     backtester = Backtester(
@@ -717,7 +740,27 @@ if __name__ == "__main__":
         model_provider=model_provider,
         selected_analysts=selected_analysts,
         initial_margin_requirement=args.margin_requirement,
+        llm_skip_threshold=args.llm_skip_threshold,
+        checkpoint_dir=args.checkpoint_dir,
+        reuse_unchanged_analysts=not args.recompute_analysts,
+        workers=args.workers,
+        position_limit_fraction=args.position_limit,
+        quiet=args.quiet,
+        rows_path=args.rows_file or ("backtest_rows.csv" if args.quiet else None),
+        log_dir=args.log_dir,
+        rule_only=args.rule_only,
     )
 
-    performance_metrics = backtester.run_backtest()
-    performance_df = backtester.analyze_performance()
+    if json_output:
+        # Keep stdout for the JSON document; the per-day tables and progress go to stderr
+        with contextlib.redirect_stdout(sys.stderr):
+            performance_metrics = backtester.run_backtest()
+        print(json.dumps({
+            "performance_metrics": performance_metrics,
+            "portfolio_values": backtester.portfolio_values,
+            "final_portfolio": backtester.portfolio,
+            "llm_usage": backtester.llm_usage,
+        }, default=str))
+    else:
+        performance_metrics = backtester.run_backtest()
+        performance_df = backtester.analyze_performance()
@@ -0,0 +1,178 @@
+"""Array-backed portfolio accounting for the backtester."""
+
+import numpy as np
+
+
+class PortfolioLedger:
+    """
+    Long/short portfolio with one array slot per ticker for shares, cost basis, short margin and
+    realized gains, so valuation and exposures are vectorized over the whole universe.
+
+    Prices passed to the vectorized methods are arrays aligned with `tickers`.
+    """
+
+    def __init__(self, tickers: list[str], initial_cash: float, margin_ratio: float = 0.0):
+        self.tickers = list(tickers)
+        self.ticker_index = {ticker: i for i, ticker in enumerate(self.tickers)}
+        self.margin_ratio = margin_ratio
+
+        size = len(self.tickers)
+        self.cash = float(initial_cash)
+        self.margin_used = 0.0  # Total margin posted across all short positions
+        self.long = np.zeros(size, dtype=np.int64)
+        self.short = np.zeros(size, dtype=np.int64)
+        self.long_cost_basis = np.zeros(size)  # Average cost basis per share (long)
+        self.short_cost_basis = np.zeros(size)  # Average price at which shares were sold short
+        self.short_margin_used = np.zeros(size)  # Dollars of margin posted for each ticker's short
+        self.realized_long = np.zeros(size)
+        self.realized_short = np.zeros(size)
+
+    def execute_trade(self, ticker: str, action: str, quantity: float, current_price: float) -> int:
+        """
+        Execute a buy/sell/short/cover for one ticker and return the number of shares actually traded.
+        Buys and shorts are capped by available cash (and margin); sells and covers by the open position.
+        """
+        if quantity <= 0:
+            return 0
+
+        quantity = int(quantity)  # force integer shares
+        i = self.ticker_index[ticker]
+
+        if action == "buy":
+            # Buy what the cash allows
+            if quantity * current_price > self.cash:
+                quantity = int(self.cash / current_price)
+            if quantity <= 0:
+                return 0
+
+            cost = quantity * current_price
+            total_shares = self.long[i] + quantity
+            # Weighted average cost basis for the new total
+            self.long_cost_basis[i] = (self.long_cost_basis[i] * self.long[i] + cost) / total_shares
+            self.long[i] = total_shares
+            self.cash -= cost
+            return quantity
+
+        if action == "sell":
+            # You can only sell as many as you own
+            quantity = min(quantity, int(self.long[i]))
+            if quantity <= 0:
+                return 0
+
+            # Realized gain/loss using average cost basis
+            self.realized_long[i] += (current_price - self.long_cost_basis[i]) * quantity
+            self.long[i] -= quantity
+            self.cash += quantity * current_price
+
+            if self.long[i] == 0:
+                self.long_cost_basis[i] = 0.0
+            return quantity
+
+        if action == "short":
+            # Receive the proceeds and post margin_ratio of them as margin, as far as the cash allows
+            if current_price * quantity * self.margin_ratio > self.cash:
+                quantity = int(self.cash / (current_price * self.margin_ratio)) if self.margin_ratio > 0 else 0
+            if quantity <= 0:
+                return 0
+
+            proceeds = current_price * quantity
+            margin_required = proceeds * self.margin_ratio
+            total_shares = self.short[i] + quantity
+            # Weighted average short cost basis
+            self.short_cost_basis[i] = (self.short_cost_basis[i] * self.short[i] + proceeds) / total_shares
+            self.short[i] = total_shares
+
+            self.short_margin_used[i] += margin_required
+            self.margin_used += margin_required
+            self.cash += proceeds - margin_required
+            return quantity
+
+        if action == "cover":
+            # Pay the cover cost and release a proportional share of the margin
+            quantity = min(quantity, int(self.short[i]))
+            if quantity <= 0:
+                return 0
+
+            cover_cost = quantity * current_price
+            self.realized_short[i] += (self.short_cost_basis[i] - current_price) * quantity
+
+            margin_to_release = quantity / self.short[i] * self.short_margin_used[i]
+            self.short[i] -= quantity
+            self.short_margin_used[i] -= margin_to_release
+            self.margin_used -= margin_to_release
+            self.cash += margin_to_release - cover_cost
+
+            if self.short[i] == 0:
+                self.short_cost_basis[i] = 0.0
+                self.short_margin_used[i] = 0.0
+            return quantity
+
+        return 0
+
+    def prices_array(self, prices: dict[str, float]) -> np.ndarray:
+        """Align a ticker -> price mapping with the ledger's tickers."""
+        return np.array([prices[ticker] for ticker in self.tickers], dtype=float)
+
+    def total_value(self, prices: np.ndarray) -> float:
+        """Cash plus the market value of longs plus the unrealized P&L of shorts."""
+        return float(self.cash + self.long @ prices + self.short @ (self.short_cost_basis - prices))
+
+    def exposures(self, prices: np.ndarray) -> dict[str, float]:
+        """Long, short, gross and net exposure and the long/short ratio at the given prices."""
+        long_exposure = float(self.long @ prices)
+        short_exposure = float(self.short @ prices)
+        return {
+            "Long Exposure": long_exposure,
+            "Short Exposure": short_exposure,
+            "Gross Exposure": long_exposure + short_exposure,
+            "Net Exposure": long_exposure - short_exposure,
+            "Long/Short Ratio": long_exposure / short_exposure if short_exposure > 1e-9 else float("inf"),
+        }
+
+    def unrealized_pnl(self, prices: np.ndarray) -> np.ndarray:
+        """Unrealized P&L per ticker, longs and shorts combined."""
+        return self.long * (prices - self.long_cost_basis) + self.short * (self.short_cost_basis - prices)
+
+    def total_realized_gains(self) -> float:
+        return float(self.realized_long.sum() + self.realized_short.sum())
+
+    def to_portfolio(self) -> dict:
+        """The portfolio in the nested dict format the agents read."""
+        # Plain floats: cash picks up NumPy scalar types from the arrays, which serializers reject
+        return {
+            "cash": float(self.cash),
+            "margin_used": float(self.margin_used),
+            "positions": {
+                ticker: {
+                    "long": int(self.long[i]),
+                    "short": int(self.short[i]),
+                    "long_cost_basis": float(self.long_cost_basis[i]),
+                    "short_cost_basis": float(self.short_cost_basis[i]),
+                    "short_margin_used": float(self.short_margin_used[i]),
+                }
+                for ticker, i in self.ticker_index.items()
+            },
+            "realized_gains": {
+                ticker: {
+                    "long": float(self.realized_long[i]),
+                    "short": float(self.realized_short[i]),
+                }
+                for ticker, i in self.ticker_index.items()
+            },
+        }
+
+    @classmethod
+    def from_portfolio(cls, portfolio: dict, tickers: list[str], margin_ratio: float = 0.0) -> "PortfolioLedger":
+        """Rebuild a ledger from the dict produced by to_portfolio (e.g. a checkpoint)."""
+        ledger = cls(tickers, portfolio["cash"], margin_ratio)
+        ledger.margin_used = portfolio.get("margin_used", 0.0)
+        for ticker, i in ledger.ticker_index.items():
+            position = portfolio["positions"][ticker]
+            ledger.long[i] = position["long"]
+            ledger.short[i] = position["short"]
+            ledger.long_cost_basis[i] = position["long_cost_basis"]
+            ledger.short_cost_basis[i] = position["short_cost_basis"]
+            ledger.short_margin_used[i] = position.get("short_margin_used", 0.0)
+            ledger.realized_long[i] = portfolio["realized_gains"][ticker]["long"]
+            ledger.realized_short[i] = portfolio["realized_gains"][ticker]["short"]
+        return ledger
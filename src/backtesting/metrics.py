@@ -0,0 +1,100 @@
+"""Risk-adjusted performance metrics of an equity curve, updated one day at a time."""
+
+import math
+from typing import Iterable
+
+# Assumes 252 trading days/year
+TRADING_DAYS = 252
+RISK_FREE_RATE = 0.0434
+
+
+class PerformanceAccumulator:
+    """
+    Running Sharpe ratio, Sortino ratio and max drawdown, updated in O(1) per portfolio value.
+
+    Mean and variance of daily excess returns use Welford's algorithm, as does the variance of the
+    negative excess returns for the Sortino ratio; the drawdown tracks the running peak.
+    """
+
+    def __init__(self, risk_free_rate: float = RISK_FREE_RATE):
+        self.daily_risk_free_rate = risk_free_rate / TRADING_DAYS
+        self.previous_value = None
+
+        # Daily excess returns
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+        # Negative daily excess returns
+        self.downside_count = 0
+        self.downside_mean = 0.0
+        self.downside_m2 = 0.0
+
+        self.peak = None
+        self.max_drawdown = 0.0  # As a fraction, e.g. -0.12
+        self.max_drawdown_date = None
+
+    def update(self, value: float, date=None):
+        """Add the next portfolio value."""
+        if self.peak is None or value > self.peak:
+            self.peak = value
+        if self.peak:
+            drawdown = (value - self.peak) / self.peak
+            if drawdown < self.max_drawdown:
+                self.max_drawdown = drawdown
+                self.max_drawdown_date = date
+
+        # The first value has no return, and neither does a day after the portfolio was worth exactly zero
+        if self.previous_value is not None and self.previous_value != 0:
+            excess_return = value / self.previous_value - 1 - self.daily_risk_free_rate
+            self.count, self.mean, self.m2 = _welford(self.count, self.mean, self.m2, excess_return)
+            if excess_return < 0:
+                self.downside_count, self.downside_mean, self.downside_m2 = _welford(self.downside_count, self.downside_mean, self.downside_m2, excess_return)
+        self.previous_value = value
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else math.nan
+
+    @property
+    def downside_std(self) -> float:
+        return math.sqrt(self.downside_m2 / (self.downside_count - 1)) if self.downside_count > 1 else math.nan
+
+    def get_metrics(self) -> dict[str, float] | None:
+        """Sharpe ratio, Sortino ratio and max drawdown (in percent), or None with fewer than two daily returns."""
+        if self.count < 2:
+            return None  # not enough data points
+
+        metrics = {}
+
+        # Sharpe ratio
+        if self.std > 1e-12:
+            metrics["sharpe_ratio"] = math.sqrt(TRADING_DAYS) * (self.mean / self.std)
+        else:
+            metrics["sharpe_ratio"] = 0.0
+
+        # Sortino ratio
+        if self.downside_std > 1e-12:
+            metrics["sortino_ratio"] = math.sqrt(TRADING_DAYS) * (self.mean / self.downside_std)
+        else:
+            metrics["sortino_ratio"] = float('inf') if self.mean > 0 else 0
+
+        # Maximum drawdown
+        metrics["max_drawdown"] = self.max_drawdown * 100
+        return metrics
+
+
+def _welford(count: int, mean: float, m2: float, value: float) -> tuple[int, float, float]:
+    count += 1
+    delta = value - mean
+    mean += delta / count
+    m2 += delta * (value - mean)
+    return count, mean, m2
+
+
+def compute_performance_metrics(portfolio_values: Iterable[float]) -> dict[str, float] | None:
+    """Sharpe ratio, Sortino ratio and max drawdown (in percent) of a whole series of portfolio values."""
+    accumulator = PerformanceAccumulator()
+    for value in portfolio_values:
+        accumulator.update(value)
+    return accumulator.get_metrics()
@@ -0,0 +1,54 @@
+"""Close prices for the whole backtest, aligned into one (dates x tickers) matrix."""
+
+import numpy as np
+import pandas as pd
+
+from tools.api import get_prices, prices_to_df
+
+
+class PriceMatrix:
+    """
+    Close prices on each backtest date for every ticker, forward-filled from the last trading day.
+
+    `observed` marks the cells that had a bar on that exact date, so holidays (no ticker traded)
+    and per-ticker gaps such as halts can be told apart from real prints.
+    """
+
+    def __init__(self, dates: pd.DatetimeIndex, tickers: list[str], closes: np.ndarray, observed: np.ndarray):
+        self.dates = dates
+        self.tickers = list(tickers)
+        self.closes = closes
+        self.observed = observed
+        self.date_index = {date: i for i, date in enumerate(dates)}
+
+    @classmethod
+    def load(cls, tickers: list[str], dates: pd.DatetimeIndex, start_date: str, end_date: str) -> "PriceMatrix":
+        """Build the matrix from one get_prices call per ticker over [start_date, end_date]."""
+        dates = pd.DatetimeIndex(dates).normalize()
+        columns = {}
+        for ticker in tickers:
+            prices = get_prices(ticker, start_date, end_date)
+            if not prices:
+                continue
+            df = prices_to_df(prices)
+            index = df.index.tz_localize(None) if df.index.tz is not None else df.index
+            closes = pd.Series(df["close"].to_numpy(dtype=float), index=index.normalize())
+            columns[ticker] = closes[~closes.index.duplicated(keep="last")]
+
+        frame = pd.DataFrame(columns, columns=tickers, dtype=float)
+        observed = frame.reindex(dates).notna().to_numpy()
+        # Forward-fill over every date seen in the data, so a gap is filled from the last actual close
+        filled = frame.reindex(frame.index.union(dates)).ffill().reindex(dates)
+        return cls(dates, tickers, filled.to_numpy(), observed)
+
+    def prices_at(self, date) -> np.ndarray:
+        """Close prices on `date`, aligned with `tickers`; NaN for tickers not listed yet."""
+        return self.closes[self.date_index[pd.Timestamp(date).normalize()]]
+
+    def is_trading_day(self, date) -> bool:
+        """True if any ticker printed on `date`."""
+        return bool(self.observed[self.date_index[pd.Timestamp(date).normalize()]].any())
+
+    def listed(self, date) -> np.ndarray:
+        """Mask of the tickers with a close on or before `date`; the others have not started trading yet."""
+        return ~np.isnan(self.closes[self.date_index[pd.Timestamp(date).normalize()]])
@@ -0,0 +1,98 @@
+"""Phase 1 of a two-phase backtest: analyst signals for every (date, ticker), computed across processes."""
+
+import math
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+from data.cache import get_cache
+from data.signal_store import signal_store
+from graph.state import merge_analyst_signals
+from llm.client import set_process_share
+from main import run_analysts
+from utils.metrics import llm_metrics
+
+
+def init_worker(cache_path: str, signal_store_path: str | None, processes: int):
+    """
+    Start a worker with the data prefetched by the parent, the parent's signal store and its share of the
+    provider limits. Workers may be spawned rather than forked, so none of this can be inherited.
+    """
+    get_cache().load(cache_path)
+    signal_store.configure(signal_store_path)
+    set_process_share(processes)
+
+
+def _run_shard(shard: tuple) -> tuple:
+    """Compute the signals for one (date, ticker) in a worker process, with the LLM usage it produced."""
+    start_date, end_date, ticker, selected_analysts, model_name, model_provider, llm_skip_threshold, reuse_unchanged_analysts, rule_only = shard
+    usage_run = llm_metrics.start_run()
+    try:
+        signals = run_analysts(
+            [ticker],
+            start_date,
+            end_date,
+            selected_analysts=selected_analysts,
+            model_name=model_name,
+            model_provider=model_provider,
+            llm_skip_threshold=llm_skip_threshold,
+            reuse_unchanged_analysts=reuse_unchanged_analysts,
+            rule_only=rule_only,
+        )
+    finally:
+        usage = llm_metrics.end_run(usage_run)
+        # Pool workers exit without running atexit hooks
+        llm_metrics.flush()
+    return end_date, signals, usage
+
+
+def precompute_analyst_signals(
+    tickers: list[str],
+    windows: list[tuple[str, str]],
+    selected_analysts: list[str],
+    model_name: str,
+    model_provider: str,
+    llm_skip_threshold: float | None = None,
+    reuse_unchanged_analysts: bool = True,
+    max_workers: int | None = None,
+    rule_only: bool = False,
+    signal_store_path: str | None = None,
+    tickers_by_date: dict[str, list[str]] | None = None,
+) -> dict[str, dict]:
+    """
+    Run the analysts for every (start_date, end_date) window and ticker on a process pool.
+
+    Returns {end_date: analyst_signals}. LLM usage from the workers are merged into llm_metrics,
+    so usage reports cover both phases. Workers start with the data already in the cache and use the signal
+    store at signal_store_path, or the one configured here.
+    tickers_by_date limits the tickers analysed on an end date, e.g. to those already listed (default: all).
+    """
+    if not windows:
+        return {}
+
+    max_workers = max_workers or os.cpu_count() or 1
+    listed = {end_date: set(date_tickers) for end_date, date_tickers in tickers_by_date.items()} if tickers_by_date is not None else None
+    # Ticker-major order with chunks of consecutive dates, so a worker usually sees the same ticker on
+    # neighbouring days and reuse_unchanged_analysts can skip analysts whose inputs did not move
+    shards = [
+        (start_date, end_date, ticker, selected_analysts, model_name, model_provider, llm_skip_threshold, reuse_unchanged_analysts, rule_only)
+        for ticker in tickers
+        for start_date, end_date in windows
+        if listed is None or ticker in listed[end_date]
+    ]
+    chunksize = max(1, math.ceil(len(shards) / (max_workers * 4)))
+
+    signals_by_date = {end_date: {} for _, end_date in windows}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cache_path = os.path.join(tmp_dir, "cache.json")
+        get_cache().save(cache_path)
+        initargs = (cache_path, signal_store_path or signal_store.path, max_workers)
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=init_worker, initargs=initargs) as executor:
+            for done, (end_date, signals, usage) in enumerate(executor.map(_run_shard, shards, chunksize=chunksize), start=1):
+                signals_by_date[end_date] = merge_analyst_signals(signals_by_date[end_date], signals)
+                llm_metrics.merge(usage)
+                if done % len(tickers) == 0 or done == len(shards):
+                    print(f"\rComputed analyst signals for {done}/{len(shards)} (date, ticker) pairs", end="", flush=True)
+    print()
+
+    return signals_by_date
@@ -0,0 +1,131 @@
+"""Columnar (Parquet) log of a backtest's trades, daily positions and equity curve."""
+
+import os
+from datetime import date, datetime
+
+from colorama import Fore, Style
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pc = pq = None
+
+
+def _schemas() -> dict:
+    return {
+        "trades": pa.schema([
+            ("run_id", pa.string()),
+            ("date", pa.date32()),
+            ("ticker", pa.string()),
+            ("action", pa.string()),
+            ("requested_quantity", pa.float64()),
+            ("quantity", pa.int64()),
+            ("price", pa.float64()),
+        ]),
+        "positions": pa.schema([
+            ("run_id", pa.string()),
+            ("date", pa.date32()),
+            ("ticker", pa.string()),
+            ("price", pa.float64()),
+            ("long", pa.int64()),
+            ("short", pa.int64()),
+            ("long_cost_basis", pa.float64()),
+            ("short_cost_basis", pa.float64()),
+            ("position_value", pa.float64()),  # Net: long minus short market value
+            ("unrealized_pnl", pa.float64()),
+            ("realized_gains", pa.float64()),
+        ]),
+        "equity": pa.schema([
+            ("run_id", pa.string()),
+            ("date", pa.date32()),
+            ("portfolio_value", pa.float64()),
+            ("cash", pa.float64()),
+            ("margin_used", pa.float64()),
+            ("long_exposure", pa.float64()),
+            ("short_exposure", pa.float64()),
+            ("gross_exposure", pa.float64()),
+            ("net_exposure", pa.float64()),
+        ]),
+    }
+
+
+class BacktestLog:
+    """
+    Writes <directory>/<run_id>_{trades,positions,equity}.parquet, buffering rows per table and writing
+    a row group whenever buffer_rows are pending, so a long backtest never holds its full history.
+    Every row carries the run_id, so several runs can be read together, e.g. with duckdb:
+
+        SELECT run_id, max(portfolio_value) FROM 'logs/*_equity.parquet' GROUP BY run_id
+
+    A run resumed from a checkpoint reuses its run_id, and its files keep the rows up to the resumed date.
+    """
+
+    def __init__(self, directory: str, run_id: str, buffer_rows: int = 65536):
+        os.makedirs(directory, exist_ok=True)
+        self.run_id = run_id
+        self.buffer_rows = buffer_rows
+        self.schemas = _schemas()
+        self.paths = {name: os.path.join(directory, f"{run_id}_{name}.parquet") for name in self.schemas}
+        self._buffers = {name: {field: [] for field in schema.names} for name, schema in self.schemas.items()}
+        self._writers = {}
+
+    @classmethod
+    def open(cls, directory: str | None, run_id: str, resume_after: str | None = None) -> "BacktestLog | None":
+        """
+        Create a log, or return None without a directory or without pyarrow (with a warning). With resume_after
+        (YYYY-MM-DD), rows already written for this run_id up to that date are kept; otherwise existing files are replaced.
+        """
+        if not directory:
+            return None
+        if pa is None:
+            print(f"{Fore.YELLOW}Warning: pyarrow is not installed, the columnar backtest log will not be written{Style.RESET_ALL}")
+            return None
+        log = cls(directory, run_id)
+        if resume_after:
+            log._carry_over(datetime.strptime(resume_after, "%Y-%m-%d").date())
+        return log
+
+    def _carry_over(self, resume_after: date):
+        """Rewrite the rows of an earlier attempt up to resume_after into the new files."""
+        for table, path in self.paths.items():
+            if not os.path.exists(path):
+                continue
+            try:
+                existing = pq.read_table(path, schema=self.schemas[table])
+            except (OSError, pa.ArrowException) as e:
+                # E.g. a process that was killed never wrote the file footer
+                print(f"{Fore.YELLOW}Warning: could not read {path} to resume it ({e}); its earlier rows are lost{Style.RESET_ALL}")
+                continue
+            kept = existing.filter(pc.less_equal(existing["date"], pa.scalar(resume_after, pa.date32())))
+            self._writers[table] = pq.ParquetWriter(path, self.schemas[table])
+            self._writers[table].write_table(kept)
+
+    def append(self, table: str, columns: dict[str, list]):
+        """Append rows given as equal-length columns; run_id is filled in."""
+        buffer = self._buffers[table]
+        size = len(next(iter(columns.values())))
+        buffer["run_id"].extend([self.run_id] * size)
+        for field, values in columns.items():
+            buffer[field].extend(values)
+        if len(buffer["run_id"]) >= self.buffer_rows:
+            self._flush(table)
+
+    def _flush(self, table: str):
+        buffer = self._buffers[table]
+        if not buffer["run_id"]:
+            return
+        if table not in self._writers:
+            self._writers[table] = pq.ParquetWriter(self.paths[table], self.schemas[table])
+        self._writers[table].write_table(pa.Table.from_pydict(buffer, schema=self.schemas[table]))
+        for values in buffer.values():
+            values.clear()
+
+    def close(self):
+        """Write whatever is buffered and finalize the files."""
+        for table in self.schemas:
+            self._flush(table)
+        for writer in self._writers.values():
+            writer.close()
+        self._writers.clear()
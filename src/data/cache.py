@@ -1,3 +1,6 @@
+import json
+
+
 class Cache:
     """In-memory cache for API responses."""
 
@@ -81,6 +84,35 @@ class Cache:
             key_field="date"
         )
 
+    def save(self, path: str):
+        """Write every cached response to a JSON file, e.g. to share prefetched data with worker processes."""
+        with open(path, "w") as f:
+            json.dump(
+                {
+                    "prices": self._prices_cache,
+                    "financial_metrics": self._financial_metrics_cache,
+                    "line_items": self._line_items_cache,
+                    "insider_trades": self._insider_trades_cache,
+                    "company_news": self._company_news_cache,
+                },
+                f,
+            )
+
+    def load(self, path: str):
+        """Merge the responses saved by save() into this cache."""
+        with open(path) as f:
+            saved = json.load(f)
+        for ticker, data in saved["prices"].items():
+            self.set_prices(ticker, data)
+        for ticker, data in saved["financial_metrics"].items():
+            self.set_financial_metrics(ticker, data)
+        for ticker, data in saved["line_items"].items():
+            self.set_line_items(ticker, data)
+        for ticker, data in saved["insider_trades"].items():
+            self.set_insider_trades(ticker, data)
+        for ticker, data in saved["company_news"].items():
+            self.set_company_news(ticker, data)
+
 
 # Global cache instance
 _cache = Cache()
@@ -0,0 +1,156 @@
+"""Durable SQLite store of analyst outputs, keyed by analyst, ticker, date window, code version and (for LLM analysts) model."""
+
+import contextlib
+import hashlib
+import inspect
+import json
+import os
+import sqlite3
+import threading
+import time
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS analyst_signals (
+    analyst TEXT NOT NULL,
+    ticker TEXT NOT NULL,
+    start_date TEXT NOT NULL,
+    as_of_date TEXT NOT NULL,
+    model_name TEXT NOT NULL,
+    model_provider TEXT NOT NULL,
+    code_version TEXT NOT NULL,
+    settings TEXT NOT NULL,
+    signal_key TEXT NOT NULL,
+    signal TEXT,
+    confidence REAL,
+    reasoning TEXT,
+    output TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (analyst, ticker, start_date, as_of_date, model_name, model_provider, code_version, settings)
+)
+"""
+
+_KEY_COLUMNS = ("analyst", "ticker", "start_date", "as_of_date", "model_name", "model_provider", "code_version", "settings")
+
+
+def get_code_version(node_func) -> str:
+    """Hash of the source of the module defining an agent, so editing the agent invalidates its stored outputs."""
+    module = inspect.getmodule(node_func)
+    source = inspect.getsource(module) if module is not None else node_func.__qualname__
+    return hashlib.sha256(source.encode()).hexdigest()[:12]
+
+
+class SignalStore:
+    """
+    Analyst outputs persisted across runs, so a rerun with another portfolio or other risk
+    settings reuses the analyst work. Disabled unless a path is configured, via configure() or the
+    SIGNAL_STORE_PATH environment variable.
+
+    Each call opens its own connection, so the store can be shared by threads and worker processes.
+    """
+
+    def __init__(self, path: str | None = None):
+        self._path = path
+        self._initialized: set[str] = set()
+        self._lock = threading.Lock()
+
+    @property
+    def path(self) -> str | None:
+        return self._path or os.getenv("SIGNAL_STORE_PATH")
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path)
+
+    def configure(self, path: str | None):
+        self._path = path
+
+    @contextlib.contextmanager
+    def _connect(self):
+        """Open a connection for one transaction, creating the table on first use of the path."""
+        path = self.path
+        connection = sqlite3.connect(path, timeout=30)
+        try:
+            with self._lock:
+                if path not in self._initialized:
+                    # WAL lets concurrent backtests read while another one writes
+                    connection.execute("PRAGMA journal_mode=WAL")
+                    connection.execute(_SCHEMA)
+                    connection.commit()
+                    self._initialized.add(path)
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    @staticmethod
+    def get_key(analyst: str, ticker: str, state: dict, code_version: str, uses_llm: bool = True) -> dict:
+        """
+        The key columns for one analyst and ticker in a run. The model and LLM settings are only part of
+        the key for analysts that use an LLM; outputs of the others are shared by runs with any model.
+        """
+        data, metadata = state["data"], state["metadata"]
+        return {
+            "analyst": analyst,
+            "ticker": ticker,
+            "start_date": data["start_date"],
+            "as_of_date": data["end_date"],
+            "model_name": (metadata.get("model_name") or "") if uses_llm else "",
+            "model_provider": (metadata.get("model_provider") or "") if uses_llm else "",
+            "code_version": code_version,
+            "settings": json.dumps({"llm_skip_threshold": metadata.get("llm_skip_threshold")} if uses_llm else {}, sort_keys=True),
+        }
+
+    def get(self, key: dict) -> tuple[str, dict] | None:
+        """Return (signal_key, output) stored under the key, if any."""
+        where = " AND ".join(f"{column} = ?" for column in _KEY_COLUMNS)
+        with self._connect() as connection:
+            row = connection.execute(f"SELECT signal_key, output FROM analyst_signals WHERE {where}", [key[column] for column in _KEY_COLUMNS]).fetchone()
+        if row is None:
+            return None
+        return row[0], json.loads(row[1])
+
+    def put(self, key: dict, signal_key: str, output: dict):
+        reasoning = output.get("reasoning")
+        row = {
+            **key,
+            "signal_key": signal_key,
+            "signal": output.get("signal"),
+            "confidence": output.get("confidence"),
+            "reasoning": reasoning if isinstance(reasoning, str) else json.dumps(reasoning, default=str),
+            "output": json.dumps(output, default=str),
+            "created_at": time.time(),
+        }
+        columns = ", ".join(row)
+        placeholders = ", ".join("?" for _ in row)
+        with self._connect() as connection:
+            connection.execute(f"INSERT OR REPLACE INTO analyst_signals ({columns}) VALUES ({placeholders})", list(row.values()))
+
+    def query(self, analyst: str | None = None, ticker: str | None = None, start_date: str | None = None, end_date: str | None = None, model_name: str | None = None) -> list[dict]:
+        """
+        Stored outputs matching the filters, ordered by as-of date; start_date/end_date bound the as-of date.
+        With model_name, outputs of analysts that do not use an LLM (stored without a model) are included.
+        """
+        clauses, params = [], []
+        for column, value in (("analyst", analyst), ("ticker", ticker)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if model_name is not None:
+            clauses.append("model_name IN (?, '')")
+            params.append(model_name)
+        if start_date is not None:
+            clauses.append("as_of_date >= ?")
+            params.append(start_date)
+        if end_date is not None:
+            clauses.append("as_of_date <= ?")
+            params.append(end_date)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+
+        with self._connect() as connection:
+            connection.row_factory = sqlite3.Row
+            rows = connection.execute(f"SELECT * FROM analyst_signals {where} ORDER BY as_of_date, analyst, ticker", params).fetchall()
+        return [dict(row) for row in rows]
+
+
+# Create a global instance
+signal_store = SignalStore()
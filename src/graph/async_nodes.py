@@ -0,0 +1,33 @@
+"""Async adapters that let the sync agent nodes run under graph.ainvoke.
+
+The agents are not natively async: each node still makes blocking data and LLM calls, and is
+offloaded to a shared thread pool so the event loop stays free. Concurrent runs therefore overlap
+their I/O, but throughput is capped by AGENT_EXECUTOR_WORKERS threads rather than by the loop.
+"""
+
+import asyncio
+import contextvars
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+# Shared by every concurrent run so the number of worker threads stays bounded
+# no matter how many portfolios or dates are evaluated in one event loop
+_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("AGENT_EXECUTOR_WORKERS", "32")),
+    thread_name_prefix="agent-node",
+)
+
+
+def to_async_node(node: Callable[[Any], Any]) -> Callable[[Any], Any]:
+    """Wrap a sync agent node so it is awaited on the shared executor instead of blocking the loop."""
+
+    @functools.wraps(node)
+    async def async_node(state):
+        loop = asyncio.get_running_loop()
+        # Carry the caller's context (e.g. LangChain callbacks) into the worker thread
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(_executor, context.run, node, state)
+
+    return async_node
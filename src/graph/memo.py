@@ -0,0 +1,121 @@
+"""Reuse of analyst outputs from the signal store, or when the data an analyst reads has not changed since its last run."""
+
+import functools
+import hashlib
+import json
+import threading
+from typing import Any, Callable
+
+from data.signal_store import get_code_version, signal_store
+from tools.api import get_company_news, get_financial_metrics, get_insider_trades, get_prices
+from utils.progress import progress
+
+# The data slices an analyst can declare as inputs (see ANALYST_CONFIG), each read the same way the agents
+# read it. Line items and market cap are reported with the financial metrics, so they are covered by them.
+DATA_SLICES: dict[str, Callable[[str, dict], list]] = {
+    "financial_metrics": lambda ticker, data: get_financial_metrics(ticker, data["end_date"], limit=10),
+    "prices": lambda ticker, data: get_prices(ticker, data["start_date"], data["end_date"]),
+    "insider_trades": lambda ticker, data: get_insider_trades(ticker, data["end_date"], limit=1000),
+    "company_news": lambda ticker, data: get_company_news(ticker, data["end_date"], limit=100),
+}
+
+
+def get_input_fingerprint(inputs: list[str], ticker: str, state: dict, uses_llm: bool = True) -> str:
+    """Hash the data slices an analyst reads for one ticker, together with the settings that shape its output."""
+    metadata = state["metadata"]
+    payload = {
+        "ticker": ticker,
+        "inputs": {name: [item.model_dump() for item in DATA_SLICES[name](ticker, state["data"])] for name in inputs},
+    }
+    if uses_llm:
+        payload.update({key: metadata.get(key) for key in ("model_name", "model_provider", "llm_skip_threshold")})
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class AnalystMemo:
+    """Thread-safe store of the last output of each analyst per ticker, with the fingerprint it was computed from."""
+
+    def __init__(self):
+        self._entries: dict[tuple[str, str], tuple[str, str, dict]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, node_name: str, ticker: str, fingerprint: str) -> tuple[str, dict] | None:
+        """Return (signal_key, output) if the stored output was computed from the same inputs."""
+        with self._lock:
+            entry = self._entries.get((node_name, ticker))
+        if entry is None or entry[0] != fingerprint:
+            return None
+        return entry[1], entry[2]
+
+    def set(self, node_name: str, ticker: str, fingerprint: str, signal_key: str, output: dict):
+        with self._lock:
+            self._entries[(node_name, ticker)] = (fingerprint, signal_key, output)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# Create a global instance
+analyst_memo = AnalystMemo()
+
+
+def memoize_analyst(node_name: str, node_func: Callable[[Any], dict], inputs: list[str], uses_llm: bool = True) -> Callable[[Any], dict]:
+    """
+    Wrap an analyst node so that previously computed outputs are reused instead of rerunning it:
+      - with the signal store enabled, outputs stored for the same ticker, dates, code version and (if uses_llm) model
+      - when metadata["reuse_unchanged_analysts"] is set, the last output for tickers whose input fingerprint is unchanged
+    Only the remaining tickers are recomputed, and their outputs are written back to the store.
+    """
+    code_version = get_code_version(node_func)
+
+    @functools.wraps(node_func)
+    def memo_node(state):
+        reuse_unchanged = state["metadata"].get("reuse_unchanged_analysts")
+        use_store = signal_store.enabled
+        if not reuse_unchanged and not use_store:
+            return node_func(state)
+
+        store_keys = {}
+        fingerprints = {}
+        reused = {}
+        for ticker in state["data"]["tickers"]:
+            if use_store:
+                store_keys[ticker] = signal_store.get_key(node_name, ticker, state, code_version, uses_llm)
+                if (stored := signal_store.get(store_keys[ticker])) is not None:
+                    reused[ticker] = (*stored, "Done (stored signal)")
+                    continue
+
+            if not reuse_unchanged:
+                continue
+            try:
+                fingerprints[ticker] = get_input_fingerprint(inputs, ticker, state, uses_llm)
+            except Exception:
+                # Let the analyst fetch (and report on) the data itself
+                fingerprints[ticker] = None
+                continue
+            if (cached := analyst_memo.get(node_name, ticker, fingerprints[ticker])) is not None:
+                reused[ticker] = (*cached, "Done (inputs unchanged)")
+
+        signals = {}
+        for ticker, (signal_key, output, status) in reused.items():
+            signals.setdefault(signal_key, {})[ticker] = output
+            progress.update_status(node_name, ticker, status)
+
+        stale_tickers = [ticker for ticker in state["data"]["tickers"] if ticker not in reused]
+        if stale_tickers:
+            update = node_func({**state, "data": {**state["data"], "tickers": stale_tickers}})
+            for signal_key, ticker_outputs in update.get("analyst_signals", {}).items():
+                signals.setdefault(signal_key, {}).update(ticker_outputs)
+                for ticker, output in ticker_outputs.items():
+                    # Fallback outputs from failed LLM calls are neither memoized nor stored, so the next run retries them
+                    if output.get("llm_fallback"):
+                        continue
+                    if fingerprints.get(ticker):
+                        analyst_memo.set(node_name, ticker, fingerprints[ticker], signal_key, output)
+                    if ticker in store_keys:
+                        signal_store.put(store_keys[ticker], signal_key, output)
+
+        return {"analyst_signals": signals}
+
+    return memo_node
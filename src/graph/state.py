@@ -11,11 +11,30 @@ def merge_dicts(a: dict[str, any], b: dict[str, any]) -> dict[str, any]:
     return {**a, **b}
 
 
+def merge_analyst_signals(a: dict[str, dict[str, any]], b: dict[str, dict[str, any]]) -> dict[str, dict[str, any]]:
+    """Merge agent -> ticker signal updates without mutating either side.
+
+    Concurrent branches may each report signals for the same agent (e.g. one ticker at a time),
+    so tickers are merged per agent instead of the last writer replacing the whole entry.
+    """
+    merged = dict(a)
+    for agent_name, ticker_signals in b.items():
+        merged[agent_name] = {**a[agent_name], **ticker_signals} if agent_name in a else ticker_signals
+    return merged
+
+
 # Define agent state
 class AgentState(TypedDict):
     messages: Annotated[Sequence[BaseMessage], operator.add]
     data: Annotated[dict[str, any], merge_dicts]
     metadata: Annotated[dict[str, any], merge_dicts]
+    # agent_name -> ticker -> signal; nodes return only their own updates, never the whole dict
+    analyst_signals: Annotated[dict[str, dict[str, any]], merge_analyst_signals]
+
+
+def get_state_size(state: dict) -> int:
+    """Approximate size of a graph state in bytes, measured as serialized JSON."""
+    return len(json.dumps(state, default=str).encode())
 
 
 def show_agent_reasoning(output, agent_name):
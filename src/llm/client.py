@@ -0,0 +1,230 @@
+"""Provider-aware retry, concurrency and circuit breaking for LLM calls."""
+
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Optional
+
+from llm.models import ModelProvider
+
+
+class ErrorKind:
+    """How a failed LLM call should be treated."""
+
+    RATE_LIMIT = "rate_limit"  # Throttled: back off and shrink concurrency
+    TRANSIENT = "transient"  # Provider or network trouble: back off, counts toward the circuit breaker
+    INVALID_OUTPUT = "invalid_output"  # The model answered but the output did not parse: retry
+    FATAL = "fatal"  # Retrying cannot help (bad key, bad request)
+
+
+class CircuitOpenError(Exception):
+    """Raised when a provider's circuit breaker is open and calls should fail fast."""
+
+
+def _status_code(error: Exception) -> Optional[int]:
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def classify_error(error: Exception) -> str:
+    """Classify an exception raised by a LangChain chat model."""
+    status = _status_code(error)
+    name = type(error).__name__
+
+    if status == 429 or "RateLimit" in name:
+        return ErrorKind.RATE_LIMIT
+    if status in (400, 401, 403, 404, 422) or name in ("AuthenticationError", "PermissionDeniedError", "NotFoundError", "BadRequestError"):
+        return ErrorKind.FATAL
+    if status is not None or "Timeout" in name or "Connection" in name:
+        return ErrorKind.TRANSIENT
+    if name in ("ValidationError", "OutputParserException", "JSONDecodeError"):
+        return ErrorKind.INVALID_OUTPUT
+    return ErrorKind.TRANSIENT
+
+
+def get_retry_after(error: Exception) -> Optional[float]:
+    """Return the server-requested delay in seconds from a Retry-After header, if any."""
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if not headers:
+        return None
+
+    # OpenAI sends a millisecond variant alongside the standard header
+    if retry_after_ms := headers.get("retry-after-ms"):
+        try:
+            return float(retry_after_ms) / 1000
+        except ValueError:
+            pass
+
+    retry_after = headers.get("retry-after")
+    if not retry_after:
+        return None
+    try:
+        return float(retry_after)
+    except ValueError:
+        try:
+            return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter, honoring Retry-After when the provider sends it."""
+
+    def __init__(self, base_delay: float = 1.0, max_delay: float = 60.0):
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def get_delay(self, attempt: int, error: Exception) -> float:
+        """Seconds to wait before retrying after the given (0-based) failed attempt."""
+        kind = classify_error(error)
+        if kind == ErrorKind.INVALID_OUTPUT:
+            return 0.0
+
+        retry_after = get_retry_after(error)
+        if retry_after is not None:
+            # Spread out clients that were all told to come back at the same time
+            return min(self.max_delay, retry_after + random.uniform(0, self.base_delay))
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2**attempt))
+
+
+class AIMDLimiter:
+    """Additive-increase / multiplicative-decrease cap on in-flight requests."""
+
+    def __init__(self, initial_limit: int = 4, min_limit: int = 1, max_limit: int = 32, decrease_factor: float = 0.5):
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.decrease_factor = decrease_factor
+        self.in_flight = 0
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self.in_flight += 1
+
+    def release(self, rate_limited: bool = False):
+        with self._condition:
+            self.in_flight -= 1
+            if rate_limited:
+                self.limit = max(self.min_limit, self.limit * self.decrease_factor)
+            else:
+                # Grows by roughly one slot per window of successful calls
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self._condition.notify_all()
+
+
+class CircuitBreaker:
+    """Opens after consecutive provider failures and lets a single probe through after a cooldown."""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow_request(self) -> bool:
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+
+_clients: dict[str, "ProviderClient"] = {}
+_clients_lock = threading.Lock()
+
+# Starting concurrency per provider; the limiter adapts from here
+PROVIDER_CONCURRENCY = {
+    ModelProvider.OPENAI.value: 8,
+    ModelProvider.ANTHROPIC.value: 4,
+    ModelProvider.GROQ.value: 4,
+    ModelProvider.LOCAL.value: 64,
+}
+
+
+# Fraction of each provider's concurrency this process may use; see set_process_share
+_process_share = 1.0
+
+
+def set_process_share(processes: int):
+    """
+    Split each provider's concurrency between `processes` worker processes, so a process pool as a whole
+    stays within the limits of a single process. Call in the worker initializer, before any LLM call.
+    """
+    global _process_share
+    _process_share = 1 / max(1, processes)
+    with _clients_lock:
+        _clients.clear()
+
+
+class ProviderClient:
+    """Runs single LLM attempts against one provider under its limiter and circuit breaker."""
+
+    def __init__(self, provider: str):
+        self.provider = provider
+        self.retry_policy = RetryPolicy()
+        initial_limit = max(1, int(PROVIDER_CONCURRENCY.get(provider, 4) * _process_share))
+        self.limiter = AIMDLimiter(initial_limit=initial_limit, max_limit=max(initial_limit, int(32 * _process_share)))
+        self.circuit_breaker = CircuitBreaker()
+
+    def invoke(self, llm: Any, prompt: Any) -> Any:
+        """Invoke the model once. Raises CircuitOpenError if the provider is considered down."""
+        return self.call(llm.invoke, prompt)
+
+    def call(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """Run a single provider request (e.g. invoke or a consumed stream) under the limiter and breaker."""
+        if not self.circuit_breaker.allow_request():
+            raise CircuitOpenError(f"{self.provider} is unavailable, failing fast")
+
+        self.limiter.acquire()
+        rate_limited = False
+        try:
+            result = fn(*args)
+        except Exception as e:
+            kind = classify_error(e)
+            rate_limited = kind == ErrorKind.RATE_LIMIT
+            if kind == ErrorKind.TRANSIENT:
+                self.circuit_breaker.record_failure()
+            else:
+                # The provider answered, even if the answer was an error
+                self.circuit_breaker.record_success()
+            raise
+        finally:
+            self.limiter.release(rate_limited=rate_limited)
+
+        self.circuit_breaker.record_success()
+        return result
+
+
+def get_provider_client(model_provider: str) -> ProviderClient:
+    """Get the shared client for a provider."""
+    provider = getattr(model_provider, "value", model_provider)
+    with _clients_lock:
+        if provider not in _clients:
+            _clients[provider] = ProviderClient(provider)
+        return _clients[provider]
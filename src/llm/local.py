@@ -0,0 +1,190 @@
+"""Deterministic offline stand-in for LLM providers, for benchmarks and tests.
+
+Two models are available under the Local provider:
+  - local-mock: builds schema-valid outputs from the rule-based signals found in the prompt
+  - local-replay: replays responses recorded with LLM_RECORD_PATH, falling back to local-mock
+
+Environment variables:
+  - LLM_RECORD_PATH: when set, call_llm appends every successful response to this JSONL file
+  - LOCAL_LLM_REPLAY_PATH: JSONL file of recorded responses for local-replay
+  - LOCAL_LLM_LATENCY: synthetic latency in seconds added to every call (default: 0)
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Optional, Type
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.runnables import RunnableLambda
+from pydantic import BaseModel
+
+_record_lock = threading.Lock()
+# Parsed replay files by path, with the (mtime, size) they were parsed at
+_recordings_cache: dict[str, tuple[tuple[int, int], dict[str, dict]]] = {}
+
+
+def _prompt_text(prompt: Any) -> str:
+    if hasattr(prompt, "to_string"):
+        return prompt.to_string()
+    if isinstance(prompt, list):
+        return "\n".join(message.content if isinstance(message, BaseMessage) else str(message) for message in prompt)
+    return str(prompt)
+
+
+def _response_key(prompt: Any, schema: Type[BaseModel]) -> str:
+    return hashlib.sha256(f"{schema.__name__}\n{_prompt_text(prompt)}".encode()).hexdigest()
+
+
+def record_response(prompt: Any, schema: Type[BaseModel], response: BaseModel) -> None:
+    """Append a response to the LLM_RECORD_PATH file so it can be replayed later."""
+    path = os.getenv("LLM_RECORD_PATH")
+    if not path:
+        return
+    entry = {"key": _response_key(prompt, schema), "schema": schema.__name__, "response": response.model_dump()}
+    with _record_lock:
+        with open(path, "a") as f:
+            f.write(json.dumps(entry) + "\n")
+
+
+def load_recordings(path: Optional[str]) -> dict[str, dict]:
+    """Load recorded responses keyed by prompt and schema, parsing each file once until it changes."""
+    if not path or not os.path.exists(path):
+        return {}
+    stat = os.stat(path)
+    version = (stat.st_mtime_ns, stat.st_size)
+    cached = _recordings_cache.get(path)
+    if cached and cached[0] == version:
+        return cached[1]
+
+    recordings = {}
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                recordings[entry["key"]] = entry["response"]
+    _recordings_cache[path] = (version, recordings)
+    return recordings
+
+
+def _json_after(text: str, label: str) -> Optional[Any]:
+    """Decode the first JSON object that follows a label in the prompt text."""
+    label_index = text.find(label)
+    if label_index == -1:
+        return None
+    decoder = json.JSONDecoder()
+    start = text.find("{", label_index)
+    while start != -1:
+        try:
+            return decoder.raw_decode(text, start)[0]
+        except json.JSONDecodeError:
+            start = text.find("{", start + 1)
+    return None
+
+
+def _mock_signal(text: str, schema: Type[BaseModel]) -> BaseModel:
+    """Echo the rule-based signal of a persona analysis, with confidence from its score."""
+    analysis = _json_after(text, "Analysis Data for") or {}
+    signal = analysis.get("signal", "neutral")
+    score, max_score = analysis.get("score"), analysis.get("max_score")
+
+    confidence = 50.0
+    if score is not None and max_score:
+        ratio = min(max(score / max_score, 0.0), 1.0)
+        confidence = {"bullish": ratio * 100, "bearish": (1 - ratio) * 100}.get(signal, 50.0)
+
+    return schema(
+        signal=signal,
+        confidence=round(confidence, 1),
+        reasoning=f"Local mock: rule-based {signal} signal (score {score}/{max_score})",
+    )
+
+
+def _mock_decisions(text: str, schema: Type[BaseModel]) -> BaseModel:
+    """Trade on the majority analyst signal per ticker, sized to the allowed maximum."""
+    signals_by_ticker = _json_after(text, "signals by ticker") or {}
+    max_shares = _json_after(text, "Maximum Shares Allowed") or {}
+    positions = _json_after(text, "Current Positions") or {}
+
+    decisions = {}
+    for ticker, ticker_signals in signals_by_ticker.items():
+        votes = [signal.get("signal") for signal in ticker_signals.values()]
+        bullish, bearish = votes.count("bullish"), votes.count("bearish")
+        long_shares = positions.get(ticker, {}).get("long", 0)
+        short_shares = positions.get(ticker, {}).get("short", 0)
+
+        if bullish > bearish:
+            action, quantity = ("cover", short_shares) if short_shares else ("buy", max_shares.get(ticker, 0))
+        elif bearish > bullish:
+            action, quantity = ("sell", long_shares) if long_shares else ("short", max_shares.get(ticker, 0))
+        else:
+            action, quantity = "hold", 0
+
+        decisions[ticker] = {
+            "action": action,
+            "quantity": int(quantity),
+            "confidence": round(100 * max(bullish, bearish) / len(votes), 1) if votes else 0.0,
+            "reasoning": f"Local mock: {bullish} bullish, {bearish} bearish of {len(votes)} signals",
+        }
+
+    return schema(decisions=decisions)
+
+
+def mock_response(prompt: Any, schema: Type[BaseModel]) -> BaseModel:
+    """Build a deterministic, schema-valid response from the prompt contents."""
+    from utils.llm import create_default_response
+
+    text = _prompt_text(prompt)
+    fields = schema.model_fields
+    if "decisions" in fields:
+        return _mock_decisions(text, schema)
+    if {"signal", "confidence", "reasoning"} <= set(fields):
+        return _mock_signal(text, schema)
+    return create_default_response(schema)
+
+
+class LocalChatModel(BaseChatModel):
+    """Chat model that answers locally from rules or recorded responses."""
+
+    model_name: str = "local-mock"
+    latency: float = 0.0
+    recordings: dict[str, dict] = {}
+
+    @property
+    def _llm_type(self) -> str:
+        return "local"
+
+    def respond(self, prompt: Any, schema: Type[BaseModel]) -> BaseModel:
+        """Replay a recorded response if there is one, otherwise build one from rules."""
+        if self.latency > 0:
+            time.sleep(self.latency)
+        if (recorded := self.recordings.get(_response_key(prompt, schema))) is not None:
+            return schema(**recorded)
+        return mock_response(prompt, schema)
+
+    def with_structured_output(self, schema: Type[BaseModel], *, include_raw: bool = False, **kwargs: Any):
+        from utils.prompt import estimate_tokens
+
+        def invoke(prompt: Any):
+            parsed = self.respond(prompt, schema)
+            if not include_raw:
+                return parsed
+            content = parsed.model_dump_json()
+            input_tokens, output_tokens = estimate_tokens(_prompt_text(prompt)), estimate_tokens(content)
+            raw = AIMessage(
+                content=content,
+                usage_metadata={"input_tokens": input_tokens, "output_tokens": output_tokens, "total_tokens": input_tokens + output_tokens},
+            )
+            return {"raw": raw, "parsed": parsed, "parsing_error": None}
+
+        return RunnableLambda(invoke)
+
+    def _generate(self, messages: list[BaseMessage], stop: Optional[list[str]] = None, run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        # Free-form calls carry no schema to build an answer from
+        if self.latency > 0:
+            time.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="{}"))])
@@ -1,5 +1,6 @@
 import os
 from langchain_anthropic import ChatAnthropic
+from langchain_core.language_models.chat_models import BaseChatModel
 from langchain_groq import ChatGroq
 from langchain_openai import ChatOpenAI
 from enum import Enum
@@ -12,6 +13,7 @@ class ModelProvider(str, Enum):
     OPENAI = "OpenAI"
     GROQ = "Groq"
     ANTHROPIC = "Anthropic"
+    LOCAL = "Local"
 
 
 class LLMModel(BaseModel):
@@ -19,6 +21,9 @@ class LLMModel(BaseModel):
     display_name: str
     model_name: str
     provider: ModelProvider
+    # Max tokens for the analysis data embedded in a prompt, set from the model's price per input token and
+    # context window (Groq models are also bound by tokens-per-minute limits); None means no cap
+    payload_token_budget: int | None = None
 
     def to_choice_tuple(self) -> Tuple[str, str, str]:
         """Convert to format needed for questionary choices"""
@@ -34,47 +39,66 @@ AVAILABLE_MODELS = [
     LLMModel(
         display_name="[anthropic] claude-3.5-haiku",
         model_name="claude-3-5-haiku-latest",
-        provider=ModelProvider.ANTHROPIC
+        provider=ModelProvider.ANTHROPIC,
+        payload_token_budget=4000,
     ),
     LLMModel(
         display_name="[anthropic] claude-3.5-sonnet",
         model_name="claude-3-5-sonnet-latest",
-        provider=ModelProvider.ANTHROPIC
+        provider=ModelProvider.ANTHROPIC,
+        payload_token_budget=2000,
     ),
     LLMModel(
         display_name="[anthropic] claude-3.7-sonnet",
         model_name="claude-3-7-sonnet-latest",
-        provider=ModelProvider.ANTHROPIC
+        provider=ModelProvider.ANTHROPIC,
+        payload_token_budget=2000,
     ),
     LLMModel(
         display_name="[groq] deepseek-r1 70b",
         model_name="deepseek-r1-distill-llama-70b",
-        provider=ModelProvider.GROQ
+        provider=ModelProvider.GROQ,
+        payload_token_budget=1500,
     ),
     LLMModel(
         display_name="[groq] llama-3.3 70b",
         model_name="llama-3.3-70b-versatile",
-        provider=ModelProvider.GROQ
+        provider=ModelProvider.GROQ,
+        payload_token_budget=1500,
     ),
     LLMModel(
         display_name="[openai] gpt-4o",
         model_name="gpt-4o",
-        provider=ModelProvider.OPENAI
+        provider=ModelProvider.OPENAI,
+        payload_token_budget=2000,
     ),
     LLMModel(
         display_name="[openai] gpt-4o-mini",
         model_name="gpt-4o-mini",
-        provider=ModelProvider.OPENAI
+        provider=ModelProvider.OPENAI,
+        payload_token_budget=6000,
     ),
     LLMModel(
         display_name="[openai] o1",
         model_name="o1",
-        provider=ModelProvider.OPENAI
+        provider=ModelProvider.OPENAI,
+        payload_token_budget=1000,
     ),
     LLMModel(
         display_name="[openai] o3-mini",
         model_name="o3-mini",
-        provider=ModelProvider.OPENAI
+        provider=ModelProvider.OPENAI,
+        payload_token_budget=3000,
+    ),
+    LLMModel(
+        display_name="[local] mock (offline, rule-based)",
+        model_name="local-mock",
+        provider=ModelProvider.LOCAL
+    ),
+    LLMModel(
+        display_name="[local] replay (offline, recorded responses)",
+        model_name="local-replay",
+        provider=ModelProvider.LOCAL
     ),
 ]
 
@@ -85,7 +109,7 @@ def get_model_info(model_name: str) -> LLMModel | None:
     """Get model information by model_name"""
     return next((model for model in AVAILABLE_MODELS if model.model_name == model_name), None)
 
-def get_model(model_name: str, model_provider: ModelProvider) -> ChatOpenAI | ChatGroq | None:
+def get_model(model_name: str, model_provider: ModelProvider) -> ChatOpenAI | ChatGroq | ChatAnthropic | BaseChatModel | None:
     if model_provider == ModelProvider.GROQ:
         api_key = os.getenv("GROQ_API_KEY")
         if not api_key:
@@ -106,4 +130,9 @@ def get_model(model_name: str, model_provider: ModelProvider) -> ChatOpenAI | Ch
         if not api_key:
             print(f"API Key Error: Please make sure ANTHROPIC_API_KEY is set in your .env file.")
             raise ValueError("Anthropic API key not found.  Please make sure ANTHROPIC_API_KEY is set in your .env file.")
-        return ChatAnthropic(model=model_name, api_key=api_key)
\ No newline at end of file
+        return ChatAnthropic(model=model_name, api_key=api_key)
+    elif model_provider == ModelProvider.LOCAL:
+        from llm.local import LocalChatModel, load_recordings
+
+        recordings = load_recordings(os.getenv("LOCAL_LLM_REPLAY_PATH")) if model_name == "local-replay" else {}
+        return LocalChatModel(model_name=model_name, latency=float(os.getenv("LOCAL_LLM_LATENCY", "0")), recordings=recordings)
\ No newline at end of file
@@ -1,10 +1,14 @@
+import contextlib
+import json
+import os
+import sqlite3
 import sys
+import threading
 
 from dotenv import load_dotenv
 from langchain_core.messages import HumanMessage
 from langgraph.graph import END, StateGraph
 from colorama import Fore, Back, Style, init
-import questionary
 from agents.ben_graham import ben_graham_agent
 from agents.bill_ackman import bill_ackman_agent
 from agents.fundamentals import fundamentals_agent
@@ -13,12 +17,16 @@ from agents.technicals import technical_analyst_agent
 from agents.risk_manager import risk_management_agent
 from agents.sentiment import sentiment_agent
 from agents.warren_buffett import warren_buffett_agent
-from graph.state import AgentState
+from graph.state import AgentState, get_state_size
+from graph.async_nodes import to_async_node
+from graph.memo import memoize_analyst
+from data.signal_store import signal_store
 from agents.valuation import valuation_agent
-from utils.display import print_trading_output
-from utils.analysts import ANALYST_ORDER, get_analyst_nodes
+from utils.display import print_trading_output, print_llm_usage
+from utils.analysts import get_analyst_inputs, get_analyst_nodes, get_analyst_uses_llm
+from utils.cli import add_common_arguments, parse_args, select_analysts, select_model
 from utils.progress import progress
-from llm.models import LLM_ORDER, get_model_info
+from utils.metrics import llm_metrics
 
 import argparse
 from datetime import datetime
@@ -31,6 +39,9 @@ load_dotenv()
 
 init(autoreset=True)
 
+# Debugging aid: when set, every run serializes its final graph state to measure it, and warns above this many bytes
+MAX_STATE_BYTES = int(os.getenv("MAX_STATE_BYTES", 0)) or None
+
 
 def parse_hedge_fund_response(response):
     import json
@@ -52,58 +63,213 @@ def run_hedge_fund(
     selected_analysts: list[str] = [],
     model_name: str = "gpt-4o",
     model_provider: str = "OpenAI",
+    llm_skip_threshold: float | None = None,
+    checkpoint_path: str | None = None,
+    thread_id: str | None = None,
+    reuse_unchanged_analysts: bool = False,
+    analyst_signals: dict | None = None,
+    position_limit_fraction: float = 0.20,
+    rule_only: bool = False,
+    quiet: bool = False,
+):
+    """
+    Runs the hedge fund once. With checkpoint_path and thread_id, node results are checkpointed
+    to SQLite and a rerun with the same thread_id resumes after the last completed node.
+    With reuse_unchanged_analysts, analysts reuse their previous output for tickers whose inputs are unchanged.
+    With analyst_signals (e.g. from run_analysts), the analysts are skipped and only risk and portfolio management run.
+    position_limit_fraction caps any single position at that fraction of the portfolio value.
+    With rule_only, no LLM is called: persona agents emit their rule-based signals and the portfolio
+    manager trades on the confidence-weighted signals within the risk limits.
+    With quiet, the live progress display is not shown.
+    """
+    # Start progress tracking
+    if not quiet:
+        progress.start()
+    usage_run = llm_metrics.start_run()
+
+    try:
+        # Reuse the graph compiled for this analyst selection
+        agent = get_hedge_fund_graph(selected_analysts or None, checkpoint_path=checkpoint_path, stage=get_run_stage(analyst_signals))
+
+        state = create_initial_state(tickers, start_date, end_date, portfolio, show_reasoning, model_name, model_provider, llm_skip_threshold, reuse_unchanged_analysts, position_limit_fraction, rule_only, analyst_signals)
+
+        final_state = agent.invoke(state, thread_id=thread_id)
+
+        return create_result(final_state, usage_run)
+    finally:
+        # Stop progress tracking
+        if not quiet:
+            progress.stop()
+        llm_metrics.end_run(usage_run)
+        llm_metrics.export()
+
+
+def run_analysts(
+    tickers: list[str],
+    start_date: str,
+    end_date: str,
+    show_reasoning: bool = False,
+    selected_analysts: list[str] = [],
+    model_name: str = "gpt-4o",
+    model_provider: str = "OpenAI",
+    llm_skip_threshold: float | None = None,
+    reuse_unchanged_analysts: bool = False,
+    rule_only: bool = False,
+) -> dict:
+    """
+    Runs only the analysts and returns their signals. Analysts do not read the portfolio, so the
+    signals can be computed ahead of time and passed to run_hedge_fund(analyst_signals=...).
+    """
+    # The portfolio is not read by analysts, so an empty one stands in
+    state = create_initial_state(tickers, start_date, end_date, create_portfolio(tickers), show_reasoning, model_name, model_provider, llm_skip_threshold, reuse_unchanged_analysts, rule_only=rule_only)
+    return get_hedge_fund_graph(selected_analysts or None, stage="analysts").invoke(state)["analyst_signals"]
+
+
+async def arun_hedge_fund(
+    tickers: list[str],
+    start_date: str,
+    end_date: str,
+    portfolio: dict,
+    show_reasoning: bool = False,
+    selected_analysts: list[str] = [],
+    model_name: str = "gpt-4o",
+    model_provider: str = "OpenAI",
+    llm_skip_threshold: float | None = None,
+    reuse_unchanged_analysts: bool = False,
+    analyst_signals: dict | None = None,
+    position_limit_fraction: float = 0.20,
+    rule_only: bool = False,
+    quiet: bool = False,
 ):
+    """
+    Async variant of run_hedge_fund, so several portfolios or dates can be evaluated concurrently in one event loop.
+    Takes the same options except checkpointing. The agents themselves are sync: each node runs on a
+    shared thread pool (see graph.async_nodes), so concurrency is bounded by AGENT_EXECUTOR_WORKERS.
+    """
     # Start progress tracking
-    progress.start()
+    if not quiet:
+        progress.start()
+    usage_run = llm_metrics.start_run()
 
     try:
-        # Create a new workflow if analysts are customized
-        if selected_analysts:
-            workflow = create_workflow(selected_analysts)
-            agent = workflow.compile()
-        else:
-            agent = app
-
-        final_state = agent.invoke(
-            {
-                "messages": [
-                    HumanMessage(
-                        content="Make trading decisions based on the provided data.",
-                    )
-                ],
-                "data": {
-                    "tickers": tickers,
-                    "portfolio": portfolio,
-                    "start_date": start_date,
-                    "end_date": end_date,
-                    "analyst_signals": {},
-                },
-                "metadata": {
-                    "show_reasoning": show_reasoning,
-                    "model_name": model_name,
-                    "model_provider": model_provider,
-                },
-            },
+        agent = get_hedge_fund_graph(selected_analysts or None, asynchronous=True, stage=get_run_stage(analyst_signals))
+
+        final_state = await agent.ainvoke(
+            create_initial_state(tickers, start_date, end_date, portfolio, show_reasoning, model_name, model_provider, llm_skip_threshold, reuse_unchanged_analysts, position_limit_fraction, rule_only, analyst_signals),
         )
 
-        return {
-            "decisions": parse_hedge_fund_response(final_state["messages"][-1].content),
-            "analyst_signals": final_state["data"]["analyst_signals"],
-        }
+        return create_result(final_state, usage_run)
     finally:
         # Stop progress tracking
-        progress.stop()
+        if not quiet:
+            progress.stop()
+        llm_metrics.end_run(usage_run)
+        llm_metrics.export()
+
+
+def create_initial_state(
+    tickers: list[str],
+    start_date: str,
+    end_date: str,
+    portfolio: dict,
+    show_reasoning: bool,
+    model_name: str,
+    model_provider: str,
+    llm_skip_threshold: float | None,
+    reuse_unchanged_analysts: bool = False,
+    position_limit_fraction: float = 0.20,
+    rule_only: bool = False,
+    analyst_signals: dict | None = None,
+) -> AgentState:
+    """Build the graph input for one hedge fund run, with analyst_signals when the analysts are skipped."""
+    return {
+        "messages": [
+            HumanMessage(
+                content="Make trading decisions based on the provided data.",
+            )
+        ],
+        "data": {
+            "tickers": tickers,
+            "portfolio": portfolio,
+            "start_date": start_date,
+            "end_date": end_date,
+        },
+        "analyst_signals": analyst_signals if analyst_signals is not None else {},
+        "metadata": {
+            "show_reasoning": show_reasoning,
+            "model_name": model_name,
+            "model_provider": model_provider,
+            # A threshold of 0 makes the persona agents always use their rule-based signal
+            "llm_skip_threshold": 0.0 if rule_only else llm_skip_threshold,
+            "reuse_unchanged_analysts": reuse_unchanged_analysts,
+            "position_limit_fraction": position_limit_fraction,
+            "rule_only": rule_only,
+        },
+    }
+
+
+def get_run_stage(analyst_signals: dict | None) -> str:
+    """The graph stage for a run: precomputed analyst signals leave only risk and portfolio management."""
+    return "all" if analyst_signals is None else "decisions"
+
+
+def create_result(final_state: AgentState, usage_run: int | None) -> dict:
+    """Extract the decisions, analyst signals and LLM usage (unless usage_run is None) from a finished run."""
+    # Guard against state that grows with the run (e.g. agents re-adding the message history)
+    state_size = get_state_size(final_state) if MAX_STATE_BYTES else None
+    if state_size is not None and state_size > MAX_STATE_BYTES:
+        print(f"{Fore.YELLOW}Warning: final graph state is {state_size / 1024:.0f} KiB (limit {MAX_STATE_BYTES / 1024:.0f} KiB){Style.RESET_ALL}")
+
+    result = {
+        "decisions": parse_hedge_fund_response(final_state["messages"][-1].content),
+        "analyst_signals": final_state["analyst_signals"],
+        "state_size": state_size,
+    }
+    if usage_run is not None:
+        result["llm_usage"] = llm_metrics.summarize(usage_run)
+    return result
+
+
+def create_portfolio(tickers: list[str], initial_cash: float = 100000.0, margin_requirement: float = 0.0) -> dict:
+    """Create an empty portfolio with the given cash and margin requirement."""
+    return {
+        "cash": initial_cash,  # Initial cash amount
+        "margin_requirement": margin_requirement,  # Initial margin requirement
+        "positions": {
+            ticker: {
+                "long": 0,  # Number of shares held long
+                "short": 0,  # Number of shares held short
+                "long_cost_basis": 0.0,  # Average cost basis for long positions
+                "short_cost_basis": 0.0,  # Average price at which shares were sold short
+            } for ticker in tickers
+        },
+        "realized_gains": {
+            ticker: {
+                "long": 0.0,  # Realized gains from long positions
+                "short": 0.0,  # Realized gains from short positions
+            } for ticker in tickers
+        }
+    }
 
 
 def start(state: AgentState):
-    """Initialize the workflow with the input message."""
-    return state
+    """Entry point of the workflow. The input is already in the state, so there is nothing to update."""
+    # Returning the state would re-add the input messages through the messages reducer
+    return None
+
 
+def create_workflow(selected_analysts=None, asynchronous: bool = False, stage: str = "all"):
+    """
+    Create the workflow with selected analysts. With asynchronous=True every node is awaitable, for ainvoke
+    (the sync agents run on a thread pool, see graph.async_nodes).
+
+    stage="analysts" builds only the analysts, and stage="decisions" only risk and portfolio
+    management, which then read the analyst signals passed in the input state.
+    """
+    # Async nodes run the sync agents on a shared, bounded executor
+    node = to_async_node if asynchronous else lambda func: func
 
-def create_workflow(selected_analysts=None):
-    """Create the workflow with selected analysts."""
     workflow = StateGraph(AgentState)
-    workflow.add_node("start_node", start)
 
     # Get analyst nodes from the configuration
     analyst_nodes = get_analyst_nodes()
@@ -111,28 +277,118 @@ def create_workflow(selected_analysts=None):
     # Default to all analysts if none selected
     if selected_analysts is None:
         selected_analysts = list(analyst_nodes.keys())
-    # Add selected analyst nodes
-    for analyst_key in selected_analysts:
-        node_name, node_func = analyst_nodes[analyst_key]
-        workflow.add_node(node_name, node_func)
-        workflow.add_edge("start_node", node_name)
 
-    # Always add risk and portfolio management
-    workflow.add_node("risk_management_agent", risk_management_agent)
-    workflow.add_node("portfolio_management_agent", portfolio_management_agent)
+    if stage != "decisions":
+        workflow.add_node("start_node", node(start))
+        workflow.set_entry_point("start_node")
+
+        # Add selected analyst nodes
+        for analyst_key in selected_analysts:
+            node_name, node_func = analyst_nodes[analyst_key]
+            # Analysts whose inputs are unchanged since their last run can reuse that output
+            workflow.add_node(node_name, node(memoize_analyst(node_name, node_func, get_analyst_inputs(analyst_key), get_analyst_uses_llm(analyst_key))))
+            workflow.add_edge("start_node", node_name)
 
-    # Connect selected analysts to risk management
-    for analyst_key in selected_analysts:
-        node_name = analyst_nodes[analyst_key][0]
-        workflow.add_edge(node_name, "risk_management_agent")
+    if stage == "analysts":
+        for analyst_key in selected_analysts:
+            workflow.add_edge(analyst_nodes[analyst_key][0], END)
+        return workflow
+
+    # Add risk and portfolio management
+    workflow.add_node("risk_management_agent", node(risk_management_agent))
+    workflow.add_node("portfolio_management_agent", node(portfolio_management_agent))
+
+    if stage == "decisions":
+        workflow.set_entry_point("risk_management_agent")
+    else:
+        # Connect selected analysts to risk management
+        for analyst_key in selected_analysts:
+            node_name = analyst_nodes[analyst_key][0]
+            workflow.add_edge(node_name, "risk_management_agent")
 
     workflow.add_edge("risk_management_agent", "portfolio_management_agent")
     workflow.add_edge("portfolio_management_agent", END)
 
-    workflow.set_entry_point("start_node")
     return workflow
 
 
+class HedgeFundGraph:
+    """The compiled workflow for one analyst selection, built once and invoked many times."""
+
+    def __init__(self, selected_analysts: list[str] | None = None, asynchronous: bool = False, checkpointer=None, stage: str = "all"):
+        self.selected_analysts = selected_analysts
+        self.asynchronous = asynchronous
+        self.checkpointer = checkpointer
+        self.stage = stage
+        self.app = create_workflow(selected_analysts, asynchronous=asynchronous, stage=stage).compile(checkpointer=checkpointer)
+
+    def invoke(self, state: AgentState, thread_id: str | None = None) -> AgentState:
+        if self.checkpointer is None or thread_id is None:
+            return self.app.invoke(state)
+        config = {"configurable": {"thread_id": thread_id}}
+        # Resume an interrupted run from its last completed node
+        if self.app.get_state(config).next:
+            return self.app.invoke(None, config)
+        return self.app.invoke(state, config)
+
+    async def ainvoke(self, state: AgentState) -> AgentState:
+        return await self.app.ainvoke(state)
+
+
+_graph_cache: dict[tuple, HedgeFundGraph] = {}
+_graph_cache_lock = threading.Lock()
+_checkpointers: dict[str, any] = {}
+
+
+def get_checkpointer(checkpoint_path: str | None):
+    """Get a LangGraph SQLite checkpointer for the path (requires langgraph-checkpoint-sqlite)."""
+    if not checkpoint_path:
+        return None
+    with _graph_cache_lock:
+        if checkpoint_path not in _checkpointers:
+            try:
+                from langgraph.checkpoint.sqlite import SqliteSaver
+            except ImportError:
+                print(f"{Fore.YELLOW}Warning: langgraph-checkpoint-sqlite is not installed, node results will not be checkpointed{Style.RESET_ALL}")
+                _checkpointers[checkpoint_path] = None
+            else:
+                _checkpointers[checkpoint_path] = SqliteSaver(sqlite3.connect(checkpoint_path, check_same_thread=False))
+        return _checkpointers[checkpoint_path]
+
+
+def delete_checkpoint_thread(checkpoint_path: str, thread_id: str):
+    """Delete a finished thread's node checkpoints, so the SQLite file does not grow with every run."""
+    checkpointer = get_checkpointer(checkpoint_path)
+    if checkpointer is None:
+        return
+    try:
+        checkpointer.delete_thread(thread_id)
+        return
+    except NotImplementedError:
+        # SqliteSaver before 2.0.7 inherits the base method, which only raises
+        pass
+    checkpointer.setup()
+    with checkpointer.lock, checkpointer.conn:
+        checkpointer.conn.execute("DELETE FROM checkpoints WHERE thread_id = ?", (thread_id,))
+        checkpointer.conn.execute("DELETE FROM writes WHERE thread_id = ?", (thread_id,))
+
+
+def get_hedge_fund_graph(selected_analysts: list[str] | None = None, asynchronous: bool = False, checkpoint_path: str | None = None, stage: str = "all") -> HedgeFundGraph:
+    """Get the compiled graph for an analyst selection, compiling it on first use.
+
+    Checkpointing is only supported for sync graphs, since SqliteSaver has no async interface.
+    """
+    checkpointer = None if asynchronous else get_checkpointer(checkpoint_path)
+    # The graph only depends on which analysts are selected, not on their order
+    if stage == "decisions":
+        selected_analysts = None
+    key = (frozenset(selected_analysts) if selected_analysts else None, asynchronous, checkpoint_path if checkpointer else None, stage)
+    with _graph_cache_lock:
+        if key not in _graph_cache:
+            _graph_cache[key] = HedgeFundGraph(selected_analysts, asynchronous=asynchronous, checkpointer=checkpointer, stage=stage)
+        return _graph_cache[key]
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Run the hedge fund trading system")
     parser.add_argument(
@@ -158,64 +414,35 @@ if __name__ == "__main__":
     parser.add_argument(
         "--show-agent-graph", action="store_true", help="Show the agent graph"
     )
+    parser.add_argument(
+        "--llm-skip-threshold",
+        type=float,
+        help="Skip the LLM for persona agents when the rule-based score is at least this fraction of the max (or at most 1 minus it), e.g. 0.9",
+    )
+    parser.add_argument(
+        "--rule-only",
+        action="store_true",
+        help="Make decisions without any LLM calls, from the analysts' rule-based signals (skips the model prompt)",
+    )
+
+    add_common_arguments(parser)
 
-    args = parser.parse_args()
+    args = parse_args(parser)
+    json_output = args.output == "json"
+
+    if args.signal_store:
+        signal_store.configure(args.signal_store)
 
     # Parse tickers from comma-separated string
     tickers = [ticker.strip() for ticker in args.tickers.split(",")]
 
-    # Select analysts
-    selected_analysts = None
-    choices = questionary.checkbox(
-        "Select your AI analysts.",
-        choices=[questionary.Choice(display, value=value) for display, value in ANALYST_ORDER],
-        instruction="\n\nInstructions: \n1. Press Space to select/unselect analysts.\n2. Press 'a' to select/unselect all.\n3. Press Enter when done to run the hedge fund.\n",
-        validate=lambda x: len(x) > 0 or "You must select at least one analyst.",
-        style=questionary.Style(
-            [
-                ("checkbox-selected", "fg:green"),
-                ("selected", "fg:green noinherit"),
-                ("highlighted", "noinherit"),
-                ("pointer", "noinherit"),
-            ]
-        ),
-    ).ask()
-
-    if not choices:
-        print("\n\nInterrupt received. Exiting...")
-        sys.exit(0)
-    else:
-        selected_analysts = choices
-        print(f"\nSelected analysts: {', '.join(Fore.GREEN + choice.title().replace('_', ' ') + Style.RESET_ALL for choice in choices)}\n")
-
-    # Select LLM model
-    model_choice = questionary.select(
-        "Select your LLM model:",
-        choices=[questionary.Choice(display, value=value) for display, value, _ in LLM_ORDER],
-        style=questionary.Style([
-            ("selected", "fg:green bold"),
-            ("pointer", "fg:green bold"),
-            ("highlighted", "fg:green"),
-            ("answer", "fg:green bold"),
-        ])
-    ).ask()
-
-    if not model_choice:
-        print("\n\nInterrupt received. Exiting...")
-        sys.exit(0)
-    else:
-        # Get model info using the helper function
-        model_info = get_model_info(model_choice)
-        if model_info:
-            model_provider = model_info.provider.value
-            print(f"\nSelected {Fore.CYAN}{model_provider}{Style.RESET_ALL} model: {Fore.GREEN + Style.BRIGHT}{model_choice}{Style.RESET_ALL}\n")
-        else:
-            model_provider = "Unknown"
-            print(f"\nSelected model: {Fore.GREEN + Style.BRIGHT}{model_choice}{Style.RESET_ALL}\n")
-
-    # Create the workflow with selected analysts
-    workflow = create_workflow(selected_analysts)
-    app = workflow.compile()
+    # Select analysts and LLM model, prompting only for what was not passed as a flag
+    selected_analysts = select_analysts(args.analysts, quiet=json_output, parser=parser)
+    # No model is called in rule-only mode; the name only labels stored analyst outputs
+    model_choice, model_provider = ("rule-only", "None") if args.rule_only else select_model(args.model, quiet=json_output, parser=parser)
+
+    # Compile the workflow with selected analysts
+    hedge_fund = get_hedge_fund_graph(selected_analysts)
 
     if args.show_agent_graph:
         file_path = ""
@@ -223,7 +450,7 @@ if __name__ == "__main__":
             for selected_analyst in selected_analysts:
                 file_path += selected_analyst + "_"
             file_path += "graph.png"
-        save_graph_as_png(app, file_path)
+        save_graph_as_png(hedge_fund.app, file_path)
 
     # Validate dates if provided
     if args.start_date:
@@ -248,34 +475,26 @@ if __name__ == "__main__":
         start_date = args.start_date
 
     # Initialize portfolio with cash amount and stock positions
-    portfolio = {
-        "cash": args.initial_cash,  # Initial cash amount
-        "margin_requirement": args.margin_requirement,  # Initial margin requirement
-        "positions": {
-            ticker: {
-                "long": 0,  # Number of shares held long
-                "short": 0,  # Number of shares held short
-                "long_cost_basis": 0.0,  # Average cost basis for long positions
-                "short_cost_basis": 0.0,  # Average price at which shares were sold short
-            } for ticker in tickers
-        },
-        "realized_gains": {
-            ticker: {
-                "long": 0.0,  # Realized gains from long positions
-                "short": 0.0,  # Realized gains from short positions
-            } for ticker in tickers
-        }
-    }
+    portfolio = create_portfolio(tickers, args.initial_cash, args.margin_requirement)
+
+    # In JSON mode everything else the run prints goes to stderr, so stdout is a single JSON document
+    with contextlib.redirect_stdout(sys.stderr if json_output else sys.stdout):
+        # Run the hedge fund
+        result = run_hedge_fund(
+            tickers=tickers,
+            start_date=start_date,
+            end_date=end_date,
+            portfolio=portfolio,
+            show_reasoning=args.show_reasoning,
+            selected_analysts=selected_analysts,
+            model_name=model_choice,
+            model_provider=model_provider,
+            llm_skip_threshold=args.llm_skip_threshold,
+            rule_only=args.rule_only,
+        )
 
-    # Run the hedge fund
-    result = run_hedge_fund(
-        tickers=tickers,
-        start_date=start_date,
-        end_date=end_date,
-        portfolio=portfolio,
-        show_reasoning=args.show_reasoning,
-        selected_analysts=selected_analysts,
-        model_name=model_choice,
-        model_provider=model_provider,
-    )
-    print_trading_output(result)
+    if json_output:
+        print(json.dumps(result, default=str))
+    else:
+        print_trading_output(result)
+        print_llm_usage(result["llm_usage"])
@@ -0,0 +1,90 @@
+"""Run one ticker universe against many portfolio scenarios, sharing the analyst stage."""
+
+import contextvars
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from pydantic import BaseModel
+
+from main import create_initial_state, create_portfolio, create_result, get_hedge_fund_graph, run_analysts
+from utils.metrics import llm_metrics
+from utils.progress import progress
+
+
+class Scenario(BaseModel):
+    """One portfolio configuration to evaluate."""
+
+    name: str
+    initial_cash: float = 100000.0
+    margin_requirement: float = 0.0
+    selected_analysts: list[str] | None = None  # None means all analysts
+    portfolio: dict | None = None  # Overrides initial_cash and margin_requirement, e.g. to start with open positions
+
+    def get_portfolio(self, tickers: list[str]) -> dict:
+        return self.portfolio if self.portfolio is not None else create_portfolio(tickers, self.initial_cash, self.margin_requirement)
+
+
+def run_scenarios(
+    tickers: list[str],
+    start_date: str,
+    end_date: str,
+    scenarios: list[Scenario],
+    show_reasoning: bool = False,
+    model_name: str = "gpt-4o",
+    model_provider: str = "OpenAI",
+    llm_skip_threshold: float | None = None,
+    max_workers: int = 8,
+) -> dict:
+    """
+    Runs every scenario on the same tickers and dates. Analysts do not read the portfolio, so they run
+    once per distinct analyst selection; only risk and portfolio management run once per scenario.
+
+    Returns:
+        {"scenarios": {name: {"decisions", "analyst_signals", "state_size"}}, "llm_usage": {...}}
+    """
+    # Results are keyed by name, so a repeated name would silently drop a scenario
+    duplicates = sorted(name for name, count in Counter(scenario.name for scenario in scenarios).items() if count > 1)
+    if duplicates:
+        raise ValueError(f"Duplicate scenario names: {', '.join(duplicates)}")
+
+    progress.start()
+    usage_run = llm_metrics.start_run()
+
+    try:
+        # Group scenarios by analyst selection, regardless of order
+        groups: dict[frozenset | None, list[Scenario]] = {}
+        for scenario in scenarios:
+            key = frozenset(scenario.selected_analysts) if scenario.selected_analysts else None
+            groups.setdefault(key, []).append(scenario)
+
+        def run_decisions(scenario: Scenario, analyst_signals: dict) -> dict:
+            state = create_initial_state(tickers, start_date, end_date, scenario.get_portfolio(tickers), show_reasoning, model_name, model_provider, llm_skip_threshold)
+            state["analyst_signals"] = analyst_signals
+            return create_result(get_hedge_fund_graph(stage="decisions").invoke(state), usage_run=None)
+
+        def submit(executor: ThreadPoolExecutor, fn, *args):
+            # Carry this run's context into the worker thread so its LLM calls count towards usage_run
+            return executor.submit(contextvars.copy_context().run, fn, *args)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            # 1) One analyst stage per distinct selection
+            selections = {key: group[0].selected_analysts for key, group in groups.items()}
+            signal_futures = {
+                key: submit(executor, run_analysts, tickers, start_date, end_date, show_reasoning, selection, model_name, model_provider, llm_skip_threshold)
+                for key, selection in selections.items()
+            }
+            signals_by_group = {key: future.result() for key, future in signal_futures.items()}
+
+            # 2) Risk and portfolio management for every scenario
+            decision_futures = {
+                scenario.name: submit(executor, run_decisions, scenario, signals_by_group[key])
+                for key, group in groups.items()
+                for scenario in group
+            }
+            results = {name: future.result() for name, future in decision_futures.items()}
+
+        return {"scenarios": results, "llm_usage": llm_metrics.summarize(usage_run)}
+    finally:
+        progress.stop()
+        llm_metrics.end_run(usage_run)
+        llm_metrics.export()
@@ -0,0 +1,223 @@
+"""Grid search over backtest parameters, running the backtests on a process pool."""
+
+import contextlib
+import itertools
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+import pandas as pd
+from colorama import Fore, Style, init
+from dateutil.relativedelta import relativedelta
+from pydantic import BaseModel
+from tabulate import tabulate
+
+from backtester import Backtester
+from backtesting.signals import init_worker
+from data.cache import get_cache
+from data.signal_store import signal_store
+from llm.models import get_model_info
+from main import run_hedge_fund
+from utils.analysts import ANALYST_CONFIG
+from utils.cli import parse_args, select_model
+
+init(autoreset=True)
+
+
+class SweepPoint(BaseModel):
+    """One combination of backtest parameters in a sweep."""
+
+    name: str
+    margin_requirement: float = 0.0
+    selected_analysts: list[str]
+    position_limit_fraction: float = 0.20
+    model_name: str = "gpt-4o"
+
+
+def _analysts_name(analysts: list[str]) -> str:
+    return "all" if set(analysts) == set(ANALYST_CONFIG) else "+".join(analysts)
+
+
+def build_grid(
+    margin_requirements: list[float],
+    analyst_sets: list[list[str]],
+    position_limit_fractions: list[float],
+    model_names: list[str],
+) -> list[SweepPoint]:
+    """Every combination of the given parameter values."""
+    grid = []
+    for margin, analysts, limit, model_name in itertools.product(margin_requirements, analyst_sets, position_limit_fractions, model_names):
+        grid.append(
+            SweepPoint(
+                name=f"margin={margin} analysts={_analysts_name(analysts)} limit={limit} model={model_name}",
+                margin_requirement=margin,
+                selected_analysts=analysts,
+                position_limit_fraction=limit,
+                model_name=model_name,
+            )
+        )
+    return grid
+
+
+def _model_provider(model_name: str) -> str:
+    model_info = get_model_info(model_name)
+    return model_info.provider.value if model_info else "Unknown"
+
+
+def _run_point(point: SweepPoint, tickers: list[str], start_date: str, end_date: str, initial_capital: float, llm_skip_threshold: float | None, analyst_signals: dict[str, dict]) -> dict:
+    """Run one backtest quietly on precomputed analyst signals and return its parameters and performance metrics."""
+    backtester = Backtester(
+        agent=run_hedge_fund,
+        tickers=tickers,
+        start_date=start_date,
+        end_date=end_date,
+        initial_capital=initial_capital,
+        model_name=point.model_name,
+        model_provider=_model_provider(point.model_name),
+        selected_analysts=point.selected_analysts,
+        initial_margin_requirement=point.margin_requirement,
+        llm_skip_threshold=llm_skip_threshold,
+        position_limit_fraction=point.position_limit_fraction,
+        quiet=True,
+        analyst_signals=analyst_signals,
+    )
+    # The per-day tables and progress display of many concurrent backtests would interleave
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        performance_metrics = backtester.run_backtest()
+
+    final_value = backtester.portfolio_values[-1]["Portfolio Value"] if backtester.portfolio_values else initial_capital
+    return {
+        "name": point.name,
+        "margin_requirement": point.margin_requirement,
+        "analysts": ",".join(point.selected_analysts),
+        "position_limit_fraction": point.position_limit_fraction,
+        "model_name": point.model_name,
+        "final_value": final_value,
+        "total_return": (final_value / initial_capital - 1) * 100,
+        **performance_metrics,
+    }
+
+
+def run_sweep(
+    tickers: list[str],
+    start_date: str,
+    end_date: str,
+    grid: list[SweepPoint],
+    initial_capital: float = 100000.0,
+    llm_skip_threshold: float | None = None,
+    max_workers: int | None = None,
+    output_path: str | None = None,
+) -> pd.DataFrame:
+    """
+    Backtest every point of the grid in parallel. Analysts do not read the portfolio, so their signals are
+    computed once for each distinct analyst set and model, through one signal store so analysts shared by
+    several sets run once too. The backtests then only run risk and portfolio management, so points that
+    differ only in margin or position limits reuse every analyst call. Returns one row of metrics per point,
+    also written to output_path as CSV.
+    """
+    groups: dict[tuple, list[SweepPoint]] = {}
+    for point in grid:
+        groups.setdefault((tuple(sorted(point.selected_analysts)), point.model_name), []).append(point)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # Prices, financial metrics, insider trades and news are fetched once for the whole sweep. Line
+        # items are requested by the persona agents per day, so they are fetched while the signals are computed.
+        Backtester(agent=run_hedge_fund, tickers=tickers, start_date=start_date, end_date=end_date, initial_capital=initial_capital).prefetch_data()
+        cache_path = os.path.join(tmp_dir, "cache.json")
+        get_cache().save(cache_path)
+        signal_store_path = signal_store.path or os.path.join(tmp_dir, "signals.db")
+
+        # Phase 1: analyst signals for each group, one group at a time, each on its own process pool
+        signals_by_group = {}
+        for index, ((analysts, model_name), points) in enumerate(groups.items(), start=1):
+            print(f"[{index}/{len(groups)}] Computing analyst signals for analysts={_analysts_name(points[0].selected_analysts)} model={model_name}")
+            signals_by_group[(analysts, model_name)] = Backtester(
+                agent=run_hedge_fund,
+                tickers=tickers,
+                start_date=start_date,
+                end_date=end_date,
+                initial_capital=initial_capital,
+                model_name=model_name,
+                model_provider=_model_provider(model_name),
+                selected_analysts=list(analysts),
+                llm_skip_threshold=llm_skip_threshold,
+            ).precompute_signals(max_workers=max_workers, signal_store_path=signal_store_path)
+
+        # Phase 2: the risk and portfolio management backtests, all in parallel
+        rows = []
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=init_worker, initargs=(cache_path, signal_store_path, max_workers or os.cpu_count() or 1)) as executor:
+            futures = {
+                executor.submit(_run_point, point, tickers, start_date, end_date, initial_capital, llm_skip_threshold, signals_by_group[group]): point
+                for group, points in groups.items()
+                for point in points
+            }
+            for done, future in enumerate(as_completed(futures), start=1):
+                point = futures[future]
+                try:
+                    rows.append(future.result())
+                    print(f"[{done}/{len(grid)}] {Fore.GREEN}Done{Style.RESET_ALL} {point.name}")
+                except Exception as e:
+                    print(f"[{done}/{len(grid)}] {Fore.RED}Failed{Style.RESET_ALL} {point.name}: {e}")
+
+    results = pd.DataFrame(rows)
+    if not results.empty:
+        results = results.sort_values("sharpe_ratio", ascending=False, na_position="last").reset_index(drop=True)
+    if output_path:
+        results.to_csv(output_path, index=False)
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Backtest every combination of the given parameters")
+    parser.add_argument("--config", type=str, help="TOML file with default values for any of these flags")
+    parser.add_argument("--tickers", type=str, required=True, help="Comma-separated list of stock ticker symbols")
+    parser.add_argument("--end-date", type=str, default=datetime.now().strftime("%Y-%m-%d"), help="End date in YYYY-MM-DD format")
+    parser.add_argument("--start-date", type=str, default=(datetime.now() - relativedelta(months=1)).strftime("%Y-%m-%d"), help="Start date in YYYY-MM-DD format")
+    parser.add_argument("--initial-capital", type=float, default=100000, help="Initial capital amount (default: 100000)")
+    parser.add_argument("--margin-requirements", type=str, default="0.0", help="Comma-separated margin ratios, e.g. 0,0.5")
+    parser.add_argument("--analyst-sets", type=str, default="all", help="Semicolon-separated analyst sets, each 'all' or comma-separated keys, e.g. 'all;warren_buffett,technical_analyst'")
+    parser.add_argument("--position-limits", type=str, default="0.2", help="Comma-separated position limit fractions, e.g. 0.1,0.2")
+    parser.add_argument("--models", type=str, default="gpt-4o", help="Comma-separated model names")
+    parser.add_argument("--llm-skip-threshold", type=float, help="Skip the LLM for persona agents when the rule-based score is decisive, e.g. 0.9")
+    parser.add_argument("--signal-store", type=str, help="SQLite file for analyst outputs, kept after the sweep (default: $SIGNAL_STORE_PATH, else a temporary file)")
+    parser.add_argument("--workers", type=int, help="Backtests to run in parallel (default: number of CPUs)")
+    parser.add_argument("--output-csv", type=str, default="sweep_results.csv", help="Where to write the results table")
+
+    args = parse_args(parser)
+    if args.signal_store:
+        signal_store.configure(args.signal_store)
+
+    def parse_floats(value) -> list[float]:
+        return [float(item) for item in str(value).split(",")]
+
+    analyst_sets = [
+        list(ANALYST_CONFIG) if analyst_set.strip().lower() == "all" else [analyst.strip() for analyst in analyst_set.split(",")]
+        for analyst_set in args.analyst_sets.split(";")
+    ]
+    unknown = {analyst for analyst_set in analyst_sets for analyst in analyst_set if analyst not in ANALYST_CONFIG}
+    if unknown:
+        parser.error(f"Unknown analysts: {', '.join(sorted(unknown))}. Choose from: {', '.join(ANALYST_CONFIG)}")
+
+    model_names = [select_model(model.strip(), quiet=True, parser=parser)[0] for model in args.models.split(",")]
+
+    grid = build_grid(parse_floats(args.margin_requirements), analyst_sets, parse_floats(args.position_limits), model_names)
+    print(f"Running {len(grid)} backtests...")
+
+    results = run_sweep(
+        tickers=[ticker.strip() for ticker in args.tickers.split(",")],
+        start_date=args.start_date,
+        end_date=args.end_date,
+        grid=grid,
+        initial_capital=args.initial_capital,
+        llm_skip_threshold=args.llm_skip_threshold,
+        max_workers=args.workers,
+        output_path=args.output_csv,
+    )
+
+    columns = ["name", "total_return", "sharpe_ratio", "sortino_ratio", "max_drawdown"]
+    print(f"\n{Fore.WHITE}{Style.BRIGHT}SWEEP RESULTS:{Style.RESET_ALL}")
+    print(tabulate(results[columns] if not results.empty else [], headers="keys", tablefmt="grid", floatfmt=".2f", showindex=False))
+    print(f"\nResults written to {args.output_csv}")
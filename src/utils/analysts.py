@@ -11,51 +11,71 @@ from agents.valuation import valuation_agent
 from agents.warren_buffett import warren_buffett_agent
 
 # Define analyst configuration - single source of truth
+# "inputs" lists the data slices each analyst reads (see graph.memo.DATA_SLICES), used to skip unchanged reruns;
+# "uses_llm" marks analysts whose output depends on the model, so stored outputs of the others are shared across models
 ANALYST_CONFIG = {
     "ben_graham": {
         "display_name": "Ben Graham",
         "agent_func": ben_graham_agent,
         "order": 0,
+        "inputs": ["financial_metrics"],
+        "uses_llm": True,
     },
     "bill_ackman": {
         "display_name": "Bill Ackman",
         "agent_func": bill_ackman_agent,
         "order": 1,
+        "inputs": ["financial_metrics"],
+        "uses_llm": True,
     },
     "cathie_wood": {
         "display_name": "Cathie Wood",
         "agent_func": cathie_wood_agent,
         "order": 2,
+        "inputs": ["financial_metrics"],
+        "uses_llm": True,
     },
     "charlie_munger": {
         "display_name": "Charlie Munger",
         "agent_func": charlie_munger_agent,
         "order": 3,
+        "inputs": ["financial_metrics", "insider_trades", "company_news"],
+        "uses_llm": True,
     },
     "warren_buffett": {
         "display_name": "Warren Buffett",
         "agent_func": warren_buffett_agent,
         "order": 4,
+        "inputs": ["financial_metrics"],
+        "uses_llm": True,
     },
     "technical_analyst": {
         "display_name": "Technical Analyst",
         "agent_func": technical_analyst_agent,
         "order": 4,
+        "inputs": ["prices"],
+        "uses_llm": False,
     },
     "fundamentals_analyst": {
         "display_name": "Fundamentals Analyst",
         "agent_func": fundamentals_agent,
         "order": 5,
+        "inputs": ["financial_metrics"],
+        "uses_llm": False,
     },
     "sentiment_analyst": {
         "display_name": "Sentiment Analyst",
         "agent_func": sentiment_agent,
         "order": 6,
+        "inputs": ["insider_trades", "company_news"],
+        "uses_llm": False,
     },
     "valuation_analyst": {
         "display_name": "Valuation Analyst",
         "agent_func": valuation_agent,
         "order": 7,
+        "inputs": ["financial_metrics"],
+        "uses_llm": False,
     },
 }
 
@@ -66,3 +86,13 @@ ANALYST_ORDER = [(config["display_name"], key) for key, config in sorted(ANALYST
 def get_analyst_nodes():
     """Get the mapping of analyst keys to their (node_name, agent_func) tuples."""
     return {key: (f"{key}_agent", config["agent_func"]) for key, config in ANALYST_CONFIG.items()}
+
+
+def get_analyst_inputs(analyst_key: str) -> list[str]:
+    """Get the data slices an analyst reads."""
+    return ANALYST_CONFIG[analyst_key]["inputs"]
+
+
+def get_analyst_uses_llm(analyst_key: str) -> bool:
+    """Whether an analyst's output depends on the LLM it is run with."""
+    return ANALYST_CONFIG[analyst_key]["uses_llm"]
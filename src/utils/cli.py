@@ -0,0 +1,134 @@
+"""Shared command line handling for main.py and backtester.py."""
+
+import argparse
+import sys
+
+import questionary
+from colorama import Fore, Style
+
+from llm.models import LLM_ORDER, get_model_info
+from utils.analysts import ANALYST_CONFIG, ANALYST_ORDER
+
+try:
+    import tomllib
+except ImportError:  # Python < 3.11
+    try:
+        import tomli as tomllib
+    except ImportError:
+        tomllib = None
+
+
+def add_common_arguments(parser: argparse.ArgumentParser):
+    """Add the flags that let both entry points run without interactive prompts."""
+    parser.add_argument("--config", type=str, help="TOML file with default values for any of these flags, e.g. tickers = \"AAPL,MSFT\"")
+    parser.add_argument("--analysts", type=str, help="Comma-separated analyst keys, or 'all' (skips the analyst prompt)")
+    parser.add_argument("--model", type=str, help="Model name, e.g. gpt-4o (skips the model prompt)")
+    parser.add_argument("--signal-store", type=str, help="SQLite file where analyst outputs are stored and reused across runs (default: $SIGNAL_STORE_PATH)")
+    parser.add_argument("--output", choices=["table", "json"], default="table", help="Print results as tables or as a single JSON document on stdout")
+
+
+def parse_args(parser: argparse.ArgumentParser) -> argparse.Namespace:
+    """Parse arguments, using values from --config as defaults that explicit flags override."""
+    config_parser = argparse.ArgumentParser(add_help=False)
+    config_parser.add_argument("--config", type=str)
+    config_args, _ = config_parser.parse_known_args()
+
+    if config_args.config:
+        config = load_config(config_args.config)
+        known = {action.dest for action in parser._actions}
+        unknown = [key for key in config if key.replace("-", "_") not in known]
+        if unknown:
+            parser.error(f"Unknown keys in {config_args.config}: {', '.join(unknown)}")
+        defaults = {key.replace("-", "_"): ",".join(str(item) for item in value) if isinstance(value, list) else value for key, value in config.items()}
+        parser.set_defaults(**defaults)
+        # Flags marked required may now be satisfied by the config file
+        for action in parser._actions:
+            if action.dest in defaults:
+                action.required = False
+
+    return parser.parse_args()
+
+
+def load_config(path: str) -> dict:
+    """Load a TOML config file, e.g. tickers = ["AAPL", "MSFT"], analysts = "all", model = "gpt-4o"."""
+    if tomllib is None:
+        raise ImportError("Reading --config files requires Python 3.11+ or the tomli package")
+    with open(path, "rb") as f:
+        return tomllib.load(f)
+
+
+def select_analysts(analysts: str | None, quiet: bool = False, parser: argparse.ArgumentParser | None = None) -> list[str]:
+    """Resolve --analysts, or prompt for the analysts if it was not given. Unknown keys are reported through parser.error if given."""
+    if analysts:
+        choices = list(ANALYST_CONFIG.keys()) if analysts.strip().lower() == "all" else [analyst.strip() for analyst in analysts.split(",")]
+        invalid = [choice for choice in choices if choice not in ANALYST_CONFIG]
+        if invalid:
+            _usage_error(parser, f"Unknown analysts: {', '.join(invalid)}. Choose from: {', '.join(ANALYST_CONFIG)}")
+    else:
+        choices = questionary.checkbox(
+            "Select your AI analysts.",
+            choices=[questionary.Choice(display, value=value) for display, value in ANALYST_ORDER],
+            instruction="\n\nInstructions: \n1. Press Space to select/unselect analysts.\n2. Press 'a' to select/unselect all.\n3. Press Enter when done to run the hedge fund.\n",
+            validate=lambda x: len(x) > 0 or "You must select at least one analyst.",
+            style=questionary.Style(
+                [
+                    ("checkbox-selected", "fg:green"),
+                    ("selected", "fg:green noinherit"),
+                    ("highlighted", "noinherit"),
+                    ("pointer", "noinherit"),
+                ]
+            ),
+        ).ask()
+
+        if not choices:
+            print("\n\nInterrupt received. Exiting...")
+            sys.exit(0)
+
+    if not quiet:
+        print(f"\nSelected analysts: {', '.join(Fore.GREEN + choice.title().replace('_', ' ') + Style.RESET_ALL for choice in choices)}\n")
+    return choices
+
+
+def select_model(model: str | None, quiet: bool = False, parser: argparse.ArgumentParser | None = None) -> tuple[str, str]:
+    """
+    Resolve --model, or prompt for the model if it was not given. Returns (model_name, model_provider).
+    An unknown model is reported through parser.error if given.
+    """
+    if model:
+        model_choice = model
+    else:
+        model_choice = questionary.select(
+            "Select your LLM model:",
+            choices=[questionary.Choice(display, value=value) for display, value, _ in LLM_ORDER],
+            style=questionary.Style([
+                ("selected", "fg:green bold"),
+                ("pointer", "fg:green bold"),
+                ("highlighted", "fg:green"),
+                ("answer", "fg:green bold"),
+            ])
+        ).ask()
+
+        if not model_choice:
+            print("\n\nInterrupt received. Exiting...")
+            sys.exit(0)
+
+    # Get model info using the helper function
+    model_info = get_model_info(model_choice)
+    if model_info:
+        model_provider = model_info.provider.value
+        if not quiet:
+            print(f"\nSelected {Fore.CYAN}{model_provider}{Style.RESET_ALL} model: {Fore.GREEN + Style.BRIGHT}{model_choice}{Style.RESET_ALL}\n")
+    else:
+        if model:
+            _usage_error(parser, f"Unknown model: {model}. Choose from: {', '.join(value for _, value, _ in LLM_ORDER)}")
+        model_provider = "Unknown"
+        if not quiet:
+            print(f"\nSelected model: {Fore.GREEN + Style.BRIGHT}{model_choice}{Style.RESET_ALL}\n")
+    return model_choice, model_provider
+
+
+def _usage_error(parser: argparse.ArgumentParser | None, message: str):
+    """Exit with the parser's usage and message (status 2), or raise ValueError when called without a parser."""
+    if parser is not None:
+        parser.error(message)
+    raise ValueError(message)
@@ -1,6 +1,11 @@
 from colorama import Fore, Style
+from rich.panel import Panel
+from rich.table import Table
+from rich.text import Text
 from tabulate import tabulate
 from .analysts import ANALYST_ORDER
+from .progress import console, progress
+import csv
 import os
 
 
@@ -117,141 +122,139 @@ def print_trading_output(result: dict) -> None:
     )
 
 
-def print_backtest_results(table_rows: list) -> None:
-    """Print the backtest results in a nicely formatted table"""
-    # Clear the screen
-    os.system("cls" if os.name == "nt" else "clear")
-
-    # Split rows into ticker rows and summary rows
-    ticker_rows = []
-    summary_rows = []
-
-    for row in table_rows:
-        if isinstance(row[1], str) and "PORTFOLIO SUMMARY" in row[1]:
-            summary_rows.append(row)
-        else:
-            ticker_rows.append(row)
-
-    
-    # Display latest portfolio summary
-    if summary_rows:
-        latest_summary = summary_rows[-1]
-        print(f"\n{Fore.WHITE}{Style.BRIGHT}PORTFOLIO SUMMARY:{Style.RESET_ALL}")
-
-        # Extract values and remove commas before converting to float
-        cash_str = latest_summary[7].split("$")[1].split(Style.RESET_ALL)[0].replace(",", "")
-        position_str = latest_summary[6].split("$")[1].split(Style.RESET_ALL)[0].replace(",", "")
-        total_str = latest_summary[8].split("$")[1].split(Style.RESET_ALL)[0].replace(",", "")
-
-        print(f"Cash Balance: {Fore.CYAN}${float(cash_str):,.2f}{Style.RESET_ALL}")
-        print(f"Total Position Value: {Fore.YELLOW}${float(position_str):,.2f}{Style.RESET_ALL}")
-        print(f"Total Value: {Fore.WHITE}${float(total_str):,.2f}{Style.RESET_ALL}")
-        print(f"Return: {latest_summary[9]}")
-        
-        # Display performance metrics if available
-        if latest_summary[10]:  # Sharpe ratio
-            print(f"Sharpe Ratio: {latest_summary[10]}")
-        if latest_summary[11]:  # Sortino ratio
-            print(f"Sortino Ratio: {latest_summary[11]}")
-        if latest_summary[12]:  # Max drawdown
-            print(f"Max Drawdown: {latest_summary[12]}")
-
-    # Add vertical spacing
-    print("\n" * 2)
-
-    # Print the table with just ticker rows
+class BacktestRenderer:
+    """
+    Streams backtest results. Each day's rows are printed once, as they are produced, above a live
+    summary panel shown with the agent progress. Rows hold raw numbers and are only formatted here.
+
+    In quiet mode nothing is printed; with rows_path, rows are appended to a CSV file in either mode.
+    """
+
+    # (header, row key, width, justify)
+    COLUMNS = [
+        ("Date", "date", 10, "left"),
+        ("Ticker", "ticker", 6, "left"),
+        ("Action", "action", 6, "center"),
+        ("Quantity", "quantity", 10, "right"),
+        ("Price", "price", 10, "right"),
+        ("Shares", "shares_owned", 10, "right"),
+        ("Position Value", "position_value", 14, "right"),
+        ("Bullish", "bullish_count", 7, "right"),
+        ("Bearish", "bearish_count", 7, "right"),
+        ("Neutral", "neutral_count", 7, "right"),
+    ]
+    ACTION_STYLES = {"BUY": "green", "COVER": "green", "SELL": "red", "SHORT": "red", "HOLD": "yellow"}
+
+    def __init__(self, quiet: bool = False, rows_path: str | None = None):
+        self.quiet = quiet
+        self.rows_path = rows_path
+        self._rows_file = None
+        self._writer = None
+        self._show_header = True
+
+    def start(self):
+        if self.rows_path:
+            # Append, so a resumed backtest continues the same file
+            write_header = not os.path.exists(self.rows_path) or os.path.getsize(self.rows_path) == 0
+            self._rows_file = open(self.rows_path, "a", newline="")
+            self._writer = csv.DictWriter(self._rows_file, fieldnames=[key for _, key, _, _ in self.COLUMNS])
+            if write_header:
+                self._writer.writeheader()
+        if not self.quiet:
+            # Keeps the display up between days, while the agents start and stop their own runs
+            progress.start()
+
+    def add_day(self, rows: list[dict], summary: dict):
+        """Output one day's ticker rows and update the summary with that day's totals."""
+        if self._writer:
+            self._writer.writerows(rows)
+            self._rows_file.flush()
+        if self.quiet:
+            return
+        console.print(self._format_rows(rows))
+        progress.set_summary(self._format_summary(summary))
+        self._show_header = False
+
+    def stop(self):
+        if self._rows_file:
+            self._rows_file.close()
+            self._rows_file = self._writer = None
+        if not self.quiet:
+            # The last frame, including the summary, stays on screen
+            progress.stop()
+            progress.set_summary(None)
+
+    def _format_rows(self, rows: list[dict]) -> Table:
+        table = Table(show_header=self._show_header, box=None, padding=(0, 1), header_style="bold")
+        for header, _, width, justify in self.COLUMNS:
+            table.add_column(header, width=width, justify=justify, no_wrap=True)
+        for row in rows:
+            action = row["action"].upper()
+            action_style = self.ACTION_STYLES.get(action, "white")
+            table.add_row(
+                row["date"],
+                Text(row["ticker"], style="cyan"),
+                Text(action, style=action_style),
+                Text(f"{row['quantity']:,.0f}", style=action_style),
+                f"{row['price']:,.2f}",
+                f"{row['shares_owned']:,.0f}",
+                Text(f"{row['position_value']:,.2f}", style="yellow"),
+                Text(str(row["bullish_count"]), style="green"),
+                Text(str(row["bearish_count"]), style="red"),
+                Text(str(row["neutral_count"]), style="blue"),
+            )
+        return table
+
+    def _format_summary(self, summary: dict) -> Panel:
+        lines = [
+            f"Cash Balance: [cyan]${summary['cash_balance']:,.2f}[/cyan]",
+            f"Total Position Value: [yellow]${summary['total_position_value']:,.2f}[/yellow]",
+            f"Total Value: [bold]${summary['total_value']:,.2f}[/bold]",
+            f"Return: [{'green' if summary['return_pct'] >= 0 else 'red'}]{summary['return_pct']:+.2f}%[/]",
+        ]
+        if summary.get("sharpe_ratio") is not None:
+            lines.append(f"Sharpe Ratio: [yellow]{summary['sharpe_ratio']:.2f}[/yellow]")
+        if summary.get("sortino_ratio") is not None:
+            lines.append(f"Sortino Ratio: [yellow]{summary['sortino_ratio']:.2f}[/yellow]")
+        if summary.get("max_drawdown") is not None:
+            lines.append(f"Max Drawdown: [red]{summary['max_drawdown']:.2f}%[/red]")
+        return Panel("\n".join(lines), title=f"PORTFOLIO SUMMARY ({summary['date']})", title_align="left", expand=False)
+
+
+def print_llm_usage(usage: dict) -> None:
+    """Print a per-agent breakdown of LLM token usage and wall time."""
+    if not usage:
+        return
+
+    total_tokens = sum(stats["total_tokens"] for stats in usage.values()) or 1
+    total_latency = sum(stats["latency"] for stats in usage.values()) or 1
+
+    table_data = []
+    for agent, stats in sorted(usage.items(), key=lambda x: x[1]["latency"], reverse=True):
+        agent_name = agent.replace("_agent", "").replace("_", " ").title()
+        table_data.append(
+            [
+                f"{Fore.CYAN}{agent_name}{Style.RESET_ALL}",
+                stats["calls"],
+                f"{stats['prompt_tokens']:,}",
+                f"{stats['completion_tokens']:,}",
+                f"{Fore.YELLOW}{stats['total_tokens'] / total_tokens:.1%}{Style.RESET_ALL}",
+                f"{stats['latency']:,.1f}s",
+                f"{Fore.YELLOW}{stats['latency'] / total_latency:.1%}{Style.RESET_ALL}",
+                stats["retries"],
+                stats["cache_hits"],
+                f"{Fore.RED if stats['failures'] else ''}{stats['failures']}{Style.RESET_ALL}",
+                f"{1 - stats['payload_tokens_after'] / stats['payload_tokens_before']:.1%}" if stats["payload_tokens_before"] else "",
+                f"{stats['skipped']} ({stats['skipped'] / (stats['calls'] + stats['skipped']):.0%})" if stats["skipped"] else "",
+            ]
+        )
+
+    print(f"\n{Fore.WHITE}{Style.BRIGHT}LLM USAGE BY AGENT:{Style.RESET_ALL}")
     print(
         tabulate(
-            ticker_rows,
-            headers=[
-                "Date",
-                "Ticker",
-                "Action",
-                "Quantity",
-                "Price",
-                "Shares",
-                "Position Value",
-                "Bullish",
-                "Bearish",
-                "Neutral",
-            ],
+            table_data,
+            headers=[f"{Fore.WHITE}Agent", "Calls", "Prompt Tokens", "Completion Tokens", "Token Share", "Wall Time", "Time Share", "Retries", "Cache Hits", "Failures", "Payload Saved", "LLM Skipped"],
             tablefmt="grid",
-            colalign=(
-                "left",  # Date
-                "left",  # Ticker
-                "center",  # Action
-                "right",  # Quantity
-                "right",  # Price
-                "right",  # Shares
-                "right",  # Position Value
-                "right",  # Bullish
-                "right",  # Bearish
-                "right",  # Neutral
-            ),
+            colalign=("left", "right", "right", "right", "right", "right", "right", "right", "right", "right", "right", "right"),
         )
     )
-
-    # Add vertical spacing
-    print("\n" * 4)
-
-
-def format_backtest_row(
-    date: str,
-    ticker: str,
-    action: str,
-    quantity: float,
-    price: float,
-    shares_owned: float,
-    position_value: float,
-    bullish_count: int,
-    bearish_count: int,
-    neutral_count: int,
-    is_summary: bool = False,
-    total_value: float = None,
-    return_pct: float = None,
-    cash_balance: float = None,
-    total_position_value: float = None,
-    sharpe_ratio: float = None,
-    sortino_ratio: float = None,
-    max_drawdown: float = None,
-) -> list[any]:
-    """Format a row for the backtest results table"""
-    # Color the action
-    action_color = {
-        "BUY": Fore.GREEN,
-        "COVER": Fore.GREEN,
-        "SELL": Fore.RED,
-        "SHORT": Fore.RED,
-        "HOLD": Fore.YELLOW,
-    }.get(action.upper(), Fore.WHITE)
-
-    if is_summary:
-        return_color = Fore.GREEN if return_pct >= 0 else Fore.RED
-        return [
-            date,
-            f"{Fore.WHITE}{Style.BRIGHT}PORTFOLIO SUMMARY{Style.RESET_ALL}",
-            "",  # Action
-            "",  # Quantity
-            "",  # Price
-            "",  # Shares
-            f"{Fore.YELLOW}${total_position_value:,.2f}{Style.RESET_ALL}",  # Total Position Value
-            f"{Fore.CYAN}${cash_balance:,.2f}{Style.RESET_ALL}",  # Cash Balance
-            f"{Fore.WHITE}${total_value:,.2f}{Style.RESET_ALL}",  # Total Value
-            f"{return_color}{return_pct:+.2f}%{Style.RESET_ALL}",  # Return
-            f"{Fore.YELLOW}{sharpe_ratio:.2f}{Style.RESET_ALL}" if sharpe_ratio is not None else "",  # Sharpe Ratio
-            f"{Fore.YELLOW}{sortino_ratio:.2f}{Style.RESET_ALL}" if sortino_ratio is not None else "",  # Sortino Ratio
-            f"{Fore.RED}{max_drawdown:.2f}%{Style.RESET_ALL}" if max_drawdown is not None else "",  # Max Drawdown
-        ]
-    else:
-        return [
-            date,
-            f"{Fore.CYAN}{ticker}{Style.RESET_ALL}",
-            f"{action_color}{action.upper()}{Style.RESET_ALL}",
-            f"{action_color}{quantity:,.0f}{Style.RESET_ALL}",
-            f"{Fore.WHITE}{price:,.2f}{Style.RESET_ALL}",
-            f"{Fore.WHITE}{shares_owned:,.0f}{Style.RESET_ALL}",
-            f"{Fore.YELLOW}{position_value:,.2f}{Style.RESET_ALL}",
-            f"{Fore.GREEN}{bullish_count}{Style.RESET_ALL}",
-            f"{Fore.RED}{bearish_count}{Style.RESET_ALL}",
-            f"{Fore.BLUE}{neutral_count}{Style.RESET_ALL}",
-        ]
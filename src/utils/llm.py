@@ -1,8 +1,11 @@
 """Helper functions for LLM"""
 
+import functools
 import json
+import time
 from typing import TypeVar, Type, Optional, Any
 from pydantic import BaseModel
+from utils.metrics import LLMCallRecord, llm_metrics
 from utils.progress import progress
 
 T = TypeVar('T', bound=BaseModel)
@@ -14,10 +17,14 @@ def call_llm(
     pydantic_model: Type[T],
     agent_name: Optional[str] = None,
     max_retries: int = 3,
-    default_factory = None
+    default_factory = None,
+    stream: bool = True,
 ) -> T:
     """
     Makes an LLM call with retry logic, handling both Deepseek and non-Deepseek models.
+
+    Retries back off exponentially with jitter (honoring Retry-After), concurrency is
+    capped per provider, and calls fail fast to the default when the provider is down.
     
     Args:
         prompt: The prompt to send to the LLM
@@ -27,49 +34,178 @@ def call_llm(
         agent_name: Optional name of the agent for progress updates
         max_retries: Maximum number of retries (default: 3)
         default_factory: Optional factory function to create default response on failure
+        stream: For Deepseek models, stream tokens and return as soon as a valid JSON object closes
         
     Returns:
         An instance of the specified Pydantic model
     """
+    from llm.client import CircuitOpenError, ErrorKind, classify_error, get_provider_client
+    from llm.local import record_response
     from llm.models import get_model, get_model_info
     
     model_info = get_model_info(model_name)
     llm = get_model(model_name, model_provider)
+    client = get_provider_client(model_provider)
     
     # For non-Deepseek models, we can use structured output
     if not (model_info and model_info.is_deepseek()):
         llm = llm.with_structured_output(
             pydantic_model,
             method="json_mode",
+            include_raw=True,
         )
     
+    # Track usage across all attempts so the metrics reflect the real cost of the call
+    record = LLMCallRecord(agent_name=agent_name, model_name=model_name, model_provider=model_provider)
+    start_time = time.perf_counter()
+
+    def finish(response: T, success: bool = True) -> T:
+        record.latency = time.perf_counter() - start_time
+        record.success = success
+        llm_metrics.record(record)
+        if success:
+            # Save the response for the local-replay model when LLM_RECORD_PATH is set
+            record_response(prompt, pydantic_model, response)
+        return response
+
+    def fallback() -> T:
+        # Use default_factory if provided, otherwise create a basic default
+        default = default_factory() if default_factory else create_default_response(pydantic_model)
+        return finish(as_fallback(default), success=False)
+
     # Call the LLM with retries
     for attempt in range(max_retries):
+        record.retries = attempt
         try:
-            # Call the LLM
-            result = llm.invoke(prompt)
-            
             # For Deepseek, we need to extract and parse the JSON manually
             if model_info and model_info.is_deepseek():
-                parsed_result = extract_json_from_deepseek_response(result.content)
-                if parsed_result:
-                    return pydantic_model(**parsed_result)
+                if stream:
+                    # Parse the answer as it streams in; reading stops at the usage chunk
+                    parsed, result = client.call(stream_json_response, llm, prompt, pydantic_model)
+                    add_usage(record, result)
+                    if parsed is not None:
+                        return finish(parsed)
+                else:
+                    result = client.invoke(llm, prompt)
+                    add_usage(record, result)
+                    parsed_result = extract_json_from_deepseek_response(result.content)
+                    if parsed_result:
+                        return finish(pydantic_model(**parsed_result))
+                # Retried with backoff like any other failure instead of immediately
+                raise MissingJSONError(f"No JSON object in the {model_name} response")
             else:
-                return result
-                
+                # Call the LLM
+                result = client.invoke(llm, prompt)
+                add_usage(record, result["raw"])
+                if result["parsing_error"]:
+                    raise result["parsing_error"]
+                return finish(result["parsed"])
+
+        except CircuitOpenError as e:
+            if agent_name:
+                progress.update_status(agent_name, None, "Error - provider unavailable")
+            print(f"Error in LLM call: {e}")
+            return fallback()
+
         except Exception as e:
             if agent_name:
                 progress.update_status(agent_name, None, f"Error - retry {attempt + 1}/{max_retries}")
             
-            if attempt == max_retries - 1:
-                print(f"Error in LLM call after {max_retries} attempts: {e}")
-                # Use default_factory if provided, otherwise create a basic default
-                if default_factory:
-                    return default_factory()
-                return create_default_response(pydantic_model)
+            if attempt == max_retries - 1 or classify_error(e) == ErrorKind.FATAL:
+                print(f"Error in LLM call after {attempt + 1} attempts: {e}")
+                return fallback()
+
+            time.sleep(client.retry_policy.get_delay(attempt, e))
+
+    # Only reached with max_retries < 1
+    return fallback()
+
+def get_decisive_signal(
+    analysis: dict,
+    pydantic_model: Type[T],
+    agent_name: str,
+    model_name: str,
+    model_provider: str,
+    threshold: Optional[float],
+) -> Optional[T]:
+    """
+    Returns a templated signal instead of calling the LLM when the rule-based score is decisive:
+    score/max_score >= threshold for a bullish signal, or <= 1 - threshold for a bearish one.
+    A threshold of 0 always returns the rule-based signal, neutral ones included (rule-only mode).
+
+    Args:
+        analysis: The agent's analysis for one ticker, with signal, score and max_score
+        pydantic_model: The agent's signal model (signal, confidence, reasoning)
+        agent_name: Name of the agent, for skip-rate tracking
+        model_name: Model that would have been called
+        model_provider: Provider that would have been called
+        threshold: Fraction of max_score that counts as decisive; None disables skipping
+
+    Returns:
+        The templated signal, or None if the LLM should be called
+    """
+    if threshold is None:
+        return None
+
+    rule_only = threshold <= 0
+    score, max_score, signal = analysis.get("score"), analysis.get("max_score"), analysis.get("signal")
+    if score is None or not max_score:
+        if not rule_only:
+            return None
+        llm_metrics.record(LLMCallRecord(agent_name=agent_name, model_name=model_name, model_provider=model_provider, skipped=True))
+        return pydantic_model(signal="neutral", confidence=0.0, reasoning="No rule-based score available; defaulting to neutral.")
+
+    ratio = score / max_score
+    if signal == "bullish" and ratio >= threshold:
+        confidence = ratio * 100
+    elif signal == "bearish" and ratio <= 1 - threshold:
+        confidence = (1 - ratio) * 100
+    elif rule_only:
+        # Most confident at the midpoint of the score range
+        confidence = (1 - abs(2 * ratio - 1)) * 100
+    else:
+        return None
+
+    llm_metrics.record(LLMCallRecord(agent_name=agent_name, model_name=model_name, model_provider=model_provider, skipped=True))
+    return pydantic_model(
+        signal=signal,
+        confidence=round(min(max(confidence, 0.0), 100.0), 1),
+        reasoning=f"Rule-based score of {score:.1f}/{max_score} is {signal} (rule-only mode)." if rule_only else f"Rule-based score of {score:.1f}/{max_score} is decisively {signal}, so the LLM review was skipped.",
+    )
+
+def add_usage(record: LLMCallRecord, message: Any) -> None:
+    """Adds the token usage reported on a LangChain message to the call record."""
+    usage = getattr(message, "usage_metadata", None)
+    if not usage:
+        return
+    record.prompt_tokens += usage.get("input_tokens", 0)
+    record.completion_tokens += usage.get("output_tokens", 0)
+    cached_tokens = (usage.get("input_token_details") or {}).get("cache_read", 0) or 0
+    record.cached_tokens += cached_tokens
+    record.cache_hit = record.cache_hit or cached_tokens > 0
+
+class MissingJSONError(Exception):
+    """Raised when a Deepseek response contains no JSON object matching the output model."""
+
+
+class LLMFallback:
+    """Marks a default response that call_llm returned because the LLM call failed."""
+
+
+@functools.cache
+def _fallback_class(model_class: type) -> type:
+    return type(model_class.__name__, (model_class, LLMFallback), {"__module__": model_class.__module__})
+
+
+def as_fallback(response: T) -> T:
+    """The same response as an instance of a subclass of its model that is also an LLMFallback."""
+    return _fallback_class(type(response)).model_construct(_fields_set=response.model_fields_set, **dict(response))
+
+
+def fallback_flag(response: Any) -> dict:
+    """{"llm_fallback": True} for a fallback response, else {}; agents merge it into their per-ticker output."""
+    return {"llm_fallback": True} if isinstance(response, LLMFallback) else {}
 
-    # This should never be reached due to the retry logic above
-    return create_default_response(pydantic_model)
 
 def create_default_response(model_class: Type[T]) -> T:
     """Creates a safe default response based on the model's fields."""
@@ -105,3 +241,99 @@ def extract_json_from_deepseek_response(content: str) -> Optional[dict]:
     except Exception as e:
         print(f"Error extracting JSON from Deepseek response: {e}")
     return None
+
+
+def stream_json_response(llm: Any, prompt: Any, pydantic_model: Type[T]) -> tuple[Optional[T], Any]:
+    """
+    Streams a response, parsing the first JSON object that validates against the pydantic model as it
+    arrives, and returns it with the aggregated message chunks. Once the object has closed, the remaining
+    text is not parsed, but the stream is read up to the chunk carrying the token usage, so it is recorded.
+    """
+    extractor = StreamingJSONExtractor(pydantic_model)
+    response = None
+    parsed = None
+    chunks = llm.stream(prompt)
+    try:
+        for chunk in chunks:
+            response = chunk if response is None else response + chunk
+            if parsed is None:
+                parsed = extractor.feed(chunk.content if isinstance(chunk.content, str) else "")
+            if parsed is not None and getattr(chunk, "usage_metadata", None):
+                break
+        return parsed, response
+    finally:
+        # Closing the generator drops the underlying HTTP stream
+        chunks.close()
+
+
+class StreamingJSONExtractor:
+    """
+    Incrementally scans streamed text for the first complete top-level JSON object that validates
+    against a pydantic model; objects nested inside it are never validated on their own.
+    Anything inside a <think>...</think> block is ignored.
+    """
+
+    def __init__(self, pydantic_model: Type[T]):
+        self.pydantic_model = pydantic_model
+        self.buffer = ""
+        self.scan_from = None  # Where scanning may start, known once any <think> block has closed
+        self.position = 0
+        self.object_start = -1
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+
+    def feed(self, text: str) -> Optional[T]:
+        """Add streamed text and return the parsed object once a valid one has closed."""
+        self.buffer += text
+
+        if self.scan_from is None:
+            stripped = self.buffer.lstrip()
+            if "<think>".startswith(stripped):
+                return None  # Not enough text yet to know whether a reasoning block follows
+            if stripped.startswith("<think>"):
+                think_end = self.buffer.find("</think>")
+                if think_end == -1:
+                    return None
+                self.scan_from = think_end + len("</think>")
+            else:
+                self.scan_from = 0
+            self.position = self.scan_from
+
+        while self.position < len(self.buffer):
+            char = self.buffer[self.position]
+            self.position += 1
+
+            if self.object_start == -1:
+                if char == "{":
+                    self.object_start = self.position - 1
+                    self.depth = 1
+                continue
+
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == "\\":
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+            elif char == '"':
+                self.in_string = True
+            elif char == "{":
+                self.depth += 1
+            elif char == "}":
+                self.depth -= 1
+                if self.depth == 0:
+                    parsed = self._parse(self.buffer[self.object_start:self.position])
+                    if parsed is not None:
+                        return parsed
+                    # Not the answer (e.g. braces in prose); keep scanning after it
+                    self.object_start = -1
+
+        return None
+
+    def _parse(self, json_text: str) -> Optional[T]:
+        try:
+            return self.pydantic_model(**json.loads(json_text))
+        except Exception:
+            return None
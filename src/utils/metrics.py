@@ -0,0 +1,237 @@
+"""Token and latency accounting for LLM calls."""
+
+import atexit
+import itertools
+import os
+import threading
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from pydantic import BaseModel, Field
+
+
+class LLMCallRecord(BaseModel):
+    """A single call_llm invocation, including all of its retries."""
+
+    agent_name: Optional[str] = None
+    model_name: str
+    model_provider: str
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cached_tokens: int = 0
+    latency: float = 0.0  # Wall time in seconds across all attempts
+    retries: int = 0
+    cache_hit: bool = False
+    success: bool = True
+    skipped: bool = False  # The rule-based signal was decisive and no LLM call was made
+    timestamp: float = Field(default_factory=time.time)
+
+
+class LLMUsage:
+    """Running totals of call records per (agent, model, provider) and of payload compaction per agent."""
+
+    def __init__(self):
+        self.calls: dict[tuple[str, str, str], dict[str, float]] = {}
+        self.payloads: dict[str, dict[str, int]] = {}
+
+    def add_call(self, record: LLMCallRecord):
+        key = (record.agent_name or "unknown", record.model_name, record.model_provider)
+        _accumulate(self.calls.setdefault(key, _empty_stats()), record)
+
+    def add_compaction(self, agent_name: Optional[str], tokens_before: int, tokens_after: int):
+        payload = self.payloads.setdefault(agent_name or "unknown", {"payload_tokens_before": 0, "payload_tokens_after": 0})
+        payload["payload_tokens_before"] += tokens_before
+        payload["payload_tokens_after"] += tokens_after
+
+    def update(self, other: "LLMUsage"):
+        """Add another usage's totals, e.g. one collected in a worker process."""
+        for key, stats in other.calls.items():
+            totals = self.calls.setdefault(key, _empty_stats())
+            for field, value in stats.items():
+                totals[field] += value
+        for agent, payload in other.payloads.items():
+            self.add_compaction(agent, payload["payload_tokens_before"], payload["payload_tokens_after"])
+
+    def by_agent(self) -> dict[str, dict[str, float]]:
+        """Aggregate the totals per agent."""
+        summary = {}
+        for (agent, _, _), stats in self.calls.items():
+            totals = summary.setdefault(agent, _empty_stats())
+            for field, value in stats.items():
+                totals[field] += value
+        for agent, payload in self.payloads.items():
+            totals = summary.setdefault(agent, _empty_stats())
+            for field, value in payload.items():
+                totals[field] += value
+        return summary
+
+
+# The runs that calls made in the current context count towards. Context variables follow the caller
+# into graph nodes and asyncio tasks, so concurrent runs each see only their own calls.
+_active_runs: ContextVar[tuple[int, ...]] = ContextVar("llm_metrics_runs", default=())
+
+
+class LLMMetrics:
+    """Thread-safe sink for LLM call records, kept as running totals, with optional file exports.
+
+    start_run() opens a run that collects the calls made in the caller's context (including graph nodes
+    it invokes) until end_run(); summarize(run_id) reports it per agent.
+
+    Exports are configured through environment variables:
+      - LLM_METRICS_JSONL: append every call record to this JSONL file
+      - LLM_METRICS_PROM: write Prometheus textfile counters to this path on export()
+    """
+
+    # Pending JSONL lines are written together once this many have accumulated (and on flush())
+    JSONL_BATCH = 256
+
+    def __init__(self):
+        self.totals = LLMUsage()
+        self._runs: dict[int, LLMUsage] = {}
+        self._run_ids = itertools.count()
+        self._jsonl = None
+        self._jsonl_pending: list[str] = []
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+
+    def start_run(self) -> int:
+        """Start collecting the calls made in this context and return the run's id."""
+        with self._lock:
+            run_id = next(self._run_ids)
+            self._runs[run_id] = LLMUsage()
+        _active_runs.set(_active_runs.get() + (run_id,))
+        return run_id
+
+    def end_run(self, run_id: int) -> LLMUsage:
+        """Stop collecting for a run and return its totals."""
+        _active_runs.set(tuple(active for active in _active_runs.get() if active != run_id))
+        with self._lock:
+            return self._runs.pop(run_id, None) or LLMUsage()
+
+    def record(self, record: LLMCallRecord):
+        """Add a call record to the totals and open runs, and queue it for the JSONL export if configured."""
+        with self._lock:
+            self.totals.add_call(record)
+            for run_id in _active_runs.get():
+                if run_id in self._runs:
+                    self._runs[run_id].add_call(record)
+            self._queue_jsonl(record)
+
+    def record_compaction(self, agent_name: Optional[str], tokens_before: int, tokens_after: int):
+        """Add the before/after token counts of a compacted prompt payload."""
+        with self._lock:
+            self.totals.add_compaction(agent_name, tokens_before, tokens_after)
+            for run_id in _active_runs.get():
+                if run_id in self._runs:
+                    self._runs[run_id].add_compaction(agent_name, tokens_before, tokens_after)
+
+    def merge(self, usage: LLMUsage):
+        """Add usage collected in another process (already exported to JSONL there) to the totals and open runs."""
+        with self._lock:
+            self.totals.update(usage)
+            for run_id in _active_runs.get():
+                if run_id in self._runs:
+                    self._runs[run_id].update(usage)
+
+    def summarize(self, run_id: int | None = None) -> dict[str, dict[str, float]]:
+        """Aggregate a run's calls (or all calls so far) per agent."""
+        with self._lock:
+            usage = self.totals if run_id is None else self._runs.get(run_id, LLMUsage())
+            return usage.by_agent()
+
+    def _queue_jsonl(self, record: LLMCallRecord):
+        if os.getpid() != self._pid:
+            # A forked worker: the handle and pending lines belong to the parent
+            self._pid, self._jsonl, self._jsonl_pending = os.getpid(), None, []
+        if not os.getenv("LLM_METRICS_JSONL"):
+            return
+        self._jsonl_pending.append(record.model_dump_json() + "\n")
+        if len(self._jsonl_pending) >= self.JSONL_BATCH:
+            self._write_jsonl()
+
+    def _write_jsonl(self):
+        if not self._jsonl_pending or os.getpid() != self._pid:
+            return
+        if self._jsonl is None:
+            # Unbuffered, so each batch is one append of whole lines even with several processes writing
+            self._jsonl = open(os.environ["LLM_METRICS_JSONL"], "ab", buffering=0)
+        self._jsonl.write("".join(self._jsonl_pending).encode())
+        self._jsonl_pending.clear()
+
+    def flush(self):
+        """Write pending JSONL records."""
+        with self._lock:
+            self._write_jsonl()
+
+    def export(self, path: Optional[str] = None):
+        """Flush the JSONL export and write cumulative counters as a Prometheus textfile (node_exporter format)."""
+        self.flush()
+        path = path or os.getenv("LLM_METRICS_PROM")
+        if not path:
+            return
+
+        with self._lock:
+            counters = {key: dict(stats) for key, stats in self.totals.calls.items()}
+
+        metric_names = {
+            "calls": ("llm_calls_total", "Number of call_llm invocations"),
+            "prompt_tokens": ("llm_prompt_tokens_total", "Prompt tokens sent"),
+            "completion_tokens": ("llm_completion_tokens_total", "Completion tokens received"),
+            "cached_tokens": ("llm_cached_prompt_tokens_total", "Prompt tokens served from the provider cache"),
+            "latency": ("llm_latency_seconds_total", "Wall time spent in call_llm"),
+            "retries": ("llm_retries_total", "Retried attempts"),
+            "cache_hits": ("llm_cache_hits_total", "Calls with a provider cache hit"),
+            "failures": ("llm_failures_total", "Calls that fell back to a default response"),
+            "skipped": ("llm_skipped_total", "LLM calls skipped because the rule-based signal was decisive"),
+        }
+
+        lines = []
+        for field, (name, help_text) in metric_names.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            for (agent, model, provider), stats in sorted(counters.items()):
+                lines.append(f'{name}{{agent="{agent}",model="{model}",provider="{provider}"}} {stats[field]}')
+
+        # Write atomically so a scraper never reads a partial file
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, path)
+
+
+def _empty_stats() -> dict[str, float]:
+    return {
+        "calls": 0,
+        "prompt_tokens": 0,
+        "completion_tokens": 0,
+        "total_tokens": 0,
+        "cached_tokens": 0,
+        "latency": 0.0,
+        "retries": 0,
+        "cache_hits": 0,
+        "failures": 0,
+        "skipped": 0,
+        "payload_tokens_before": 0,
+        "payload_tokens_after": 0,
+    }
+
+
+def _accumulate(stats: dict[str, float], record: LLMCallRecord):
+    if record.skipped:
+        stats["skipped"] += 1
+        return
+    stats["calls"] += 1
+    stats["prompt_tokens"] += record.prompt_tokens
+    stats["completion_tokens"] += record.completion_tokens
+    stats["total_tokens"] += record.prompt_tokens + record.completion_tokens
+    stats["cached_tokens"] += record.cached_tokens
+    stats["latency"] += record.latency
+    stats["retries"] += record.retries
+    stats["cache_hits"] += int(record.cache_hit)
+    stats["failures"] += int(not record.success)
+
+
+# Create a global instance
+llm_metrics = LLMMetrics()
+atexit.register(llm_metrics.flush)
@@ -1,10 +1,11 @@
-from rich.console import Console
+from rich.console import Console, Group, RenderableType
 from rich.live import Live
 from rich.table import Table
 from rich.style import Style
 from rich.text import Text
 from typing import Dict, Optional
 from datetime import datetime
+import threading
 
 console = Console()
 
@@ -15,32 +16,49 @@ class AgentProgress:
     def __init__(self):
         self.agent_status: Dict[str, Dict[str, str]] = {}
         self.table = Table(show_header=False, box=None, padding=(0, 1))
-        self.live = Live(self.table, console=console, refresh_per_second=4)
+        self.summary: RenderableType | None = None  # Shown below the agents, e.g. the backtest's running totals
+        self.live = Live(console=console, refresh_per_second=4, get_renderable=self._render)
         self.started = False
+        self.active_runs = 0  # Concurrent runs (e.g. arun_hedge_fund) share one display
+        # Agent nodes run concurrently in worker threads and all update the same table
+        self._lock = threading.RLock()
 
     def start(self):
         """Start the progress display."""
-        if not self.started:
-            self.live.start()
-            self.started = True
+        with self._lock:
+            self.active_runs += 1
+            if not self.started:
+                self.live.start()
+                self.started = True
 
     def stop(self):
-        """Stop the progress display."""
-        if self.started:
-            self.live.stop()
-            self.started = False
+        """Stop the progress display once the last active run has finished."""
+        with self._lock:
+            self.active_runs = max(0, self.active_runs - 1)
+            if self.started and self.active_runs == 0:
+                self.live.stop()
+                self.started = False
+
+    def set_summary(self, summary: RenderableType | None):
+        """Show a renderable below the agent statuses, or remove it with None."""
+        with self._lock:
+            self.summary = summary
+
+    def _render(self) -> RenderableType:
+        return Group(self.table, self.summary) if self.summary is not None else self.table
 
     def update_status(self, agent_name: str, ticker: Optional[str] = None, status: str = ""):
         """Update the status of an agent."""
-        if agent_name not in self.agent_status:
-            self.agent_status[agent_name] = {"status": "", "ticker": None}
+        with self._lock:
+            if agent_name not in self.agent_status:
+                self.agent_status[agent_name] = {"status": "", "ticker": None}
 
-        if ticker:
-            self.agent_status[agent_name]["ticker"] = ticker
-        if status:
-            self.agent_status[agent_name]["status"] = status
+            if ticker:
+                self.agent_status[agent_name]["ticker"] = ticker
+            if status:
+                self.agent_status[agent_name]["status"] = status
 
-        self._refresh_display()
+            self._refresh_display()
 
     def _refresh_display(self):
         """Refresh the progress display."""
@@ -0,0 +1,150 @@
+"""Helpers for keeping the data embedded in LLM prompts small."""
+
+import inspect
+import json
+import os
+from functools import lru_cache
+from typing import Any, Optional, Sequence
+
+from langchain_core.messages import HumanMessage, SystemMessage
+from langchain_core.prompt_values import ChatPromptValue
+
+from utils.metrics import llm_metrics
+
+try:
+    import tiktoken
+except ImportError:  # Optional: fall back to a character-based estimate
+    tiktoken = None
+
+
+@lru_cache(maxsize=1)
+def _get_encoding():
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        # The encoding is downloaded on first use and may be unavailable offline
+        return None
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the number of tokens in a piece of text."""
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    return (len(text) + 3) // 4
+
+
+def round_numbers(data: Any, significant_digits: int = 4) -> Any:
+    """Recursively round floats to a number of significant digits."""
+    if isinstance(data, float):
+        return float(f"{data:.{significant_digits}g}")
+    if isinstance(data, dict):
+        return {key: round_numbers(value, significant_digits) for key, value in data.items()}
+    if isinstance(data, (list, tuple)):
+        return [round_numbers(value, significant_digits) for value in data]
+    return data
+
+
+def prune_keys(data: Any, drop_keys: Sequence[str]) -> Any:
+    """Recursively remove the given keys from nested dicts."""
+    if isinstance(data, dict):
+        return {key: prune_keys(value, drop_keys) for key, value in data.items() if key not in drop_keys}
+    if isinstance(data, list):
+        return [prune_keys(value, drop_keys) for value in data]
+    return data
+
+
+def compact_json(data: Any) -> str:
+    """Serialize without indentation or padding whitespace."""
+    return json.dumps(data, separators=(",", ":"), default=str)
+
+
+def compact_payload(
+    data: Any,
+    agent_name: Optional[str] = None,
+    model_name: Optional[str] = None,
+    priority: Sequence[str] = (),
+    drop_keys: Sequence[str] = (),
+    significant_digits: int = 4,
+) -> str:
+    """
+    Encode analysis data for a prompt: no indentation, rounded numerics and pruned keys.
+
+    If the model's payload token budget is exceeded, top-level keys are dropped starting
+    with keys not listed in `priority`, then from the end of `priority`. The first key in
+    `priority` is never dropped. Before/after token counts are recorded in llm_metrics.
+
+    Args:
+        data: The payload to encode
+        agent_name: Agent the payload belongs to, for reporting
+        model_name: Model whose payload_token_budget applies (no budget if unknown or None)
+        priority: Top-level keys from most to least important
+        drop_keys: Keys the agent's prompt does not use, removed at any depth
+        significant_digits: Precision kept for floats
+    """
+    from llm.models import get_model_info
+
+    tokens_before = estimate_tokens(json.dumps(data, indent=2, default=str))
+
+    payload = round_numbers(prune_keys(data, drop_keys), significant_digits)
+    text = compact_json(payload)
+    tokens_after = estimate_tokens(text)
+
+    model_info = get_model_info(model_name) if model_name else None
+    budget = model_info.payload_token_budget if model_info else None
+    if budget is not None and isinstance(payload, dict) and tokens_after > budget:
+        ranked = [key for key in priority if key in payload]
+        drop_order = [key for key in payload if key not in ranked] + ranked[:0:-1]
+        for key in drop_order:
+            del payload[key]
+            text = compact_json(payload)
+            tokens_after = estimate_tokens(text)
+            if tokens_after <= budget:
+                break
+
+    llm_metrics.record_compaction(agent_name, tokens_before, tokens_after)
+    return text
+
+
+# Anthropic ignores cache breakpoints on shorter prefixes (2048 tokens for Haiku models)
+MIN_CACHEABLE_TOKENS = 1024
+
+
+class CompiledPrompt:
+    """
+    A system + human chat prompt prepared once at import.
+
+    The system prompt is static, so its message is built once (with indentation stripped)
+    and reused as a stable prefix. Only the human message is formatted per call, with
+    str.format semantics ({{ and }} are literal braces).
+
+    With LLM_PROMPT_CACHING=true, Anthropic models get the system prompt marked as a cache
+    breakpoint, as long as it reaches the minimum cacheable length.
+    """
+
+    def __init__(self, system: str, human: str):
+        system_text = inspect.cleandoc(system)
+        self.system_message = SystemMessage(content=system_text)
+        # Anthropic only caches prompt prefixes that are explicitly marked
+        self.cacheable_system_message = None
+        if estimate_tokens(system_text) >= MIN_CACHEABLE_TOKENS:
+            self.cacheable_system_message = SystemMessage(content=[{"type": "text", "text": system_text, "cache_control": {"type": "ephemeral"}}])
+        self.human_template = inspect.cleandoc(human)
+
+    def invoke(self, variables: dict[str, Any], model_provider: Optional[str] = None) -> ChatPromptValue:
+        """Format the human message and return the prompt for the given provider."""
+        system_message = self.system_message
+        if self.cacheable_system_message is not None and prompt_caching_enabled(model_provider):
+            system_message = self.cacheable_system_message
+        return ChatPromptValue(messages=[system_message, HumanMessage(content=self.human_template.format(**variables))])
+
+
+def prompt_caching_enabled(model_provider: Optional[str]) -> bool:
+    """Whether static system prompts should be marked cacheable (LLM_PROMPT_CACHING=true)."""
+    from llm.models import ModelProvider
+
+    if os.getenv("LLM_PROMPT_CACHING", "").lower() not in ("1", "true", "yes"):
+        return False
+    return model_provider == ModelProvider.ANTHROPIC
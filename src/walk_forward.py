@@ -0,0 +1,215 @@
+"""Walk-forward backtests: rolling train/test windows run in parallel and stitched into one equity curve."""
+
+import contextlib
+import json
+import os
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+import pandas as pd
+from colorama import Fore, Style, init
+from dateutil.relativedelta import relativedelta
+from pydantic import BaseModel
+from tabulate import tabulate
+
+from backtester import Backtester
+from backtesting.metrics import compute_performance_metrics
+from backtesting.signals import init_worker
+from data.cache import get_cache
+from data.signal_store import signal_store
+from main import run_hedge_fund
+from utils.cli import add_common_arguments, parse_args, select_analysts, select_model
+
+init(autoreset=True)
+
+
+class WalkForwardWindow(BaseModel):
+    """One step of a walk-forward: agents see the train period as history and trade over the test period."""
+
+    index: int
+    train_start: str
+    test_start: str
+    test_end: str
+
+    @property
+    def lookback_days(self) -> int:
+        return (datetime.strptime(self.test_start, "%Y-%m-%d") - datetime.strptime(self.train_start, "%Y-%m-%d")).days
+
+
+def make_windows(start_date: str, end_date: str, train_months: int, test_months: int) -> list[WalkForwardWindow]:
+    """Consecutive test periods of test_months, each preceded by a rolling train period of train_months, starting at start_date."""
+    end = datetime.strptime(end_date, "%Y-%m-%d")
+    test_start = datetime.strptime(start_date, "%Y-%m-%d") + relativedelta(months=train_months)
+
+    windows = []
+    while test_start <= end:
+        test_end = min(test_start + relativedelta(months=test_months) - timedelta(days=1), end)
+        windows.append(
+            WalkForwardWindow(
+                index=len(windows),
+                train_start=(test_start - relativedelta(months=train_months)).strftime("%Y-%m-%d"),
+                test_start=test_start.strftime("%Y-%m-%d"),
+                test_end=test_end.strftime("%Y-%m-%d"),
+            )
+        )
+        test_start += relativedelta(months=test_months)
+    return windows
+
+
+def _run_window(window: WalkForwardWindow, backtester_kwargs: dict) -> dict:
+    """Backtest one test period from fresh capital, quietly."""
+    backtester = Backtester(
+        agent=run_hedge_fund,
+        start_date=window.test_start,
+        end_date=window.test_end,
+        lookback_days=window.lookback_days,
+        quiet=True,
+        **backtester_kwargs,
+    )
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        performance_metrics = backtester.run_backtest()
+    return {"performance_metrics": performance_metrics, "portfolio_values": backtester.portfolio_values}
+
+
+def stitch_equity_curve(window_values: list[list[dict]], initial_capital: float) -> pd.DataFrame:
+    """
+    Chain the windows' equity curves: each window started from initial_capital, so its values are scaled
+    to start from the equity the previous window ended with.
+    """
+    rows = []
+    equity = initial_capital
+    for index, values in enumerate(window_values):
+        if not values:
+            continue
+        scale = equity / initial_capital
+        # After the first window, the starting point is the previous window's last value
+        for row in values if not rows else values[1:]:
+            rows.append({"Date": row["Date"], "Portfolio Value": row["Portfolio Value"] * scale, "Window": index})
+        equity = values[-1]["Portfolio Value"] * scale
+    return pd.DataFrame(rows, columns=["Date", "Portfolio Value", "Window"])
+
+
+def run_walk_forward(
+    tickers: list[str],
+    start_date: str,
+    end_date: str,
+    train_months: int,
+    test_months: int,
+    initial_capital: float = 100000.0,
+    model_name: str = "gpt-4o",
+    model_provider: str = "OpenAI",
+    selected_analysts: list[str] = [],
+    initial_margin_requirement: float = 0.0,
+    llm_skip_threshold: float | None = None,
+    max_workers: int | None = None,
+) -> dict:
+    """
+    Run every window on a process pool and stitch the results. Prices, financial metrics, insider trades
+    and news for the whole history are fetched once and handed to the workers (line items are still
+    requested per day), and analyst outputs go through one signal store, so a rerun reuses every analyst call.
+
+    Returns {"windows": [...], "equity_curve": DataFrame, "performance_metrics": {...}}.
+    """
+    windows = make_windows(start_date, end_date, train_months, test_months)
+    if not windows:
+        raise ValueError(f"No test window fits between {start_date} and {end_date} after a {train_months}-month train period")
+
+    backtester_kwargs = {
+        "tickers": tickers,
+        "initial_capital": initial_capital,
+        "model_name": model_name,
+        "model_provider": model_provider,
+        "selected_analysts": selected_analysts,
+        "initial_margin_requirement": initial_margin_requirement,
+        "llm_skip_threshold": llm_skip_threshold,
+    }
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # One prefetch covering the first train period through the last test day
+        Backtester(agent=run_hedge_fund, start_date=windows[0].test_start, end_date=end_date, lookback_days=windows[0].lookback_days, **backtester_kwargs).prefetch_data()
+        cache_path = os.path.join(tmp_dir, "cache.json")
+        get_cache().save(cache_path)
+        signal_store_path = signal_store.path or os.path.join(tmp_dir, "signals.db")
+
+        # Windows start from fresh capital, so they are independent and can all run at once
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=init_worker, initargs=(cache_path, signal_store_path, max_workers or os.cpu_count() or 1)) as executor:
+            results = list(executor.map(_run_window, windows, [backtester_kwargs] * len(windows)))
+
+    window_rows = []
+    for window, result in zip(windows, results):
+        values = result["portfolio_values"]
+        final_value = values[-1]["Portfolio Value"] if values else initial_capital
+        window_rows.append({
+            **window.model_dump(),
+            "total_return": (final_value / initial_capital - 1) * 100,
+            **result["performance_metrics"],
+        })
+
+    equity_curve = stitch_equity_curve([result["portfolio_values"] for result in results], initial_capital)
+    performance_metrics = {"sharpe_ratio": None, "sortino_ratio": None, "max_drawdown": None}
+    if not equity_curve.empty:
+        performance_metrics["total_return"] = (equity_curve["Portfolio Value"].iloc[-1] / initial_capital - 1) * 100
+        performance_metrics.update(compute_performance_metrics(equity_curve.set_index("Date")["Portfolio Value"]) or {})
+
+    return {"windows": window_rows, "equity_curve": equity_curve, "performance_metrics": performance_metrics}
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run a walk-forward backtest over rolling train/test windows")
+    parser.add_argument("--tickers", type=str, required=True, help="Comma-separated list of stock ticker symbols")
+    parser.add_argument("--end-date", type=str, default=datetime.now().strftime("%Y-%m-%d"), help="End date in YYYY-MM-DD format")
+    parser.add_argument("--start-date", type=str, default=(datetime.now() - relativedelta(years=1)).strftime("%Y-%m-%d"), help="Start of the history in YYYY-MM-DD format; the first train period begins here")
+    parser.add_argument("--train-months", type=int, default=3, help="Months of history the agents see before each test period (default: 3)")
+    parser.add_argument("--test-months", type=int, default=1, help="Months traded per window; windows roll forward by this much (default: 1)")
+    parser.add_argument("--initial-capital", type=float, default=100000, help="Initial capital amount (default: 100000)")
+    parser.add_argument("--margin-requirement", type=float, default=0.0, help="Margin ratio for short positions, e.g. 0.5 for 50% (default: 0.0)")
+    parser.add_argument("--llm-skip-threshold", type=float, help="Skip the LLM for persona agents when the rule-based score is decisive, e.g. 0.9")
+    parser.add_argument("--workers", type=int, help="Windows to run in parallel (default: number of CPUs)")
+    parser.add_argument("--output-csv", type=str, help="Write the stitched equity curve to this CSV file")
+
+    add_common_arguments(parser)
+
+    args = parse_args(parser)
+    json_output = args.output == "json"
+
+    if args.signal_store:
+        signal_store.configure(args.signal_store)
+
+    selected_analysts = select_analysts(args.analysts, quiet=json_output, parser=parser)
+    model_choice, model_provider = select_model(args.model, quiet=json_output, parser=parser)
+
+    # In JSON mode the progress lines go to stderr, so stdout is a single JSON document
+    with contextlib.redirect_stdout(sys.stderr if json_output else sys.stdout):
+        print(f"Running walk-forward from {args.start_date} to {args.end_date} ({args.train_months}-month train, {args.test_months}-month test)...")
+        result = run_walk_forward(
+            tickers=[ticker.strip() for ticker in args.tickers.split(",")],
+            start_date=args.start_date,
+            end_date=args.end_date,
+            train_months=args.train_months,
+            test_months=args.test_months,
+            initial_capital=args.initial_capital,
+            model_name=model_choice,
+            model_provider=model_provider,
+            selected_analysts=selected_analysts,
+            initial_margin_requirement=args.margin_requirement,
+            llm_skip_threshold=args.llm_skip_threshold,
+            max_workers=args.workers,
+        )
+
+    if args.output_csv:
+        result["equity_curve"].to_csv(args.output_csv, index=False)
+
+    if json_output:
+        print(json.dumps({**result, "equity_curve": result["equity_curve"].to_dict(orient="records")}, default=str))
+    else:
+        columns = ["index", "test_start", "test_end", "total_return", "sharpe_ratio", "sortino_ratio", "max_drawdown"]
+        print(f"\n{Fore.WHITE}{Style.BRIGHT}WALK-FORWARD WINDOWS:{Style.RESET_ALL}")
+        print(tabulate([[row.get(column) for column in columns] for row in result["windows"]], headers=columns, tablefmt="grid", floatfmt=".2f"))
+
+        print(f"\n{Fore.WHITE}{Style.BRIGHT}STITCHED PERFORMANCE:{Style.RESET_ALL}")
+        for name, value in result["performance_metrics"].items():
+            print(f"{name.replace('_', ' ').title()}: {Fore.YELLOW}{value:.2f}{Style.RESET_ALL}" if value is not None else f"{name.replace('_', ' ').title()}: n/a")
@@ -0,0 +1,50 @@
+import math
+import os
+import sys
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+# The modules under src/ import each other as top-level packages (e.g. `from graph.state import ...`)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+
+class FakeResponse:
+    status_code = 200
+    text = ""
+
+    def __init__(self, payload: dict):
+        self.payload = payload
+
+    def json(self) -> dict:
+        return self.payload
+
+
+def fake_get(url: str, headers: dict | None = None) -> FakeResponse:
+    """Deterministic daily prices for any ticker and range; no metrics, insider trades or news."""
+    import pandas as pd
+
+    query = {key: values[0] for key, values in parse_qs(urlparse(url).query).items()}
+    if "/prices/" not in url:
+        return FakeResponse({"financial_metrics": [], "insider_trades": [], "news": []})
+    offset = sum(map(ord, query["ticker"])) % 5
+    prices = []
+    for i, day in enumerate(pd.date_range(query["start_date"], query["end_date"], freq="B")):
+        close = 100 + 10 * offset + 8 * math.sin(i / (5 + offset))
+        prices.append({"open": close, "close": close, "high": close + 1, "low": close - 1, "volume": 1000, "time": day.strftime("%Y-%m-%d")})
+    return FakeResponse({"ticker": query["ticker"], "prices": prices})
+
+
+@pytest.fixture
+def offline(monkeypatch):
+    """Serve the financial data API from fake_get, with compiled graphs and memoized outputs of the test's own."""
+    import main
+    import tools.api
+    from data.cache import Cache
+    from graph.memo import analyst_memo
+
+    monkeypatch.setattr(tools.api.requests, "get", fake_get)
+    monkeypatch.setattr(tools.api, "_cache", Cache())
+    monkeypatch.setattr(main, "_graph_cache", {})
+    monkeypatch.setattr(main, "_checkpointers", {})
+    analyst_memo.clear()
@@ -0,0 +1,64 @@
+"""Semantics of the analyst_signals reducer and of progress updates from concurrent agent nodes."""
+
+import copy
+import threading
+from typing import get_type_hints
+
+from graph.state import AgentState, merge_analyst_signals
+from utils.progress import AgentProgress
+
+
+def test_reducer_is_registered_for_analyst_signals():
+    assert get_type_hints(AgentState, include_extras=True)["analyst_signals"].__metadata__[0] is merge_analyst_signals
+
+
+def test_new_agents_are_added():
+    merged = merge_analyst_signals({"a": {"AAPL": 1}}, {"b": {"AAPL": 2}})
+    assert merged == {"a": {"AAPL": 1}, "b": {"AAPL": 2}}
+
+
+def test_updates_for_the_same_agent_merge_per_ticker():
+    # E.g. two parallel branches each reporting one ticker for the same agent
+    merged = merge_analyst_signals({"a": {"AAPL": 1, "MSFT": 2}}, {"a": {"MSFT": 3, "NVDA": 4}})
+    assert merged == {"a": {"AAPL": 1, "MSFT": 3, "NVDA": 4}}
+
+
+def test_inputs_are_not_mutated():
+    current = {"a": {"AAPL": {"signal": "bullish"}}, "b": {"AAPL": {"signal": "bearish"}}}
+    update = {"a": {"MSFT": {"signal": "neutral"}}}
+    current_before, update_before = copy.deepcopy(current), copy.deepcopy(update)
+
+    merged = merge_analyst_signals(current, update)
+
+    assert current == current_before and update == update_before
+    assert merged is not current and merged["a"] is not current["a"]
+    # Agents without an update are shared, not copied
+    assert merged["b"] is current["b"]
+
+
+def test_merge_order_of_concurrent_updates_does_not_lose_tickers():
+    base = {"a": {"AAPL": 1}}
+    first, second = {"a": {"MSFT": 2}}, {"a": {"NVDA": 3}}
+    assert merge_analyst_signals(merge_analyst_signals(base, first), second) == merge_analyst_signals(merge_analyst_signals(base, second), first)
+
+
+def test_progress_updates_from_many_threads():
+    progress = AgentProgress()
+    errors = []
+
+    def update(agent_index: int):
+        try:
+            for i in range(200):
+                progress.update_status(f"agent_{agent_index}", f"T{i}", "Analyzing")
+        except Exception as e:  # e.g. a dict changing size while the table is rebuilt
+            errors.append(e)
+
+    threads = [threading.Thread(target=update, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    assert set(progress.agent_status) == {f"agent_{i}" for i in range(8)}
+    assert all(status == {"status": "Analyzing", "ticker": "T199"} for status in progress.agent_status.values())
@@ -0,0 +1,43 @@
+"""The async hedge fund run takes the same options as the sync one and reaches the same decisions."""
+
+import asyncio
+
+import pytest
+
+from main import arun_hedge_fund, create_portfolio, run_analysts, run_hedge_fund
+
+TICKERS = ["AAA", "BBB"]
+
+pytestmark = pytest.mark.usefixtures("offline")
+
+
+def options(**overrides) -> dict:
+    return {
+        "tickers": TICKERS,
+        "start_date": "2024-01-01",
+        "end_date": "2024-03-29",
+        "portfolio": create_portfolio(TICKERS),
+        "selected_analysts": ["technical_analyst"],
+        "model_name": "rule-only",
+        "model_provider": "None",
+        "rule_only": True,
+        **overrides,
+    }
+
+
+@pytest.mark.parametrize("position_limit_fraction", [0.2, 0.05])
+def test_async_run_matches_the_sync_run(position_limit_fraction):
+    sync = run_hedge_fund(**options(position_limit_fraction=position_limit_fraction))
+    concurrent = asyncio.run(arun_hedge_fund(**options(position_limit_fraction=position_limit_fraction)))
+    assert concurrent["decisions"] == sync["decisions"]
+    # The technicals hold NaN indicators, which never compare equal, so compare the risk limits derived from them
+    assert concurrent["analyst_signals"]["risk_management_agent"] == sync["analyst_signals"]["risk_management_agent"]
+    assert any(decision["quantity"] for decision in sync["decisions"].values())
+
+
+def test_async_run_skips_the_analysts_given_their_signals():
+    signals = run_analysts(TICKERS, "2024-01-01", "2024-03-29", selected_analysts=["technical_analyst"], model_name="rule-only", model_provider="None", rule_only=True)
+    sync = run_hedge_fund(**options(analyst_signals=signals))
+    concurrent = asyncio.run(arun_hedge_fund(**options(analyst_signals=signals)))
+    assert concurrent["decisions"] == sync["decisions"]
+    assert set(concurrent["analyst_signals"]) == {"technical_analyst_agent", "risk_management_agent"}
@@ -0,0 +1,70 @@
+"""Resuming an interrupted, checkpointed backtest through the LangGraph SQLite saver."""
+
+import sqlite3
+
+import pytest
+
+pytest.importorskip("langgraph.checkpoint.sqlite")
+
+import main
+from backtester import Backtester
+
+TICKERS = ["AAA", "BBB"]
+
+pytestmark = pytest.mark.usefixtures("offline")
+
+
+def run(checkpoint_dir: str | None) -> Backtester:
+    backtester = Backtester(
+        agent=main.run_hedge_fund,
+        tickers=TICKERS,
+        start_date="2024-03-01",
+        end_date="2024-03-29",
+        initial_capital=100000.0,
+        selected_analysts=["technical_analyst"],
+        checkpoint_dir=checkpoint_dir,
+        lookback_days=120,
+        quiet=True,
+        rows_path=None,
+        rule_only=True,
+    )
+    backtester.run_backtest()
+    return backtester
+
+
+def values(backtester: Backtester) -> list[tuple[str, float]]:
+    return [(row["Date"].strftime("%Y-%m-%d"), round(row["Portfolio Value"], 6)) for row in backtester.portfolio_values]
+
+
+def test_interrupted_day_resumes_through_the_sqlite_saver(tmp_path, monkeypatch):
+    fresh = values(run(None))
+
+    # Interrupt the portfolio manager once, mid-way through the period, after the analysts have run that day
+    calls = {"count": 0}
+    portfolio_management_agent = main.portfolio_management_agent
+
+    def interrupted(state):
+        calls["count"] += 1
+        if calls["count"] == 10:
+            raise KeyboardInterrupt
+        return portfolio_management_agent(state)
+
+    monkeypatch.setattr(main, "portfolio_management_agent", interrupted)
+    with pytest.raises(KeyboardInterrupt):
+        run(str(tmp_path))
+
+    checkpoints = list(tmp_path.glob("*.sqlite"))
+    assert len(checkpoints) == 1
+    with sqlite3.connect(checkpoints[0]) as conn:
+        # Only the interrupted day's thread is left; completed days were deleted from both tables
+        threads = {row[0] for row in conn.execute("SELECT thread_id FROM checkpoints UNION SELECT thread_id FROM writes")}
+    assert len(threads) == 1
+
+    main._graph_cache.clear()
+    main._checkpointers.clear()
+    resumed = run(str(tmp_path))
+
+    assert values(resumed) == fresh
+    with sqlite3.connect(checkpoints[0]) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM checkpoints").fetchone()[0] == 0
+        assert conn.execute("SELECT COUNT(*) FROM writes").fetchone()[0] == 0
@@ -0,0 +1,257 @@
+"""Parity of PortfolioLedger.execute_trade with the dict-based implementation it replaced."""
+
+import random
+
+import pytest
+
+from backtesting.ledger import PortfolioLedger
+
+TICKERS = ["AAA", "BBB", "CCC"]
+
+
+class DictPortfolio:
+    """The backtester's execute_trade before the ledger, kept verbatim as the reference."""
+
+    def __init__(self, tickers: list[str], initial_capital: float, margin_ratio: float):
+        self.margin_ratio = margin_ratio
+        self.portfolio = {
+            "cash": initial_capital,
+            "margin_used": 0.0,
+            "positions": {
+                ticker: {"long": 0, "short": 0, "long_cost_basis": 0.0, "short_cost_basis": 0.0, "short_margin_used": 0.0}
+                for ticker in tickers
+            },
+            "realized_gains": {ticker: {"long": 0.0, "short": 0.0} for ticker in tickers},
+        }
+
+    def execute_trade(self, ticker: str, action: str, quantity: float, current_price: float):
+        """
+        Execute trades with support for both long and short positions.
+        `quantity` is the number of shares the agent wants to buy/sell/short/cover.
+        We will only trade integer shares to keep it simple.
+        """
+        if quantity <= 0:
+            return 0
+
+        quantity = int(quantity)  # force integer shares
+        position = self.portfolio["positions"][ticker]
+
+        if action == "buy":
+            cost = quantity * current_price
+            if cost <= self.portfolio["cash"]:
+                # Weighted average cost basis for the new total
+                old_shares = position["long"]
+                old_cost_basis = position["long_cost_basis"]
+                new_shares = quantity
+                total_shares = old_shares + new_shares
+
+                if total_shares > 0:
+                    total_old_cost = old_cost_basis * old_shares
+                    total_new_cost = cost
+                    position["long_cost_basis"] = (total_old_cost + total_new_cost) / total_shares
+
+                position["long"] += quantity
+                self.portfolio["cash"] -= cost
+                return quantity
+            else:
+                # Calculate maximum affordable quantity
+                max_quantity = int(self.portfolio["cash"] / current_price)
+                if max_quantity > 0:
+                    cost = max_quantity * current_price
+                    old_shares = position["long"]
+                    old_cost_basis = position["long_cost_basis"]
+                    total_shares = old_shares + max_quantity
+
+                    if total_shares > 0:
+                        total_old_cost = old_cost_basis * old_shares
+                        total_new_cost = cost
+                        position["long_cost_basis"] = (total_old_cost + total_new_cost) / total_shares
+
+                    position["long"] += max_quantity
+                    self.portfolio["cash"] -= cost
+                    return max_quantity
+                return 0
+
+        elif action == "sell":
+            # You can only sell as many as you own
+            quantity = min(quantity, position["long"])
+            if quantity > 0:
+                # Realized gain/loss using average cost basis
+                avg_cost_per_share = position["long_cost_basis"] if position["long"] > 0 else 0
+                realized_gain = (current_price - avg_cost_per_share) * quantity
+                self.portfolio["realized_gains"][ticker]["long"] += realized_gain
+
+                position["long"] -= quantity
+                self.portfolio["cash"] += quantity * current_price
+
+                if position["long"] == 0:
+                    position["long_cost_basis"] = 0.0
+
+                return quantity
+
+        elif action == "short":
+            """
+            Typical short sale flow:
+              1) Receive proceeds = current_price * quantity
+              2) Post margin_required = proceeds * margin_ratio
+              3) Net effect on cash = +proceeds - margin_required
+            """
+            proceeds = current_price * quantity
+            margin_required = proceeds * self.margin_ratio
+            if margin_required <= self.portfolio["cash"]:
+                # Weighted average short cost basis
+                old_short_shares = position["short"]
+                old_cost_basis = position["short_cost_basis"]
+                new_shares = quantity
+                total_shares = old_short_shares + new_shares
+
+                if total_shares > 0:
+                    total_old_cost = old_cost_basis * old_short_shares
+                    total_new_cost = current_price * new_shares
+                    position["short_cost_basis"] = (total_old_cost + total_new_cost) / total_shares
+
+                position["short"] += quantity
+
+                # Update margin usage
+                position["short_margin_used"] += margin_required
+                self.portfolio["margin_used"] += margin_required
+
+                # Increase cash by proceeds, then subtract the required margin
+                self.portfolio["cash"] += proceeds
+                self.portfolio["cash"] -= margin_required
+                return quantity
+            else:
+                # Calculate maximum shortable quantity
+                if self.margin_ratio > 0:
+                    max_quantity = int(self.portfolio["cash"] / (current_price * self.margin_ratio))
+                else:
+                    max_quantity = 0
+
+                if max_quantity > 0:
+                    proceeds = current_price * max_quantity
+                    margin_required = proceeds * self.margin_ratio
+
+                    old_short_shares = position["short"]
+                    old_cost_basis = position["short_cost_basis"]
+                    total_shares = old_short_shares + max_quantity
+
+                    if total_shares > 0:
+                        total_old_cost = old_cost_basis * old_short_shares
+                        total_new_cost = current_price * max_quantity
+                        position["short_cost_basis"] = (total_old_cost + total_new_cost) / total_shares
+
+                    position["short"] += max_quantity
+                    position["short_margin_used"] += margin_required
+                    self.portfolio["margin_used"] += margin_required
+
+                    self.portfolio["cash"] += proceeds
+                    self.portfolio["cash"] -= margin_required
+                    return max_quantity
+                return 0
+
+        elif action == "cover":
+            """
+            When covering shares:
+              1) Pay cover cost = current_price * quantity
+              2) Release a proportional share of the margin
+              3) Net effect on cash = -cover_cost + released_margin
+            """
+            quantity = min(quantity, position["short"])
+            if quantity > 0:
+                cover_cost = quantity * current_price
+                avg_short_price = position["short_cost_basis"] if position["short"] > 0 else 0
+                realized_gain = (avg_short_price - current_price) * quantity
+
+                if position["short"] > 0:
+                    portion = quantity / position["short"]
+                else:
+                    portion = 1.0
+
+                margin_to_release = portion * position["short_margin_used"]
+
+                position["short"] -= quantity
+                position["short_margin_used"] -= margin_to_release
+                self.portfolio["margin_used"] -= margin_to_release
+
+                # Pay the cost to cover, but get back the released margin
+                self.portfolio["cash"] += margin_to_release
+                self.portfolio["cash"] -= cover_cost
+
+                self.portfolio["realized_gains"][ticker]["short"] += realized_gain
+
+                if position["short"] == 0:
+                    position["short_cost_basis"] = 0.0
+                    position["short_margin_used"] = 0.0
+
+                return quantity
+
+        return 0
+
+
+def assert_same(ledger: PortfolioLedger, reference: DictPortfolio):
+    actual = ledger.to_portfolio()
+    expected = reference.portfolio
+    assert actual["cash"] == pytest.approx(expected["cash"])
+    assert actual["margin_used"] == pytest.approx(expected["margin_used"])
+    for ticker in TICKERS:
+        assert actual["positions"][ticker] == pytest.approx(expected["positions"][ticker])
+        assert actual["realized_gains"][ticker] == pytest.approx(expected["realized_gains"][ticker])
+
+
+def run_both(margin_ratio: float, trades: list[tuple[str, str, float, float]], initial_capital: float = 10000.0):
+    ledger = PortfolioLedger(TICKERS, initial_capital, margin_ratio)
+    reference = DictPortfolio(TICKERS, initial_capital, margin_ratio)
+    for ticker, action, quantity, price in trades:
+        assert ledger.execute_trade(ticker, action, quantity, price) == reference.execute_trade(ticker, action, quantity, price)
+        assert_same(ledger, reference)
+    return ledger
+
+
+@pytest.mark.parametrize("margin_ratio", [0.0, 0.5])
+def test_buy_and_sell(margin_ratio):
+    ledger = run_both(margin_ratio, [
+        ("AAA", "buy", 10, 100.0),
+        ("AAA", "buy", 5.7, 110.0),  # Fractional quantities are truncated
+        ("AAA", "buy", 1000, 120.0),  # Capped by cash
+        ("AAA", "sell", 4, 130.0),
+        ("AAA", "sell", 10000, 90.0),  # Capped by the position
+        ("BBB", "sell", 5, 50.0),  # Nothing to sell
+    ])
+    assert ledger.long[0] == 0 and ledger.long_cost_basis[0] == 0.0
+
+
+@pytest.mark.parametrize("margin_ratio", [0.0, 0.5, 1.0])
+def test_short_and_cover(margin_ratio):
+    run_both(margin_ratio, [
+        ("BBB", "short", 10, 50.0),
+        ("BBB", "short", 500, 60.0),  # Capped by the margin the cash can post (unless margin_ratio is 0)
+        ("BBB", "cover", 7, 40.0),  # Releases a proportional share of the margin
+        ("BBB", "cover", 100000, 70.0),  # Capped by the position
+        ("CCC", "cover", 3, 10.0),  # Nothing to cover
+    ])
+
+
+def test_short_without_margin_and_negative_cash():
+    # With margin_ratio 0, a short never needs cash, except once a loss has driven cash below zero
+    run_both(0.0, [
+        ("AAA", "short", 100, 50.0),
+        ("AAA", "cover", 100, 200.0),
+        ("BBB", "short", 10, 50.0),
+    ], initial_capital=1000.0)
+
+
+@pytest.mark.parametrize("margin_ratio", [0.0, 0.25, 0.5, 1.0])
+def test_random_trade_sequences(margin_ratio):
+    rng = random.Random(margin_ratio)
+    trades = [
+        (rng.choice(TICKERS), rng.choice(["buy", "sell", "short", "cover", "hold"]), rng.uniform(-5, 200), rng.uniform(1, 300))
+        for _ in range(500)
+    ]
+    run_both(margin_ratio, trades)
+
+
+def test_portfolio_snapshot_holds_plain_python_numbers():
+    ledger = run_both(0.5, [("AAA", "buy", 10, 100.0), ("BBB", "short", 10, 50.0), ("BBB", "cover", 5, 40.0)])
+    portfolio = ledger.to_portfolio()
+    assert type(portfolio["cash"]) is float and type(portfolio["margin_used"]) is float
+    assert all(type(value) in (int, float) for position in portfolio["positions"].values() for value in position.values())
@@ -0,0 +1,76 @@
+"""Reuse of analyst outputs when their inputs are unchanged, and retrying of failed LLM calls."""
+
+import pytest
+
+from data.signal_store import signal_store
+from graph.memo import analyst_memo, memoize_analyst
+from utils.llm import as_fallback, fallback_flag
+from agents.warren_buffett import WarrenBuffettSignal
+
+
+@pytest.fixture(autouse=True)
+def empty_memo():
+    analyst_memo.clear()
+
+
+def state(tickers: list[str]) -> dict:
+    return {
+        "data": {"tickers": tickers, "start_date": "2024-01-01", "end_date": "2024-01-31"},
+        "metadata": {"reuse_unchanged_analysts": True, "model_name": "m", "model_provider": "p"},
+        "analyst_signals": {},
+    }
+
+
+def counting_node(fail: set[str]):
+    """An analyst node whose LLM call falls back for the tickers in `fail` (the set can change between calls)."""
+    calls = []
+
+    def node(state):
+        outputs = {}
+        for ticker in state["data"]["tickers"]:
+            calls.append(ticker)
+            signal = WarrenBuffettSignal(signal="bullish", confidence=80.0, reasoning="ok")
+            if ticker in fail:
+                signal = as_fallback(WarrenBuffettSignal(signal="neutral", confidence=0.0, reasoning="Error in analysis, defaulting to neutral"))
+            outputs[ticker] = {"signal": signal.signal, "confidence": signal.confidence, "reasoning": signal.reasoning, **fallback_flag(signal)}
+        return {"analyst_signals": {"test_agent": outputs}}
+
+    return node, calls
+
+
+def test_unchanged_inputs_reuse_the_previous_output():
+    node, calls = counting_node(fail=set())
+    memo_node = memoize_analyst("test_agent", node, inputs=[])
+    first = memo_node(state(["AAA", "BBB"]))
+    second = memo_node(state(["AAA", "BBB"]))
+    assert first == second
+    assert calls == ["AAA", "BBB"]
+
+
+def test_fallback_outputs_are_retried_on_the_next_run():
+    fail = {"BBB"}
+    node, calls = counting_node(fail)
+    memo_node = memoize_analyst("test_agent", node, inputs=[])
+
+    first = memo_node(state(["AAA", "BBB"]))
+    assert first["analyst_signals"]["test_agent"]["BBB"]["llm_fallback"] is True
+
+    fail.clear()
+    second = memo_node(state(["AAA", "BBB"]))
+    assert calls == ["AAA", "BBB", "BBB"]
+    assert second["analyst_signals"]["test_agent"]["BBB"] == {"signal": "bullish", "confidence": 80.0, "reasoning": "ok"}
+
+
+@pytest.mark.parametrize("uses_llm, reruns", [(False, 0), (True, 2)])
+def test_signal_store_is_shared_across_models_only_without_an_llm(tmp_path, monkeypatch, uses_llm, reruns):
+    monkeypatch.setattr(signal_store, "_path", str(tmp_path / "signals.db"))
+    node, calls = counting_node(fail=set())
+    memo_node = memoize_analyst("test_agent", node, inputs=[], uses_llm=uses_llm)
+
+    memo_node(state(["AAA", "BBB"]))
+    other_model = state(["AAA", "BBB"])
+    other_model["metadata"].update(model_name="other", reuse_unchanged_analysts=False)
+    memo_node(other_model)
+
+    assert len(calls) == 2 + reruns
+    assert len(signal_store.query(model_name="other")) == 2
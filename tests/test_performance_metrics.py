@@ -0,0 +1,100 @@
+"""Parity of the running PerformanceAccumulator with the pandas computation it replaced."""
+
+import math
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from backtesting.metrics import RISK_FREE_RATE, TRADING_DAYS, PerformanceAccumulator, compute_performance_metrics
+
+
+def pandas_metrics(portfolio_values: pd.Series) -> dict[str, float] | None:
+    """The DataFrame-based computation PerformanceAccumulator replaced, kept verbatim as the reference."""
+    clean_returns = portfolio_values.pct_change().dropna()
+    if len(clean_returns) < 2:
+        return None  # not enough data points
+
+    daily_risk_free_rate = RISK_FREE_RATE / TRADING_DAYS
+    excess_returns = clean_returns - daily_risk_free_rate
+    mean_excess_return = excess_returns.mean()
+    std_excess_return = excess_returns.std()
+    metrics = {}
+
+    # Sharpe ratio
+    if std_excess_return > 1e-12:
+        metrics["sharpe_ratio"] = np.sqrt(TRADING_DAYS) * (mean_excess_return / std_excess_return)
+    else:
+        metrics["sharpe_ratio"] = 0.0
+
+    # Sortino ratio
+    negative_returns = excess_returns[excess_returns < 0]
+    if len(negative_returns) > 0:
+        downside_std = negative_returns.std()
+        if downside_std > 1e-12:
+            metrics["sortino_ratio"] = np.sqrt(TRADING_DAYS) * (mean_excess_return / downside_std)
+        else:
+            metrics["sortino_ratio"] = float('inf') if mean_excess_return > 0 else 0
+    else:
+        metrics["sortino_ratio"] = float('inf') if mean_excess_return > 0 else 0
+
+    # Maximum drawdown
+    rolling_max = portfolio_values.cummax()
+    drawdown = (portfolio_values - rolling_max) / rolling_max
+    metrics["max_drawdown"] = drawdown.min() * 100
+    return metrics
+
+
+def assert_same(actual: dict | None, expected: dict | None):
+    if expected is None:
+        assert actual is None
+        return
+    assert actual.keys() == expected.keys()
+    for key, value in expected.items():
+        if math.isinf(value):
+            assert actual[key] == value
+        else:
+            assert actual[key] == pytest.approx(value, rel=1e-9, abs=1e-9)
+
+
+def random_walk(seed: int, days: int) -> list[float]:
+    rng = random.Random(seed)
+    values = [100000.0]
+    for _ in range(days - 1):
+        values.append(values[-1] * (1 + rng.gauss(0.0005, 0.02)))
+    return values
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_matches_pandas_on_random_curves(seed):
+    values = random_walk(seed, 500)
+    assert_same(compute_performance_metrics(values), pandas_metrics(pd.Series(values)))
+
+
+def test_matches_pandas_after_every_day():
+    values = random_walk(42, 60)
+    accumulator = PerformanceAccumulator()
+    for day, value in enumerate(values, start=1):
+        accumulator.update(value)
+        assert_same(accumulator.get_metrics(), pandas_metrics(pd.Series(values[:day])))
+
+
+@pytest.mark.parametrize("values", [
+    [100.0],
+    [100.0, 101.0],  # A single return is not enough
+    [100.0, 110.0, 121.0, 133.1],  # No negative excess return: Sortino is inf
+    [100.0, 90.0, 99.0, 108.9],  # A single negative excess return has no std
+    [100.0, 100.0, 100.0, 100.0],  # Flat: Sharpe 0
+    [100.0, 80.0, 120.0, 60.0, 90.0],
+])
+def test_matches_pandas_on_edge_cases(values):
+    assert_same(compute_performance_metrics(values), pandas_metrics(pd.Series(values)))
+
+
+def test_max_drawdown_date():
+    accumulator = PerformanceAccumulator()
+    for date, value in zip(["d1", "d2", "d3", "d4", "d5"], [100.0, 120.0, 90.0, 100.0, 95.0]):
+        accumulator.update(value, date)
+    assert accumulator.max_drawdown == pytest.approx(-0.25)
+    assert accumulator.max_drawdown_date == "d3"
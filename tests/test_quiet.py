@@ -0,0 +1,32 @@
+"""Quiet backtests print nothing, including the live agent progress display."""
+
+import pytest
+
+import main
+from backtester import Backtester
+from utils.progress import progress
+
+pytestmark = pytest.mark.usefixtures("offline")
+
+
+def test_quiet_backtest_never_starts_the_progress_display(monkeypatch):
+    def start():
+        raise AssertionError("the progress display was started")
+
+    monkeypatch.setattr(progress.live, "start", start)
+    backtester = Backtester(
+        agent=main.run_hedge_fund,
+        tickers=["AAA", "BBB"],
+        start_date="2024-03-01",
+        end_date="2024-03-15",
+        initial_capital=100000.0,
+        selected_analysts=["technical_analyst"],
+        lookback_days=120,
+        quiet=True,
+        rows_path=None,
+        rule_only=True,
+    )
+    backtester.run_backtest()
+
+    assert len(backtester.portfolio_values) > 5
+    assert progress.active_runs == 0
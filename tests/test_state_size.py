@@ -0,0 +1,34 @@
+"""Size of the graph state a real run ends with: each analysis is held once, and only the final decision is a message."""
+
+import json
+
+import pytest
+
+from graph.state import get_state_size
+from main import create_initial_state, create_portfolio, get_hedge_fund_graph
+
+TICKERS = [f"T{i}" for i in range(10)]
+ANALYSTS = ["technical_analyst", "sentiment_analyst"]
+
+pytestmark = pytest.mark.usefixtures("offline")
+
+
+def run() -> dict:
+    """Run the analysts, risk and portfolio management, with the portfolio manager answered by the local mock model."""
+    state = create_initial_state(TICKERS, "2024-01-01", "2024-03-29", create_portfolio(TICKERS), False, "local-mock", "Local", None)
+    return get_hedge_fund_graph(ANALYSTS).invoke(state)
+
+
+def test_only_the_final_decision_is_added_to_the_messages():
+    state = run()
+    assert [message.name for message in state["messages"][1:]] == ["portfolio_management"]
+    assert set(state["analyst_signals"]) == {"technical_analyst_agent", "sentiment_agent", "risk_management_agent"}
+    assert set(json.loads(state["messages"][-1].content)) == set(TICKERS)
+
+
+def test_state_holds_each_analysis_once():
+    state = run()
+    analyses = len(json.dumps(state["analyst_signals"], default=str).encode())
+    decisions = len(state["messages"][-1].content.encode())
+    # Everything beyond the analyses and the decisions is the input data, a small fraction of them
+    assert analyses + decisions < get_state_size(state) < 1.2 * (analyses + decisions)
@@ -0,0 +1,104 @@
+"""Incremental JSON extraction from streamed LLM output."""
+
+from langchain_core.messages import AIMessageChunk
+from pydantic import BaseModel
+
+from utils.llm import StreamingJSONExtractor, stream_json_response
+
+
+class Signal(BaseModel):
+    signal: str
+    confidence: float
+    reasoning: str
+
+
+class Wrapper(BaseModel):
+    decisions: dict[str, Signal]
+
+
+ANSWER = '{"signal": "bullish", "confidence": 80, "reasoning": "Strong {moat} and \\"pricing\\" power"}'
+
+
+def feed_in_chunks(extractor: StreamingJSONExtractor, text: str, size: int):
+    """Feed text in chunks of the given size and return the first parsed object and how much was fed."""
+    for end in range(size, len(text) + size, size):
+        if (parsed := extractor.feed(text[end - size:end])) is not None:
+            return parsed, min(end, len(text))
+    return None, len(text)
+
+
+def test_parses_across_every_chunk_size():
+    for size in range(1, len(ANSWER) + 1):
+        parsed, fed = feed_in_chunks(StreamingJSONExtractor(Signal), ANSWER, size)
+        assert parsed == Signal(signal="bullish", confidence=80, reasoning='Strong {moat} and "pricing" power')
+        assert fed == len(ANSWER)
+
+
+def test_returns_as_soon_as_the_object_closes():
+    extractor = StreamingJSONExtractor(Signal)
+    assert extractor.feed("Here you go: " + ANSWER[:-1]) is None
+    assert extractor.feed(ANSWER[-1] + " and some trailing prose") is not None
+
+
+def test_skips_prose_and_objects_that_do_not_validate():
+    text = 'I would use {braces} like {"x": 1}, then answer ' + ANSWER
+    parsed, _ = feed_in_chunks(StreamingJSONExtractor(Signal), text, 7)
+    assert parsed is not None and parsed.signal == "bullish"
+
+
+def test_nested_objects_are_not_validated_on_their_own():
+    # The inner object is a valid Signal, but only the top-level object is the answer
+    text = '{"decisions": {"AAPL": ' + ANSWER + "}}"
+    extractor = StreamingJSONExtractor(Signal)
+    assert feed_in_chunks(extractor, text, 5) == (None, len(text))
+
+    parsed, _ = feed_in_chunks(StreamingJSONExtractor(Wrapper), text, 5)
+    assert parsed.decisions["AAPL"].confidence == 80
+
+
+def test_ignores_json_inside_a_think_block():
+    text = '<think>Maybe {"signal": "bearish", "confidence": 10, "reasoning": "no"}?</think>' + ANSWER
+    parsed, _ = feed_in_chunks(StreamingJSONExtractor(Signal), text, 3)
+    assert parsed.signal == "bullish"
+
+
+class FakeStreamingLLM:
+    def __init__(self, chunks: list[AIMessageChunk]):
+        self.chunks = chunks
+        self.read = 0
+
+    def stream(self, prompt):
+        for chunk in self.chunks:
+            self.read += 1
+            yield chunk
+
+
+def test_stream_reads_up_to_the_usage_chunk():
+    usage = {"input_tokens": 100, "output_tokens": 20, "total_tokens": 120}
+    llm = FakeStreamingLLM([
+        AIMessageChunk(content=ANSWER[:30]),
+        AIMessageChunk(content=ANSWER[30:]),
+        AIMessageChunk(content=" trailing"),
+        AIMessageChunk(content="", usage_metadata=usage),
+        AIMessageChunk(content="never read"),
+    ])
+    parsed, response = stream_json_response(llm, "prompt", Signal)
+    assert parsed.signal == "bullish"
+    assert response.usage_metadata["total_tokens"] == 120
+    assert llm.read == 4
+
+
+def test_deepseek_reply_without_json_backs_off_before_retrying(monkeypatch):
+    import llm.models
+    import utils.llm
+
+    llm_stub = FakeStreamingLLM([AIMessageChunk(content="I cannot answer that.")])
+    monkeypatch.setattr(llm.models, "get_model", lambda model_name, model_provider: llm_stub)
+    delays = []
+    monkeypatch.setattr(utils.llm.time, "sleep", delays.append)
+
+    result = utils.llm.call_llm("prompt", "deepseek-r1-distill-llama-70b", "Groq", Signal, max_retries=3)
+
+    assert utils.llm.fallback_flag(result) == {"llm_fallback": True}
+    # Every attempt but the last waits for the retry policy's backoff
+    assert len(delays) == 2